@@ -0,0 +1,159 @@
+import asyncio
+import contextlib
+import os
+from dataset_store import dataset_store
+from incremental import INCREMENTAL_BATCH_ROWS
+from sampling import SAMPLE_BATCH_ROWS, sample_size
+
+
+def _physical_memory() -> int:
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return 8 * 1024 ** 3
+
+
+# API processes serving on this host (the variable uvicorn and gunicorn read
+# for their worker count); each admits against its share of the budget
+WEB_CONCURRENCY = max(1, int(os.getenv('WEB_CONCURRENCY', 1)))
+# Working memory in-flight uploads and predictions of all API processes on the
+# host (and their prediction workers) may reserve; defaults to half the host's
+# memory and is split evenly between the WEB_CONCURRENCY processes
+MEMORY_BUDGET_BYTES = (int(os.getenv('MEMORY_BUDGET_BYTES', 0)) or _physical_memory() // 2) // WEB_CONCURRENCY
+# How long a request waits for budget to free up before it is rejected as busy
+ADMISSION_TIMEOUT_SECONDS = float(os.getenv('ADMISSION_TIMEOUT_SECONDS', 30))
+# Peak memory of a whole-file upload, as a multiple of its size (raw bytes,
+# parsed frame and Arrow table are alive at once)
+UPLOAD_MEMORY_FACTOR = float(os.getenv('UPLOAD_MEMORY_FACTOR', 4))
+# Reserved for a streaming upload, which only holds one chunk at a time
+STREAMING_UPLOAD_BYTES = int(os.getenv('STREAMING_UPLOAD_BYTES', 256 * 1024 * 1024))
+# Peak memory of training, as a multiple of the loaded dataset (frame,
+# float64 features and the train/test copies)
+PREDICT_MEMORY_FACTOR = float(os.getenv('PREDICT_MEMORY_FACTOR', 3))
+# Stored bytes of datasets allowed per user and across all users (0: no limit)
+USER_DATASET_QUOTA_BYTES = int(os.getenv('USER_DATASET_QUOTA_BYTES', 2 * 1024 ** 3))
+DATASET_QUOTA_BYTES = int(os.getenv('DATASET_QUOTA_BYTES', 0))
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request cannot be admitted: `retryable` is True when the
+    server is busy and False when the request can never fit.
+    """
+
+    def __init__(self, message: str, retryable: bool):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class MemoryBudget:
+    """
+    Byte budget that requests reserve before doing memory-heavy work.
+    A request that does not fit waits until earlier ones release their
+    reservation, up to a timeout; one larger than the whole budget is
+    rejected straight away.
+    """
+
+    def __init__(self, capacity: int = MEMORY_BUDGET_BYTES):
+        self.capacity = capacity
+        self.reserved = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._condition = None
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, nbytes: int, timeout: float = ADMISSION_TIMEOUT_SECONDS):
+        """Hold `nbytes` of the budget for the duration of the block; `timeout` None waits indefinitely"""
+        nbytes = int(nbytes)
+        if nbytes > self.capacity:
+            self.rejected += 1
+            raise AdmissionRejected(
+                f"The request needs about {format_bytes(nbytes)} of memory, more than the server's budget of "
+                f"{format_bytes(self.capacity)}.", retryable=False
+            )
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(
+                    self._condition.wait_for(lambda: self.reserved + nbytes <= self.capacity), timeout
+                )
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise AdmissionRejected("The server is busy with other uploads and predictions; retry shortly.",
+                                        retryable=True)
+            finally:
+                self.waiting -= 1
+            self.reserved += nbytes
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.reserved -= nbytes
+                self._condition.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "capacity_bytes": self.capacity,
+            "reserved_bytes": self.reserved,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+def format_bytes(nbytes: int) -> str:
+    return f"{nbytes / 1024 ** 2:.1f} MiB"
+
+
+def check_dataset_quota(username: str, filename: str, nbytes: int):
+    """
+    Raise AdmissionRejected if storing `nbytes` as the user's `filename`
+    would exceed the per-user or global dataset quota. The dataset it
+    replaces, if any, no longer counts. Quotas are on stored (decompressed
+    Arrow) bytes, so uploads are checked again once they are stored.
+    """
+    usage = dataset_store.usage(username)
+    replaced = usage.pop(filename, 0)
+    if USER_DATASET_QUOTA_BYTES and sum(usage.values()) + nbytes > USER_DATASET_QUOTA_BYTES:
+        raise AdmissionRejected(
+            f"Storing {filename} ({format_bytes(nbytes)}) would exceed your dataset quota of "
+            f"{format_bytes(USER_DATASET_QUOTA_BYTES)} ({format_bytes(sum(usage.values()))} in use). "
+            "Delete unused files first.", retryable=False
+        )
+    if DATASET_QUOTA_BYTES and dataset_store.total_usage() - replaced + nbytes > DATASET_QUOTA_BYTES:
+        raise AdmissionRejected("The server's dataset storage is full.", retryable=False)
+
+
+def upload_memory_estimate(nbytes: int, streaming: bool) -> int:
+    estimate = int(nbytes * UPLOAD_MEMORY_FACTOR)
+    return min(estimate, STREAMING_UPLOAD_BYTES) if streaming else estimate
+
+
+def prediction_memory_estimate(name: str, training_mode: str, sample_rows: int = None,
+                               sample_fraction: float = None) -> int:
+    """
+    Peak memory of training on a stored dataset: its loaded size (from the
+    upload-time memory report, else its stored size) scaled to the rows
+    that are in memory at once.
+    """
+    table = dataset_store.open_table(name)
+    content_hash = dataset_store.content_hash_of(name)
+    profile = dataset_store.get_profile(content_hash) if content_hash else None
+    loaded_bytes = (profile or {}).get("memory_usage", {}).get("compact_bytes") or dataset_store.size_of(name)
+    total_rows = max(table.num_rows, 1)
+    rows = total_rows
+    if training_mode == "incremental":
+        rows = min(total_rows, INCREMENTAL_BATCH_ROWS)
+    elif sample_rows is not None or sample_fraction is not None:
+        try:
+            rows = min(total_rows, sample_size(total_rows, sample_rows, sample_fraction) + SAMPLE_BATCH_ROWS)
+        except ValueError:
+            pass  # Invalid settings are reported by the pipeline
+    return int(loaded_bytes * rows / total_rows * PREDICT_MEMORY_FACTOR)
+
+
+memory_budget = MemoryBudget()
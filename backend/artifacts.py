@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+
+# Per-result files (chart inputs, ...) shared by all workers on the host
+ARTIFACT_DIR = os.getenv('ARTIFACT_DIR', os.path.join(tempfile.gettempdir(), 'insightfull', 'artifacts'))
+
+
+def result_key(username: str, filename: str, model_type: str, target_column: str) -> str:
+    """
+    Stable key for a saved result. It uses the same fields that
+    save_regression_result matches on, so re-running a prediction
+    overwrites that result's artifacts.
+    """
+    raw = json.dumps([username, filename, model_type, target_column])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def prediction_key(content_hash: str, target_column: str, model_type: str, settings: dict) -> str:
+    """
+    Key for a memoized training result: the dataset content plus every
+    input that changes what the pipeline produces. Artifacts stored under
+    it stay valid for as long as the content exists.
+    """
+    raw = json.dumps([content_hash, target_column, model_type, settings], sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def artifact_path(kind: str, key: str, ext: str) -> str:
+    directory = os.path.join(ARTIFACT_DIR, kind)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{key}.{ext}")
+
+
+def save_arrays(kind: str, key: str, meta: dict, **arrays):
+    """
+    Atomically write numeric arrays plus a JSON-serialisable `meta` dict.
+    The file is written under a temporary name and then renamed, so
+    concurrent readers never see a partial file.
+    """
+    path = artifact_path(kind, key, 'npz')
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, __meta__=np.array(json.dumps(meta)), **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_arrays(kind: str, key: str):
+    """Return (meta, arrays) written by save_arrays, or raise KeyError"""
+    path = artifact_path(kind, key, 'npz')
+    if not os.path.exists(path):
+        raise KeyError(key)
+    with np.load(path) as data:
+        arrays = {name: data[name] for name in data.files if name != '__meta__'}
+        meta = json.loads(str(data['__meta__']))
+    return meta, arrays
+
+
+def save_model(key: str, bundle: dict):
+    """Atomically persist a fitted pipeline (any picklable object) with joblib"""
+    import joblib
+    path = artifact_path('models', key, 'joblib')
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    joblib.dump(bundle, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def model_version(key: str):
+    """
+    Identity of the file saved under `key` (it changes whenever save_model
+    replaces it), or raise KeyError
+    """
+    try:
+        stat = os.stat(artifact_path('models', key, 'joblib'))
+    except FileNotFoundError:
+        raise KeyError(key)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def load_model(key: str):
+    """Return a pipeline written by save_model, or raise KeyError"""
+    import joblib
+    path = artifact_path('models', key, 'joblib')
+    if not os.path.exists(path):
+        raise KeyError(key)
+    return joblib.load(path)
@@ -0,0 +1,38 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from caching import LRUCache
+
+# Verified principals are trusted for this long without another user lookup
+AUTH_CACHE_TTL_SECONDS = float(os.getenv('AUTH_CACHE_TTL_SECONDS', 60))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv('AUTH_CACHE_MAX_ENTRIES', 10000))
+# bcrypt is deliberately slow; it gets its own threads so a burst of logins
+# queues here instead of occupying the threadpool every sync endpoint uses
+BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', 4))
+
+# username -> principal returned by get_current_user
+principal_cache = LRUCache(max_items=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_TTL_SECONDS)
+
+_bcrypt_executor = None
+
+
+def invalidate_principal(username: str):
+    """Drop a cached principal; call whenever the user is created, changed or removed"""
+    principal_cache.pop(username)
+
+
+async def run_bcrypt(fn, *args, **kwargs):
+    """Run a password hashing/verification call on the dedicated bcrypt pool"""
+    global _bcrypt_executor
+    if _bcrypt_executor is None:
+        _bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix='bcrypt')
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_bcrypt_executor, functools.partial(fn, *args, **kwargs))
+
+
+def shutdown():
+    global _bcrypt_executor
+    if _bcrypt_executor is not None:
+        _bcrypt_executor.shutdown(wait=False, cancel_futures=True)
+        _bcrypt_executor = None
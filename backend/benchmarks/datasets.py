@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+
+def make_dataset(rows: int = 10000, numeric_columns: int = 4, categorical_columns: int = 2,
+                 cardinality: int = 10, null_fraction: float = 0.0, seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic dataset for benchmarks.
+
+    Numeric features alternate between float and int columns, categorical
+    features draw from `cardinality` string labels, and a boolean column
+    is always included. `null_fraction` of the feature values are blanked.
+    Two targets are added: `sales`, a continuous linear function of the
+    numeric features, and `label`, a three-class label derived from it.
+    Targets never contain nulls.
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+    signal = np.zeros(rows)
+    for i in range(numeric_columns):
+        if i % 2 == 0:
+            values = rng.normal(size=rows)
+        else:
+            values = rng.integers(0, 1000, rows)
+        data[f"num_{i}"] = values
+        signal += (i + 1) * (values - values.mean()) / (values.std() or 1)
+    labels = np.array([f"cat_{j}" for j in range(max(cardinality, 1))])
+    for i in range(categorical_columns):
+        data[f"cat_{i}"] = labels[rng.integers(0, len(labels), rows)]
+    data["flag"] = rng.random(rows) < 0.5
+    df = pd.DataFrame(data)
+
+    if null_fraction > 0:
+        for col in df.columns:
+            mask = rng.random(rows) < null_fraction
+            if df[col].dtype == 'int64' or df[col].dtype == 'bool':
+                df[col] = df[col].astype(object) if df[col].dtype == 'bool' else df[col].astype(float)
+            df.loc[mask, col] = None
+
+    df["sales"] = 100 + 10 * signal + rng.normal(scale=5, size=rows)
+    df["label"] = np.select([signal < -1, signal > 1], ["low", "high"], default="mid")
+    return df
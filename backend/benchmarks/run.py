@@ -0,0 +1,288 @@
+"""
+Benchmarks for the upload, predict, chart and persistence hot paths.
+
+Run from the backend directory:
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.run --datasets small,medium --output bench.json
+    python -m benchmarks.run --baseline bench.json --fail-on-regression
+
+MongoDB is replaced by mongomock, and datasets and artifacts go to
+temporary directories, so runs are reproducible and touch nothing real.
+Every case is timed `--repeat` times (median, min and mean are reported),
+then run once more under tracemalloc for its peak Python/numpy memory.
+A case that raises is reported with its `error` instead of timings.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.datasets import make_dataset
+
+# name -> make_dataset arguments
+DATASETS = {
+    "small": {"rows": 10000, "numeric_columns": 4, "categorical_columns": 2, "cardinality": 10},
+    "medium": {"rows": 200000, "numeric_columns": 8, "categorical_columns": 4, "cardinality": 100},
+    "wide": {"rows": 20000, "numeric_columns": 40, "categorical_columns": 10, "cardinality": 1000},
+    "nulls": {"rows": 50000, "numeric_columns": 8, "categorical_columns": 4, "cardinality": 50, "null_fraction": 0.1},
+}
+MODEL_TARGETS = {"linear_regression": "sales", "logistic_regression": "label", "naive_bayes": "label"}
+
+
+def use_in_memory_mongo():
+    """Swap pymongo's client for mongomock; must run before database.mongo_client is imported"""
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit("The benchmarks need mongomock: pip install -r benchmarks/requirements.txt")
+    import pymongo
+    pymongo.MongoClient = mongomock.MongoClient
+
+
+def measure(name: str, dataset: str, fn, repeat: int, setup=None, track_memory: bool = True) -> dict:
+    """Time `fn` (after `setup`, which is not timed) and record its peak traced memory"""
+    times = []
+    try:
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            gc.collect()
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    except Exception as e:
+        error = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+        print(f"{dataset:>8} {name:<32} error {error}", file=sys.stderr)
+        return {"name": name, "dataset": dataset, "repeat": repeat, "median_s": None, "min_s": None,
+                "mean_s": None, "peak_memory_bytes": None, "error": error}
+    result = {
+        "name": name,
+        "dataset": dataset,
+        "repeat": repeat,
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "mean_s": statistics.mean(times),
+        "peak_memory_bytes": None,
+    }
+    if track_memory:
+        if setup is not None:
+            setup()
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    print(f"{dataset:>8} {name:<32} median {result['median_s'] * 1000:9.1f} ms"
+          + (f"  peak {result['peak_memory_bytes'] / 2 ** 20:8.1f} MiB" if track_memory else ""),
+          file=sys.stderr)
+    return result
+
+
+def compare_to_baseline(results: list, baseline: dict, threshold: float) -> list:
+    """Median-time (and peak-memory) ratios against a previous run's results"""
+    previous = {(r["dataset"], r["name"]): r for r in baseline["results"]}
+    comparison = []
+    for result in results:
+        before = previous.get((result["dataset"], result["name"]))
+        if before is None or (result.get("error") and before.get("error")):
+            continue
+        if result.get("error") or before.get("error"):
+            # A case that started or stopped failing has no time ratio
+            comparison.append({
+                "dataset": result["dataset"],
+                "name": result["name"],
+                "baseline_median_s": before["median_s"],
+                "median_s": result["median_s"],
+                "ratio": None,
+                "memory_ratio": None,
+                "status": "failing" if result.get("error") else "fixed",
+            })
+            continue
+        ratio = result["median_s"] / before["median_s"]
+        if ratio > 1 + threshold:
+            status = "slower"
+        elif ratio < 1 - threshold:
+            status = "faster"
+        else:
+            status = "unchanged"
+        memory_ratio = None
+        if result["peak_memory_bytes"] and before.get("peak_memory_bytes"):
+            memory_ratio = result["peak_memory_bytes"] / before["peak_memory_bytes"]
+        comparison.append({
+            "dataset": result["dataset"],
+            "name": result["name"],
+            "baseline_median_s": before["median_s"],
+            "median_s": result["median_s"],
+            "ratio": ratio,
+            "memory_ratio": memory_ratio,
+            "status": status,
+        })
+    return comparison
+
+
+def run_benchmarks(dataset_names: list, repeat: int, track_memory: bool) -> list:
+    from fastapi.testclient import TestClient
+    import main
+    from dataset_store import dataset_store, dataset_name
+    from pipeline import run_prediction
+    from charts import generate_charts
+    from database.mongo_client import (
+        db, save_dataframe_to_mongo, save_regression_result, list_user_results, save_user_file
+    )
+
+    def reset_dataset_store():
+        """Forget stored datasets so the next upload is parsed from scratch"""
+        shutil.rmtree(dataset_store.root)
+        os.makedirs(dataset_store.objects_dir)
+
+    results = []
+    with TestClient(main.app) as client:
+        client.post('/api/register', data={'username': 'bench', 'password': 'bench'})
+        token = client.post('/api/login', data={'username': 'bench', 'password': 'bench'}).json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        for dataset in dataset_names:
+            df = make_dataset(**DATASETS[dataset])
+            csv_bytes = df.to_csv(index=False).encode()
+            filename = f"bench_{dataset}.csv"
+
+            parquet_buffer = io.BytesIO()
+            df.to_parquet(parquet_buffer, index=False)
+            parquet_bytes = parquet_buffer.getvalue()
+
+            def upload(query='', name=filename, content=csv_bytes):
+                response = client.post('/api/upload' + query, headers=headers,
+                                       files={'file': (name, content, 'application/octet-stream')})
+                assert 'error' not in response.json(), response.json()
+
+            results.append(measure("upload", dataset, upload, repeat, reset_dataset_store, track_memory))
+            results.append(measure("upload_streaming", dataset, lambda: upload('?streaming=true'), repeat,
+                                   reset_dataset_store, track_memory))
+            # Identical content again: served from the content-addressed store
+            results.append(measure("upload_dedup", dataset, upload, repeat, None, track_memory))
+            results.append(measure("upload_parquet", dataset,
+                                   lambda: upload(name=f"bench_{dataset}.parquet", content=parquet_bytes), repeat,
+                                   reset_dataset_store, track_memory))
+            # The parquet runs cleared the store; the cases below use the CSV dataset
+            upload()
+
+            # Datasets with nulls run these too: what the pipeline cannot handle is recorded as an error
+            for model_type, target in MODEL_TARGETS.items():
+                def predict():
+                    result = run_prediction(dataset_name("bench", filename), target, model_type, artifact_key=f"bench-{model_type}")
+                    assert 'error' not in result, result['error']
+                results.append(measure(f"predict_{model_type}", dataset, predict, repeat, None, track_memory))
+
+            rng = np.random.default_rng(0)
+            y_test = df["sales"].to_numpy()[: max(1, len(df) // 5)]
+            y_pred = y_test + rng.normal(scale=5, size=len(y_test))
+            feature_columns = [col for col in df.columns if col.startswith("num_")]
+            results.append(measure(
+                "generate_charts", dataset,
+                lambda: generate_charts(df, "sales", feature_columns, y_test, y_pred, False),
+                repeat, None, track_memory
+            ))
+
+            collection = f"bench_{dataset}_rows"
+            def drop_collection():
+                db[collection].drop()
+            for layout in ("rows", "columnar"):
+                results.append(measure(
+                    f"mongo_save_dataframe_{layout}", dataset,
+                    lambda: save_dataframe_to_mongo(collection, df, layout=layout),
+                    repeat, drop_collection, track_memory
+                ))
+
+        # Persistence of results and files does not depend on the dataset
+        result_doc = {"target_column": "sales", "metrics": {"r2_score": 0.9}, "feature_columns": ["num_0"]}
+        def save_results():
+            for i in range(200):
+                save_regression_result("bench", f"file_{i}.csv", result_doc)
+        def save_files():
+            for i in range(200):
+                save_user_file("bench", f"file_{i}.csv", {"n_rows": i})
+        def list_results():
+            cursor = None
+            while True:
+                _, cursor = list_user_results("bench", limit=20, cursor=cursor)
+                if cursor is None:
+                    break
+        results.append(measure("mongo_save_regression_result_x200", "-", save_results, repeat, None, track_memory))
+        results.append(measure("mongo_save_user_file_x200", "-", save_files, repeat, None, track_memory))
+        results.append(measure("mongo_list_user_results_all_pages", "-", list_results, repeat, None, track_memory))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasets', default='small', help=f"Comma-separated: {', '.join(DATASETS)}")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc peak-memory run")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    parser.add_argument('--baseline', help="JSON report of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="Relative change in median time reported as slower/faster")
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help="Exit with status 1 if any case is slower than the baseline or newly fails")
+    args = parser.parse_args()
+
+    dataset_names = [name.strip() for name in args.datasets.split(',') if name.strip()]
+    unknown = [name for name in dataset_names if name not in DATASETS]
+    if unknown:
+        parser.error(f"Unknown datasets: {', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix='insightfull-bench-')
+    os.environ['DATASET_DIR'] = os.path.join(workdir, 'datasets')
+    os.environ['ARTIFACT_DIR'] = os.path.join(workdir, 'artifacts')
+    # The pipeline runs in this process; do not start a worker pool as well
+    os.environ['PREDICT_WARMUP'] = '0'
+    use_in_memory_mongo()
+    try:
+        results = run_benchmarks(dataset_names, args.repeat, not args.no_memory)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "datasets": {name: DATASETS[name] for name in dataset_names},
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare_to_baseline(results, json.load(f), args.threshold)
+        regressions = [row for row in report["comparison"] if row["status"] in ("slower", "failing")]
+        for row in report["comparison"]:
+            ratio = f"x{row['ratio']:.2f}" if row["ratio"] is not None else "-"
+            print(f"{row['dataset']:>8} {row['name']:<32} {ratio} {row['status']}", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    if args.fail_on_regression and regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Import-time report for the backend: how long `import main` takes in a
+fresh interpreter and the resident memory it leaves, with and without the
+ML and plotting stacks that execution.preload_modules loads at warm-up.
+
+Run from the backend directory:
+
+    python -m benchmarks.startup --output startup.json
+    python -m benchmarks.startup --baseline startup.json --fail-on-regression
+
+Results use the same layout as benchmarks.run (peak_memory_bytes is the
+process's peak RSS), so the two reports can be compared the same way.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.run import compare_to_baseline
+
+HEAVY_MODULES = ('pandas', 'pyarrow', 'sklearn', 'scipy', 'matplotlib', 'seaborn', 'joblib')
+
+# Runs in a fresh interpreter; prints one JSON line
+CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+seconds = time.perf_counter() - start
+if PRELOAD:
+    from execution import preload_modules
+    preload_modules()
+    seconds = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+print(json.dumps({"seconds": seconds, "rss": rss, "modules": [m for m in HEAVY if m in sys.modules]}))
+"""
+
+
+def child_env(workdir: str) -> dict:
+    return dict(os.environ, DATASET_DIR=os.path.join(workdir, 'datasets'), ARTIFACT_DIR=os.path.join(workdir, 'artifacts'))
+
+
+def measure_import(name: str, preload: bool, repeat: int, env: dict) -> dict:
+    code = f"PRELOAD = {preload}\nHEAVY = {HEAVY_MODULES!r}\n" + CHILD
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], env=env, check=True, capture_output=True, text=True)
+        runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    times = [run["seconds"] for run in runs]
+    result = {
+        "name": name,
+        "dataset": "-",
+        "repeat": repeat,
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "mean_s": statistics.mean(times),
+        "peak_memory_bytes": int(statistics.median(run["rss"] for run in runs)),
+        "heavy_modules": runs[-1]["modules"],
+    }
+    print(f"{name:<24} median {result['median_s'] * 1000:8.1f} ms  rss {result['peak_memory_bytes'] / 2 ** 20:7.1f} MiB"
+          f"  loaded: {', '.join(result['heavy_modules']) or '-'}", file=sys.stderr)
+    return result
+
+
+def slowest_imports(env: dict, top: int) -> list:
+    """Top-level packages by cumulative import time, from python -X importtime"""
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'],
+                            env=env, check=True, capture_output=True, text=True)
+    packages, pending = {}, {}
+    for line in output.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)', line)
+        if not match:
+            continue
+        depth = (len(match.group(2)) - 1) // 2
+        # Modules are listed after everything they import, so main's direct
+        # imports are the depth-1 lines just before main itself
+        if depth == 1:
+            pending[match.group(3)] = int(match.group(1)) / 1e6
+        elif depth == 0:
+            if match.group(3) == 'main':
+                packages = pending
+            pending = {}
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"module": module, "cumulative_s": seconds} for module, seconds in ranked]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help="Number of slowest imports to report")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    parser.add_argument('--baseline', help="JSON report of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="Relative change in median time reported as slower/faster")
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help="Exit with status 1 if any case is slower than the baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='insightfull-startup-') as workdir:
+        env = child_env(workdir)
+        results = [
+            measure_import("import_main", False, args.repeat, env),
+            measure_import("import_main_preloaded", True, args.repeat, env),
+        ]
+        report = {"results": results, "slowest_imports": slowest_imports(env, args.top)}
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare_to_baseline(results, json.load(f), args.threshold)
+        regressions = [row for row in report["comparison"] if row["status"] == "slower"]
+        for row in report["comparison"]:
+            print(f"{row['name']:<24} x{row['ratio']:.2f} {row['status']}", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    if args.fail_on_regression and regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import os
+import numpy as np
+
+# Upper bound on scatter points sent to the client
+CHART_DATA_MAX_POINTS = int(os.getenv('CHART_DATA_MAX_POINTS', 2000))
+# "grid" keeps one weighted point per occupied grid cell; "lttb" keeps the
+# visually significant points of the predictions ordered by actual value
+CHART_DATA_DOWNSAMPLE = os.getenv('CHART_DATA_DOWNSAMPLE', 'grid')
+
+
+def lttb(x, y, threshold: int):
+    """
+    Largest-Triangle-Three-Buckets downsampling of points ordered by x.
+    Returns the indices of the kept points.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    # Interior points are split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[end:next_end].mean() if next_end > end else x[-1]
+        next_y = y[end:next_end].mean() if next_end > end else y[-1]
+        # Pick the point forming the largest triangle with the previous pick and the next bucket's mean
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous]) -
+            (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[i + 1] = previous
+    return kept
+
+
+def grid_downsample(x, y, max_points: int):
+    """
+    Aggregate points into a square grid with about `max_points` cells.
+    Returns (x, y, count) arrays with one mean point per occupied cell.
+    """
+    side = max(1, int(np.sqrt(max_points)))
+    x_span = np.ptp(x) or 1.0
+    y_span = np.ptp(y) or 1.0
+    col = np.minimum(((x - x.min()) / x_span * side).astype(np.int64), side - 1)
+    row = np.minimum(((y - y.min()) / y_span * side).astype(np.int64), side - 1)
+    cells, inverse, counts = np.unique(row * side + col, return_inverse=True, return_counts=True)
+    sum_x = np.bincount(inverse, weights=x, minlength=len(cells))
+    sum_y = np.bincount(inverse, weights=y, minlength=len(cells))
+    return sum_x / counts, sum_y / counts, counts
+
+
+def _finite_or_none(values):
+    return [[None if not np.isfinite(v) else float(v) for v in row] for row in values]
+
+
+def scatter_points(y_test, y_pred, max_points: int = CHART_DATA_MAX_POINTS, method: str = CHART_DATA_DOWNSAMPLE) -> dict:
+    """Actual-vs-predicted points, downsampled to at most `max_points`"""
+    x = np.asarray(y_test, dtype=float)
+    y = np.asarray(y_pred, dtype=float)
+    data = {"kind": "scatter", "total_points": int(len(x))}
+    if len(x) <= max_points:
+        data.update(method="none", points=[[float(a), float(b), 1] for a, b in zip(x, y)])
+    elif method == "lttb":
+        order = np.argsort(x, kind='stable')
+        kept = order[lttb(x[order], y[order], max_points)]
+        data.update(method="lttb", points=[[float(x[i]), float(y[i]), 1] for i in kept])
+    else:
+        gx, gy, counts = grid_downsample(x, y, max_points)
+        data.update(method="grid", points=[[float(a), float(b), int(c)] for a, b, c in zip(gx, gy, counts)])
+    data["range"] = [float(min(x.min(), y.min())), float(max(x.max(), y.max()))] if len(x) else [0.0, 0.0]
+    return data
+
+
+def confusion_counts(y_test, y_pred, labels) -> dict:
+    """Confusion matrix of encoded class labels (rows: actual, columns: predicted)"""
+    n = len(labels)
+    matrix = np.zeros((n, n), dtype=np.int64)
+    np.add.at(matrix, (np.asarray(y_test, dtype=np.int64), np.asarray(y_pred, dtype=np.int64)), 1)
+    return {"kind": "confusion_matrix", "labels": list(labels), "matrix": matrix.tolist()}
+
+
+def build_chart_data(meta: dict, arrays: dict, class_labels=None) -> dict:
+    """
+    JSON-ready data for each chart, built from charts.build_chart_inputs
+    output, so clients can draw the charts themselves.
+    """
+    data = {}
+    if "correlation_heatmap" in meta["chart_types"]:
+        data["correlation_heatmap"] = {
+            "columns": meta["correlation_columns"],
+            "matrix": _finite_or_none(arrays["correlation"]),
+        }
+
+    if meta["is_classification"]:
+        labels = class_labels or [str(i) for i in range(int(max(arrays["y_test"].max(), arrays["y_pred"].max())) + 1)]
+        data["actual_vs_predicted"] = confusion_counts(arrays["y_test"], arrays["y_pred"], labels)
+        data["target_distribution"] = {
+            "kind": "bar",
+            "labels": meta["target_labels"],
+            "counts": arrays["target_counts"].tolist(),
+        }
+    else:
+        data["actual_vs_predicted"] = scatter_points(arrays["y_test"], arrays["y_pred"])
+        data["target_distribution"] = {
+            "kind": "histogram",
+            "edges": arrays["target_edges"].tolist(),
+            "counts": arrays["target_counts"].tolist(),
+        }
+    data["target_distribution"]["column"] = meta["target_column"]
+    return data
@@ -0,0 +1,203 @@
+import io
+import base64
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from artifacts import load_arrays
+
+# matplotlib and seaborn are imported on first render, keeping them out of
+# startup. Pin the non-interactive backend for whatever imports pyplot first.
+os.environ['MPLBACKEND'] = 'Agg'
+
+CHART_TYPES = ["correlation_heatmap", "actual_vs_predicted", "target_distribution"]
+
+# Output presets; "high" matches the original 300-dpi PNGs, "compact" trades
+# resolution for much smaller WebP files
+CHART_PRESETS = {
+    "standard": {"format": "png", "dpi": 100, "scale": 1.0},
+    "high": {"format": "png", "dpi": 300, "scale": 1.0},
+    "compact": {"format": "webp", "dpi": 72, "scale": 0.75},
+}
+CHART_PRESET = os.getenv('CHART_PRESET', 'standard')
+CHART_FORMAT = os.getenv('CHART_FORMAT') or None
+CHART_DPI = int(os.getenv('CHART_DPI', 0)) or None
+MEDIA_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "svg": "image/svg+xml",
+}
+# Cell annotations are unreadable (and slow to lay out) on large heatmaps
+CHART_ANNOTATE_MAX_COLUMNS = int(os.getenv('CHART_ANNOTATE_MAX_COLUMNS', 12))
+CHART_RENDER_THREADS = int(os.getenv('CHART_RENDER_THREADS', len(CHART_TYPES)))
+
+_render_pool = None
+
+
+def chart_options(preset: str = None, fmt: str = None, dpi: int = None) -> dict:
+    """
+    Resolve output options: explicit arguments win over the preset, which
+    falls back to the CHART_PRESET / CHART_FORMAT / CHART_DPI settings.
+    """
+    preset = preset or CHART_PRESET
+    if preset not in CHART_PRESETS:
+        raise ValueError(f"Unknown chart preset: {preset}")
+    options = dict(CHART_PRESETS[preset])
+    if preset == CHART_PRESET:
+        options["format"] = CHART_FORMAT or options["format"]
+        options["dpi"] = CHART_DPI or options["dpi"]
+    if fmt:
+        options["format"] = fmt
+    if dpi:
+        options["dpi"] = dpi
+    if options["format"] not in MEDIA_TYPES:
+        raise ValueError(f"Unsupported chart format: {options['format']}")
+    return options
+
+
+def build_chart_inputs(df, target_col, feature_cols, y_test, y_pred, is_classification=False):
+    """
+    Reduce the data behind each chart to what is needed to draw it: the
+    correlation matrix, target counts or histogram bins, and test-set
+    predictions. Returns (meta, arrays) for artifacts.save_arrays.
+    """
+    meta = {"target_column": target_col, "is_classification": bool(is_classification), "chart_types": []}
+    arrays = {"y_test": np.asarray(y_test), "y_pred": np.asarray(y_pred)}
+
+    numeric_cols = df[feature_cols + [target_col]].select_dtypes(include=[np.number]).columns.tolist()
+    if len(numeric_cols) > 1:
+        meta["correlation_columns"] = numeric_cols
+        arrays["correlation"] = df[numeric_cols].corr().to_numpy()
+        meta["chart_types"].append("correlation_heatmap")
+    meta["chart_types"].append("actual_vs_predicted")
+
+    if is_classification:
+        counts = df[target_col].value_counts()
+        meta["target_labels"] = [str(label) for label in counts.index]
+        arrays["target_counts"] = counts.to_numpy()
+    else:
+        counts, edges = np.histogram(df[target_col].dropna(), bins=20)
+        arrays["target_counts"] = counts
+        arrays["target_edges"] = edges
+    meta["chart_types"].append("target_distribution")
+    return meta, arrays
+
+
+def _draw_correlation_heatmap(fig, meta, arrays):
+    import seaborn as sns
+    ax = fig.subplots()
+    columns = meta["correlation_columns"]
+    correlation_matrix = pd.DataFrame(arrays["correlation"], index=columns, columns=columns)
+    annotate = len(columns) <= CHART_ANNOTATE_MAX_COLUMNS
+    sns.heatmap(correlation_matrix, annot=annotate, fmt='.2f', cmap='coolwarm', center=0, ax=ax)
+    ax.set_title('Correlation Heatmap')
+
+
+def _draw_actual_vs_predicted(fig, meta, arrays):
+    ax = fig.subplots()
+    y_test, y_pred = arrays["y_test"], arrays["y_pred"]
+    if meta["is_classification"]:
+        # For classification, show confusion matrix-like visualization
+        ax.scatter(range(len(y_test)), y_test, alpha=0.6, label='Actual', s=50)
+        ax.scatter(range(len(y_pred)), y_pred, alpha=0.6, label='Predicted', s=50, marker='x')
+        ax.set_xlabel('Sample Index')
+        ax.set_ylabel('Class')
+        ax.set_title('Actual vs Predicted Classes')
+        ax.legend()
+    else:
+        # For regression, show scatter plot
+        ax.scatter(y_test, y_pred, alpha=0.6)
+        ax.plot([y_test.min(), y_test.max()], [y_test.min(), y_test.max()], 'r--', lw=2)
+        ax.set_xlabel('Actual Values')
+        ax.set_ylabel('Predicted Values')
+        ax.set_title('Actual vs Predicted Values')
+
+
+def _draw_target_distribution(fig, meta, arrays):
+    ax = fig.subplots()
+    target_col = meta["target_column"]
+    if meta["is_classification"]:
+        # For classification, show bar chart
+        labels = meta["target_labels"]
+        ax.bar(range(len(labels)), arrays["target_counts"])
+        ax.set_xticks(range(len(labels)))
+        ax.set_xticklabels(labels, rotation=45)
+        ax.set_ylabel('Count')
+    else:
+        # For regression, show histogram
+        edges = arrays["target_edges"]
+        ax.hist(edges[:-1], bins=edges, weights=arrays["target_counts"], alpha=0.7, edgecolor='black')
+        ax.set_ylabel('Frequency')
+    ax.set_xlabel(target_col)
+    ax.set_title(f'Distribution of {target_col}')
+
+
+_CHARTS = {
+    "correlation_heatmap": (_draw_correlation_heatmap, (10, 8)),
+    "actual_vs_predicted": (_draw_actual_vs_predicted, (8, 6)),
+    "target_distribution": (_draw_target_distribution, (8, 6)),
+}
+
+
+def render_chart(chart_type: str, meta: dict, arrays: dict, options: dict = None) -> bytes:
+    """
+    Render one chart from build_chart_inputs output.
+    Each call draws on its own Figure with the Agg canvas and never touches
+    pyplot's global state, so charts can be rendered from several threads.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    if chart_type not in _CHARTS:
+        raise ValueError(f"Unknown chart type: {chart_type}")
+    options = options or chart_options()
+    draw, (width, height) = _CHARTS[chart_type]
+
+    fig = Figure(figsize=(width * options["scale"], height * options["scale"]), layout='tight')
+    FigureCanvasAgg(fig)
+    draw(fig, meta, arrays)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=options["format"], dpi=options["dpi"], bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def render_charts(meta: dict, arrays: dict, options: dict = None) -> dict:
+    """Render every available chart in parallel; returns {chart_type: bytes}"""
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ThreadPoolExecutor(max_workers=CHART_RENDER_THREADS, thread_name_prefix='chart')
+    options = options or chart_options()
+    futures = {
+        chart_type: _render_pool.submit(render_chart, chart_type, meta, arrays, options)
+        for chart_type in meta["chart_types"]
+    }
+    return {chart_type: future.result() for chart_type, future in futures.items()}
+
+
+def render_stored_chart(chart_key: str, chart_type: str, options: dict = None) -> bytes:
+    """Render a chart from the inputs saved by run_prediction"""
+    meta, arrays = load_arrays('charts', chart_key)
+    if chart_type not in meta["chart_types"]:
+        raise KeyError(chart_type)
+    return render_chart(chart_type, meta, arrays, options)
+
+
+def generate_charts(df, target_col, feature_cols, y_test, y_pred, is_classification=False, options: dict = None,
+                    inputs: tuple = None):
+    """
+    Generate basic charts and return them as base64 encoded images.
+    `inputs` are precomputed (meta, arrays) from build_chart_inputs.
+    """
+    charts = {}
+
+    try:
+        options = options or chart_options()
+        meta, arrays = inputs or build_chart_inputs(df, target_col, feature_cols, y_test, y_pred, is_classification)
+        media_type = MEDIA_TYPES[options["format"]]
+        for chart_type, image in render_charts(meta, arrays, options).items():
+            charts[chart_type] = f"data:{media_type};base64,{base64.b64encode(image).decode()}"
+    except Exception as e:
+        charts = {"error": f"Chart generation failed: {str(e)}"}
+
+    return charts
@@ -0,0 +1,90 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Store numerics in the narrowest lossless dtype and load strings compactly;
+# set to 0 to keep pandas' default int64/float64/object frames
+COMPACT_DTYPES = os.getenv('COMPACT_DTYPES', '1') == '1'
+# Low-cardinality string columns load as categoricals: at most this many
+# distinct values per row, and at most COMPACT_CATEGORY_MAX distinct values
+COMPACT_CATEGORY_RATIO = float(os.getenv('COMPACT_CATEGORY_RATIO', 0.05))
+COMPACT_CATEGORY_MAX = int(os.getenv('COMPACT_CATEGORY_MAX', 10000))
+
+ARROW_STRING = pd.StringDtype('pyarrow')
+
+
+def memory_usage(df: pd.DataFrame) -> int:
+    """Bytes held by a frame's columns, including the Python objects in object columns"""
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+def downcast_series(series: pd.Series) -> pd.Series:
+    """
+    The same values in the narrowest numeric dtype that holds them exactly:
+    integers in the smallest signed int, floats in float32 only when every
+    value survives the round trip. Other dtypes are returned unchanged.
+    """
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return series
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return pd.to_numeric(series, downcast='integer')
+    if series.dtype == np.float64:
+        values = series.to_numpy()
+        with np.errstate(over='ignore', invalid='ignore'):
+            narrow = values.astype(np.float32)
+        if np.array_equal(narrow.astype(np.float64), values, equal_nan=True):
+            return pd.Series(narrow, index=series.index, name=series.name)
+    return series
+
+
+def downcast_numerics(df: pd.DataFrame) -> pd.DataFrame:
+    """Downcast every numeric column of a parsed chunk before it is stored"""
+    if not COMPACT_DTYPES:
+        return df
+    return pd.DataFrame({col: downcast_series(df[col]) for col in df.columns}, index=df.index, copy=False)
+
+
+def compact_column(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Dictionary-encode a low-cardinality string column (it loads as a pandas categorical)"""
+    if not (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)) or len(column) == 0:
+        return column
+    distinct = pc.count_distinct(column).as_py()
+    if distinct > COMPACT_CATEGORY_RATIO * len(column) or distinct > COMPACT_CATEGORY_MAX:
+        return column
+    return column.dictionary_encode()
+
+
+def _types_mapper(arrow_type):
+    # Remaining strings stay in Arrow buffers instead of becoming Python objects
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return ARROW_STRING
+    return None
+
+
+def table_to_pandas(table: pa.Table, categoricals: bool = True) -> pd.DataFrame:
+    """
+    Convert a stored table to its compact in-memory frame: low-cardinality
+    strings as categoricals (unless `categoricals` is False, e.g. for
+    batches whose categories would not line up) and other strings as
+    Arrow-backed strings. Numerics keep the dtypes they were stored with.
+    """
+    if not COMPACT_DTYPES:
+        return table.to_pandas(split_blocks=True)
+    if categoricals:
+        table = pa.table([compact_column(column) for column in table.columns], names=table.column_names)
+    return table.to_pandas(split_blocks=True, types_mapper=_types_mapper)
+
+
+def memory_report(table: pa.Table, parsed_bytes: int) -> dict:
+    """
+    Memory a dataset takes as parsed by pandas and once loaded from the
+    store, with the dtypes it loads as. Columns are converted one at a time.
+    """
+    compact_bytes, dtypes = 0, {}
+    for i, name in enumerate(table.column_names):
+        frame = table_to_pandas(table.select([i]))
+        compact_bytes += memory_usage(frame)
+        dtypes[name] = str(frame.dtypes.iloc[0])
+    return {"parsed_bytes": int(parsed_bytes), "compact_bytes": compact_bytes, "dtypes": dtypes}
@@ -0,0 +1,353 @@
+import json
+import os
+import tempfile
+import threading
+from urllib.parse import quote, unquote
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from compaction import table_to_pandas
+from caching import LRUCache
+
+# Shared by every uvicorn worker on the host; point it at a common volume
+DATASET_DIR = os.getenv('DATASET_DIR', os.path.join(tempfile.gettempdir(), 'insightfull', 'datasets'))
+# Memory-mapped tables each process keeps open; least recently used ones are
+# closed (their data stays on disk) once their total size exceeds this
+DATASET_CACHE_BYTES = int(os.getenv('DATASET_CACHE_BYTES', 2 * 1024 ** 3))
+
+
+def dataset_name(username: str, filename: str) -> str:
+    """
+    Store name of a user's upload; every user has their own namespace.
+    Raises ValueError for file names that could reach outside it.
+    """
+    if not filename or '/' in filename:
+        raise ValueError(f"Invalid file name: {filename!r}")
+    return f"{quote(username, safe='')}/{filename}"
+
+
+def dataframe_to_table(df: pd.DataFrame, schema: pa.Schema = None) -> pa.Table:
+    """
+    Convert a DataFrame to an Arrow table.
+    Object columns holding mixed types are stored as strings.
+    """
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        mixed = {col: df[col].astype(str).where(df[col].notna(), None)
+                 for col in df.columns if df[col].dtype == 'object'}
+        table = pa.Table.from_pandas(df.assign(**mixed), preserve_index=False)
+    table = table.replace_schema_metadata(None)
+    if schema is not None and not table.schema.equals(schema):
+        table = table.cast(schema)
+    return table
+
+
+def _promote_schema(current: pa.Schema, incoming: pa.Schema) -> pa.Schema:
+    """
+    Widen a schema so chunks with conflicting inferred types fit in one file:
+    integers of different widths take the wider one, other mixed numeric
+    columns become float64, anything else becomes string.
+    """
+    fields = []
+    for field in current:
+        other = incoming.field(field.name).type
+        if field.type == other or pa.types.is_null(other):
+            fields.append(field)
+        elif pa.types.is_null(field.type):
+            fields.append(pa.field(field.name, other))
+        elif pa.types.is_signed_integer(field.type) and pa.types.is_signed_integer(other):
+            fields.append(pa.field(field.name, max(field.type, other, key=lambda t: t.bit_width)))
+        elif _is_numeric(field.type) and _is_numeric(other):
+            fields.append(pa.field(field.name, pa.float64()))
+        else:
+            fields.append(pa.field(field.name, pa.string()))
+    return pa.schema(fields)
+
+
+def _is_numeric(arrow_type) -> bool:
+    return pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type) or pa.types.is_boolean(arrow_type)
+
+
+def _dataset_sizes(directory: str) -> dict:
+    sizes = {}
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return sizes
+    for entry in entries:
+        if entry.name.endswith('.arrow'):
+            try:
+                sizes[unquote(entry.name[:-len('.arrow')])] = entry.stat().st_size
+            except FileNotFoundError:
+                pass  # Removed or re-pointed meanwhile
+    return sizes
+
+
+class DatasetWriter:
+    """
+    Appends DataFrame chunks to an Arrow IPC file.
+    The file only becomes visible to readers when the writer is committed.
+    """
+
+    def __init__(self, path: str, on_commit=None):
+        self.path = path
+        self.on_commit = on_commit
+        self.tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self.schema = None
+        self._writer = None
+        self._sink = None
+
+    def write(self, chunk: pd.DataFrame):
+        table = dataframe_to_table(chunk)
+        if self._writer is None:
+            self._open(table.schema)
+        elif not table.schema.equals(self.schema):
+            promoted = _promote_schema(self.schema, table.schema)
+            if not promoted.equals(self.schema):
+                self._rewrite(promoted)
+            table = table.cast(self.schema)
+        self._writer.write_table(table)
+
+    def _open(self, schema: pa.Schema):
+        self.schema = schema
+        self._sink = pa.OSFile(self.tmp_path, 'wb')
+        self._writer = ipc.new_file(self._sink, schema)
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer = None
+            self._sink = None
+
+    def _rewrite(self, schema: pa.Schema):
+        """Re-encode the batches written so far with a widened schema"""
+        self._close()
+        old_path = self.tmp_path + '.old'
+        os.replace(self.tmp_path, old_path)
+        try:
+            self._open(schema)
+            with pa.memory_map(old_path, 'r') as source:
+                reader = ipc.open_file(source)
+                for i in range(reader.num_record_batches):
+                    self._writer.write_table(pa.Table.from_batches([reader.get_batch(i)]).cast(schema))
+        finally:
+            os.remove(old_path)
+
+    def commit(self):
+        if self._writer is None:
+            raise ValueError("No data was written to the dataset")
+        self._close()
+        os.replace(self.tmp_path, self.path)
+        if self.on_commit is not None:
+            self.on_commit()
+
+    def abort(self):
+        self._close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+
+class DatasetStore:
+    """
+    Disk-backed store of parsed uploads in Arrow IPC format.
+
+    Each dataset is written once and opened by every worker through a
+    memory map, so reads are zero-copy and the page cache is shared
+    between processes.
+
+    Datasets are content-addressed: the parsed data lives in
+    objects/<sha256 of the upload>.arrow next to a JSON profile, and each
+    dataset name is a symlink to its object. Uploading identical content
+    again only re-points the name. Names made by dataset_name() live in a
+    directory per user, so usage can be accounted per user. A content
+    object is removed with the last name that points at it.
+    """
+
+    def __init__(self, root: str = DATASET_DIR, cache_bytes: int = DATASET_CACHE_BYTES):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        # name -> (file identity, memory-mapped table)
+        self._tables = LRUCache(max_bytes=cache_bytes, sizeof=lambda entry: entry[1].nbytes)
+        self._lock = threading.Lock()
+
+    def path_for(self, name: str) -> str:
+        return os.path.join(self.root, *(quote(part, safe='') for part in name.split('/', 1))) + '.arrow'
+
+    def namespace_dir(self, username: str) -> str:
+        return os.path.join(self.root, quote(username, safe=''))
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self.path_for(name))
+
+    def content_path(self, content_hash: str) -> str:
+        return os.path.join(self.objects_dir, content_hash + '.arrow')
+
+    def _profile_path(self, content_hash: str) -> str:
+        return os.path.join(self.objects_dir, content_hash + '.json')
+
+    def link(self, name: str, content_hash: str):
+        """Atomically point a dataset name at stored content"""
+        path = self.path_for(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.link"
+        os.symlink(os.path.relpath(self.content_path(content_hash), os.path.dirname(path)), tmp_path)
+        os.replace(tmp_path, path)
+
+    def content_hash_of(self, name: str):
+        """Content hash a dataset name points at, or None"""
+        path = self.path_for(name)
+        if not os.path.islink(path):
+            return None
+        return os.path.basename(os.readlink(path))[:-len('.arrow')]
+
+    def writer(self, name: str, content_hash: str = None) -> DatasetWriter:
+        """
+        Writer for a dataset. With a content hash the data is stored as a
+        content object and the name is linked to it on commit.
+        """
+        if content_hash is None:
+            os.makedirs(os.path.dirname(self.path_for(name)), exist_ok=True)
+            return DatasetWriter(self.path_for(name))
+        return DatasetWriter(self.content_path(content_hash), on_commit=lambda: self.link(name, content_hash))
+
+    def put_dataframe(self, name: str, df: pd.DataFrame, content_hash: str = None):
+        with self.writer(name, content_hash) as writer:
+            writer.write(df)
+
+    def put_profile(self, content_hash: str, profile: dict):
+        path = self._profile_path(content_hash)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(profile, f)
+        os.replace(tmp_path, path)
+
+    def get_profile(self, content_hash: str):
+        """
+        Stored profile of previously parsed content, or None if the content
+        (or its profile) is not in the store.
+        """
+        path = self._profile_path(content_hash)
+        if not os.path.exists(self.content_path(content_hash)) or not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def open_table(self, name: str) -> pa.Table:
+        """
+        Return the memory-mapped Arrow table for a dataset.
+        Tables are cached per process, least recently used ones closed first
+        beyond DATASET_CACHE_BYTES, and reopened when the file is replaced.
+        """
+        path = self.path_for(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise KeyError(name)
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._tables.get(name)
+            if cached is not None and cached[0] == identity:
+                return cached[1]
+            with pa.memory_map(path, 'r') as source:
+                table = ipc.open_file(source).read_all()
+            self._tables.set(name, (identity, table))
+            return table
+
+    def load_dataframe(self, name: str, compact: bool = True) -> pd.DataFrame:
+        """
+        The dataset as a DataFrame, in its compact form (see compaction.py)
+        unless `compact` is False; plain frames hold strings as Python objects.
+        """
+        table = self.open_table(name)
+        return table_to_pandas(table) if compact else table.to_pandas(split_blocks=True)
+
+    def iter_dataframes(self, name: str, columns: list = None, batch_rows: int = 100000):
+        """
+        Yield a dataset as DataFrames of at most `batch_rows` rows.
+        Only one batch is converted from the memory map at a time, so memory
+        use does not grow with the size of the dataset. Strings are not
+        turned into categoricals, whose categories would differ per batch.
+        """
+        table = self.open_table(name)
+        if columns is not None:
+            table = table.select(columns)
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            yield table_to_pandas(pa.Table.from_batches([batch]), categoricals=False)
+
+    def usage(self, username: str) -> dict:
+        """Stored size in bytes of each of a user's datasets, by file name"""
+        return _dataset_sizes(self.namespace_dir(username))
+
+    def total_usage(self) -> int:
+        """Stored bytes of every user's datasets (shared content counts once per name)"""
+        return sum(sum(_dataset_sizes(entry.path).values()) for entry in os.scandir(self.root)
+                   if entry.is_dir(follow_symlinks=False) and entry.name != 'objects')
+
+    def table_cache_stats(self) -> dict:
+        return self._tables.stats()
+
+    def size_of(self, name: str) -> int:
+        """Size in bytes of a stored dataset; raises KeyError if it does not exist"""
+        try:
+            return os.stat(self.path_for(name)).st_size
+        except FileNotFoundError:
+            raise KeyError(name)
+
+    def delete(self, name: str):
+        """Remove a dataset name, and its content object if no other name points at it"""
+        content_hash = self.content_hash_of(name)
+        with self._lock:
+            self._tables.pop(name, None)
+        path = self.path_for(name)
+        if os.path.lexists(path):
+            os.remove(path)
+        if content_hash is not None:
+            self.release(content_hash)
+
+    def _is_referenced(self, content_hash: str) -> bool:
+        """Whether any dataset name links to the content"""
+        target = content_hash + '.arrow'
+        directories = [self.root] + [entry.path for entry in os.scandir(self.root)
+                                     if entry.is_dir(follow_symlinks=False) and entry.name != 'objects']
+        for directory in directories:
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_symlink() and os.path.basename(os.readlink(entry.path)) == target:
+                        return True
+                except FileNotFoundError:
+                    pass  # Removed meanwhile
+        return False
+
+    def release(self, content_hash: str) -> bool:
+        """
+        Remove a content object and its profile once no dataset name points
+        at it, e.g. after a delete or a re-upload with other content.
+        Returns whether it was removed.
+        """
+        with self._lock:
+            if self._is_referenced(content_hash):
+                return False
+            for path in (self.content_path(content_hash), self._profile_path(content_hash)):
+                if os.path.exists(path):
+                    os.remove(path)
+            return True
+
+
+dataset_store = DatasetStore()
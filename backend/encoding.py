@@ -0,0 +1,197 @@
+import os
+import numpy as np
+import pandas as pd
+
+# "auto" encodes string, categorical and boolean columns as features; "none"
+# trains on numeric columns only
+CATEGORICAL_ENCODING = os.getenv('CATEGORICAL_ENCODING', 'auto')
+# Columns with at most this many levels are one-hot encoded, others are hashed
+ONEHOT_MAX_CATEGORIES = int(os.getenv('ONEHOT_MAX_CATEGORIES', 32))
+# Buckets each hashed column is folded into
+HASH_FEATURES = int(os.getenv('HASH_FEATURES', 256))
+# Columns with more distinct values per row than this look like identifiers
+# or free text and are not used
+CATEGORICAL_MAX_UNIQUE_RATIO = float(os.getenv('CATEGORICAL_MAX_UNIQUE_RATIO', 0.5))
+
+ENCODING_SETTINGS = {
+    "categorical_encoding": CATEGORICAL_ENCODING,
+    "onehot_max_categories": ONEHOT_MAX_CATEGORIES,
+    "hash_features": HASH_FEATURES,
+    "categorical_max_unique_ratio": CATEGORICAL_MAX_UNIQUE_RATIO,
+}
+
+
+def is_categorical_dtype_name(dtype: str) -> bool:
+    """Dtype names (as in column profiles) of columns that can be encoded as categories"""
+    return dtype in ('object', 'string', 'category', 'bool', 'boolean')
+
+
+def categorical_columns(df: pd.DataFrame, exclude: list = (), profile: dict = None) -> list:
+    """Columns to encode as categorical features, from the profile's dtypes when there is one"""
+    if CATEGORICAL_ENCODING == 'none':
+        return []
+    if profile is not None:
+        dtypes = {col: column_profile["dtype"] for col, column_profile in profile.items()}
+    else:
+        dtypes = {col: str(dtype) for col, dtype in df.dtypes.items()}
+    return [col for col, dtype in dtypes.items() if is_categorical_dtype_name(dtype) and col not in exclude]
+
+
+class FeatureEncoder:
+    """
+    Turns the feature columns of a frame into a model matrix.
+
+    Numeric columns are standardised as before. Categorical columns are
+    one-hot encoded, or hashed into HASH_FEATURES buckets when they have
+    more than ONEHOT_MAX_CATEGORIES levels, into a scipy sparse block that is
+    scaled to unit variance without centring (which would make it dense).
+    Levels not seen in training and missing values encode as all zeros.
+    Without categorical columns the matrix is the dense numeric block.
+    """
+
+    def __init__(self, numeric_columns: list, categorical_columns: list = ()):
+        self.numeric_columns = list(numeric_columns)
+        self.candidate_columns = list(categorical_columns)
+        self.onehot = {}   # column -> levels
+        self.hashed = []
+        self.dropped = []
+        self.numeric_scaler = None
+        self.categorical_scaler = None
+
+    @property
+    def feature_columns(self) -> list:
+        """Input columns the encoder uses"""
+        return self.numeric_columns + list(self.onehot) + self.hashed
+
+    @property
+    def sparse(self) -> bool:
+        return bool(self.onehot or self.hashed)
+
+    def fit(self, X: pd.DataFrame):
+        from sklearn.preprocessing import StandardScaler
+        for col in self.candidate_columns:
+            counts = X[col].value_counts()
+            counts = counts[counts > 0]  # Categorical columns also count unused categories
+            if len(counts) < 2 or (len(counts) > ONEHOT_MAX_CATEGORIES
+                                   and len(counts) > CATEGORICAL_MAX_UNIQUE_RATIO * len(X)):
+                self.dropped.append(col)
+            elif len(counts) <= ONEHOT_MAX_CATEGORIES:
+                self.onehot[col] = counts.index.tolist()
+            else:
+                self.hashed.append(col)
+        if self.numeric_columns:
+            self.numeric_scaler = StandardScaler().fit(self._numeric(X))
+        if self.sparse:
+            self.categorical_scaler = StandardScaler(with_mean=False).fit(self._categorical(X))
+        return self
+
+    def transform(self, X: pd.DataFrame):
+        import scipy.sparse as sp
+        numeric = (self.numeric_scaler.transform(self._numeric(X)) if self.numeric_columns
+                   else np.empty((len(X), 0)))
+        if not self.sparse:
+            return numeric
+        categorical = self.categorical_scaler.transform(self._categorical(X))
+        return sp.hstack([sp.csr_matrix(numeric), categorical], format='csr')
+
+    def fit_transform(self, X: pd.DataFrame):
+        return self.fit(X).transform(X)
+
+    def _numeric(self, X: pd.DataFrame) -> np.ndarray:
+        return X[self.numeric_columns].to_numpy(dtype=np.float64)
+
+    def _categorical(self, X: pd.DataFrame):
+        """Indicator matrix of the categorical columns, built from row and column indices in one go"""
+        import scipy.sparse as sp
+        rows, cols = [], []
+        offset = 0
+        for col, levels in self.onehot.items():
+            codes = pd.Categorical(X[col], categories=levels).codes
+            present = np.flatnonzero(codes >= 0)
+            rows.append(present)
+            cols.append(offset + codes[present].astype(np.int64))
+            offset += len(levels)
+        for col in self.hashed:
+            values = X[col]
+            present = np.flatnonzero(values.notna().to_numpy())
+            keys = (col + '=' + values.iloc[present].astype(str)).to_numpy(dtype=object)
+            buckets = pd.util.hash_array(keys) % np.uint64(HASH_FEATURES)
+            rows.append(present)
+            cols.append(offset + buckets.astype(np.int64))
+            offset += HASH_FEATURES
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        return sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(X), offset))
+
+    def importance(self, coefficients) -> dict:
+        """
+        Coefficients by feature: numeric columns and one-hot levels
+        ("column=level") individually, each hashed column as the mean
+        absolute coefficient of its buckets ("column (hashed)")
+        """
+        coefficients = np.asarray(coefficients, dtype=float)
+        names = list(self.numeric_columns)
+        for col, levels in self.onehot.items():
+            names += [f"{col}={level}" for level in levels]
+        importance = dict(zip(names, coefficients[:len(names)].tolist()))
+        for i, col in enumerate(self.hashed):
+            start = len(names) + i * HASH_FEATURES
+            importance[f"{col} (hashed)"] = float(np.abs(coefficients[start:start + HASH_FEATURES]).mean())
+        return importance
+
+    @property
+    def n_features(self) -> int:
+        return (len(self.numeric_columns) + sum(len(levels) for levels in self.onehot.values())
+                + len(self.hashed) * HASH_FEATURES)
+
+    def describe(self) -> dict:
+        return {
+            "numeric": self.numeric_columns,
+            "onehot": {col: len(levels) for col, levels in self.onehot.items()},
+            "hashed": {col: HASH_FEATURES for col in self.hashed},
+            "dropped": self.dropped,
+            "n_features": self.n_features,
+        }
+
+
+class MixedNaiveBayes:
+    """
+    Naive Bayes over a FeatureEncoder matrix: Gaussian likelihoods for the
+    leading numeric columns and Bernoulli likelihoods for the sparse
+    indicator columns. GaussianNB alone would fit near-zero per-class
+    variances to the indicators, which then dominate every prediction.
+    """
+
+    def __init__(self, n_numeric: int):
+        self.n_numeric = n_numeric
+        self.gaussian = None
+        self.bernoulli = None
+        self.classes_ = None
+
+    def fit(self, X, y):
+        import scipy.sparse as sp
+        from sklearn.naive_bayes import BernoulliNB, GaussianNB
+        X = sp.csr_matrix(X)
+        if self.n_numeric:
+            self.gaussian = GaussianNB().fit(X[:, :self.n_numeric].toarray(), y)
+        # Scaled indicators are positive where a level is present
+        self.bernoulli = BernoulliNB(binarize=0.0).fit(X[:, self.n_numeric:], y)
+        self.classes_ = self.bernoulli.classes_
+        return self
+
+    def _joint_log_likelihood(self, X) -> np.ndarray:
+        import scipy.sparse as sp
+        X = sp.csr_matrix(X)
+        jll = self.bernoulli.predict_joint_log_proba(X[:, self.n_numeric:])
+        if self.gaussian is not None:
+            # Both models include the class prior; count it once
+            jll += (self.gaussian.predict_joint_log_proba(X[:, :self.n_numeric].toarray())
+                    - np.log(self.gaussian.class_prior_))
+        return jll
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self._joint_log_likelihood(X), axis=1)]
+
+    def predict_proba(self, X) -> np.ndarray:
+        from scipy.special import logsumexp
+        jll = self._joint_log_likelihood(X)
+        return np.exp(jll - logsumexp(jll, axis=1, keepdims=True))
@@ -0,0 +1,124 @@
+import asyncio
+import functools
+import importlib
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from instrumentation import configure_logging
+
+# "process" runs CPU-bound work on a pool of worker processes (all cores);
+# "thread" keeps it in-process, which is handy for development and debugging
+PREDICT_EXECUTOR = os.getenv('PREDICT_EXECUTOR', 'process')
+PREDICT_WORKERS = int(os.getenv('PREDICT_WORKERS', 0)) or (os.cpu_count() or 1)
+# Upper bound on jobs submitted to the pool at once; extra callers wait their turn
+PREDICT_MAX_CONCURRENCY = int(os.getenv('PREDICT_MAX_CONCURRENCY', 0)) or PREDICT_WORKERS
+# "spawn" avoids forking a process that already runs the event loop's threads
+PREDICT_START_METHOD = os.getenv('PREDICT_START_METHOD', 'spawn')
+# Start the workers and load the ML and plotting stacks in the background at
+# startup, so the first prediction does not pay for it
+PREDICT_WARMUP = os.getenv('PREDICT_WARMUP', '1') == '1'
+# The heavy imports the pipeline defers until first use
+PRELOAD_MODULES = (
+    'sklearn.linear_model', 'sklearn.naive_bayes', 'sklearn.model_selection', 'sklearn.metrics',
+    'sklearn.preprocessing', 'joblib', 'matplotlib.figure', 'matplotlib.backends.backend_agg', 'seaborn',
+)
+
+
+def preload_modules(names: tuple = PRELOAD_MODULES):
+    for name in names:
+        importlib.import_module(name)
+
+
+def init_worker():
+    configure_logging()
+    if PREDICT_WARMUP:
+        preload_modules()
+
+
+class ExecutionEngine:
+    """
+    Runs CPU-bound pipeline functions (model training, chart rendering)
+    off the event loop with a bounded number of jobs in flight.
+    """
+
+    def __init__(self, kind: str = PREDICT_EXECUTOR, max_workers: int = PREDICT_WORKERS,
+                 max_concurrency: int = PREDICT_MAX_CONCURRENCY):
+        if kind not in ('process', 'thread'):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self._executor = None
+        self._semaphore = None
+        self._manager = None
+        self._progress_queue = None
+
+    @property
+    def executor(self):
+        # Created lazily so importing the app does not start worker processes
+        if self._executor is None:
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(PREDICT_START_METHOD),
+                    initializer=init_worker,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='predict'
+                )
+        return self._executor
+
+    @property
+    def progress_queue(self):
+        """Queue that ProgressReporter callbacks running on the pool publish to"""
+        if self._progress_queue is None:
+            if self.kind == 'process':
+                self._manager = multiprocessing.get_context(PREDICT_START_METHOD).Manager()
+                self._progress_queue = self._manager.Queue()
+            else:
+                self._progress_queue = queue.Queue()
+        return self._progress_queue
+
+    def warm_up(self):
+        """Start the workers, which preload the heavy modules, without waiting for them"""
+        if self.kind == 'process':
+            for _ in range(self.max_workers):
+                self.executor.submit(int)
+        else:
+            self.executor.submit(preload_modules)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` on the pool and await its result"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+        self._progress_queue = None
+
+
+class ProgressReporter:
+    """
+    Picklable progress callback for pipeline functions: forwards
+    (job_id, stage) pairs to the engine's progress queue.
+    """
+
+    def __init__(self, progress_queue, job_id: str):
+        self.progress_queue = progress_queue
+        self.job_id = job_id
+
+    def __call__(self, stage: str):
+        self.progress_queue.put((self.job_id, stage))
+
+
+execution_engine = ExecutionEngine()
@@ -0,0 +1,374 @@
+import logging
+import os
+import numpy as np
+import pandas as pd
+from dataset_store import dataset_store
+from profiling import DatasetProfiler, usable_profile, distinct_count
+from encoding import categorical_columns
+from pipeline import PREPROCESSING, detect_classification, report_progress, build_result, load_profile
+from instrumentation import StageTimer
+
+logger = logging.getLogger(__name__)
+
+TRAINING_MODES = ("auto", "memory", "incremental")
+# In "auto" mode, datasets larger than this on disk are trained out of core
+LARGE_DATASET_BYTES = int(os.getenv('LARGE_DATASET_BYTES', 1024 ** 3))
+# Rows read from the memory-mapped dataset per step
+INCREMENTAL_BATCH_ROWS = int(os.getenv('INCREMENTAL_BATCH_ROWS', 100000))
+# Passes over the training rows for the SGD models (naive Bayes always makes one)
+INCREMENTAL_EPOCHS = int(os.getenv('INCREMENTAL_EPOCHS', 3))
+# Test rows kept (uniformly sampled) for charts and sample predictions
+INCREMENTAL_SAMPLE_SIZE = int(os.getenv('INCREMENTAL_SAMPLE_SIZE', 5000))
+
+
+def resolve_training_mode(filename: str, training_mode: str = "auto") -> str:
+    """Pick "memory" or "incremental" training; "auto" decides by dataset size"""
+    if training_mode not in TRAINING_MODES:
+        raise ValueError(f"Unknown training mode: {training_mode}. Use one of {', '.join(TRAINING_MODES)}.")
+    if training_mode != "auto":
+        return training_mode
+    try:
+        size = dataset_store.size_of(filename)
+    except KeyError:
+        return "memory"
+    return "incremental" if size > LARGE_DATASET_BYTES else "memory"
+
+
+def hashed_test_mask(start: int, n_rows: int, test_size: float, seed: int) -> np.ndarray:
+    """
+    Test-split membership of rows start..start+n_rows, decided by hashing
+    each row's position in the dataset. The split is the same however the
+    dataset is batched, and every pass sees the same rows in each split.
+    """
+    rows = np.arange(start, start + n_rows, dtype=np.uint64)
+    hashes = pd.util.hash_array(rows, hash_key=f"{seed:016d}"[-16:])
+    return (hashes % np.uint64(1000000)) < np.uint64(test_size * 1000000)
+
+
+class StreamingDataset:
+    """
+    Reads the feature and target columns of a stored dataset batch by batch
+    and splits every batch into train and test rows with hashed_test_mask.
+    Rows with missing feature or target values are skipped.
+    """
+
+    def __init__(self, filename: str, feature_columns: list, target_column: str, clean_target: bool):
+        self.filename = filename
+        self.feature_columns = feature_columns
+        self.target_column = target_column
+        self.clean_target = clean_target
+
+    def __iter__(self):
+        """Yield (X, y, is_test) arrays per batch"""
+        start = 0
+        columns = self.feature_columns + [self.target_column]
+        for batch in dataset_store.iter_dataframes(self.filename, columns, INCREMENTAL_BATCH_ROWS):
+            is_test = hashed_test_mask(start, len(batch), PREPROCESSING["test_size"], PREPROCESSING["random_state"])
+            start += len(batch)
+            y = batch[self.target_column]
+            if self.clean_target:
+                y = y.str.strip()
+            complete = (batch[self.feature_columns].notna().all(axis=1) & y.notna()).to_numpy()
+            if not complete.any():
+                continue
+            X = batch.loc[complete, self.feature_columns].to_numpy(dtype=float)
+            yield X, y[complete].to_numpy(), is_test[complete]
+
+
+class SampleReservoir:
+    """Uniform sample of (actual, predicted) pairs from a stream, using random keys"""
+
+    def __init__(self, size: int, seed: int):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.keys = np.empty(0)
+        self.actual = np.empty(0)
+        self.predicted = np.empty(0)
+
+    def add(self, actual: np.ndarray, predicted: np.ndarray):
+        keys = np.concatenate([self.keys, self.rng.random(len(actual))])
+        actual = np.concatenate([self.actual, actual])
+        predicted = np.concatenate([self.predicted, predicted])
+        if len(keys) > self.size:
+            keep = np.argpartition(keys, self.size)[:self.size]
+            keys, actual, predicted = keys[keep], actual[keep], predicted[keep]
+        self.keys, self.actual, self.predicted = keys, actual, predicted
+
+
+def classification_report_from_confusion(confusion: np.ndarray) -> dict:
+    """The output_dict form of sklearn's classification_report, from a confusion matrix"""
+    true_positive = np.diag(confusion).astype(float)
+    support = confusion.sum(axis=1)
+    predicted = confusion.sum(axis=0)
+    labels = [i for i in range(len(confusion)) if support[i] or predicted[i]]
+    report = {}
+    for i in labels:
+        precision = true_positive[i] / predicted[i] if predicted[i] else 0.0
+        recall = true_positive[i] / support[i] if support[i] else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        report[str(i)] = {"precision": float(precision), "recall": float(recall), "f1-score": float(f1),
+                          "support": int(support[i])}
+    total = int(support.sum())
+    report["accuracy"] = float(true_positive.sum() / total) if total else 0.0
+    for name, weights in (("macro avg", np.ones(len(labels))), ("weighted avg", support[labels].astype(float))):
+        weights = weights / weights.sum() if weights.sum() else weights
+        report[name] = {
+            metric: float(sum(report[str(i)][metric] * w for i, w in zip(labels, weights)))
+            for metric in ("precision", "recall", "f1-score")
+        }
+        report[name]["support"] = total
+    return report
+
+
+def correlation_from_moments(n: int, sums: np.ndarray, cross: np.ndarray) -> np.ndarray:
+    """Pearson correlation matrix from the sums and cross products of centred columns"""
+    cov = (cross - np.outer(sums, sums) / n) / max(n - 1, 1)
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return cov / np.outer(std, std)
+
+
+def run_incremental_prediction(filename: str, target_column: str, model_type: str = "linear_regression",
+                               progress=None, artifact_key: str = None, inline_charts: bool = False,
+                               chart_mode: str = "image") -> dict:
+    """
+    Out-of-core version of pipeline.run_prediction for datasets that do not
+    fit in memory; it returns the same result shape.
+
+    The stored dataset is streamed in batches three times: once to fit the
+    scaler and gather target and chart statistics, INCREMENTAL_EPOCHS times
+    to train with partial_fit (SGD-based linear and logistic regression,
+    GaussianNB), and once to accumulate test metrics. Memory stays bounded
+    by the batch size whatever the row count. Seconds per pass are
+    returned under "timings".
+    """
+    from sklearn.linear_model import SGDRegressor, SGDClassifier
+    from sklearn.naive_bayes import GaussianNB
+    from sklearn.preprocessing import StandardScaler
+    if chart_mode not in ("image", "data"):
+        return {"error": f"Unknown chart mode: {chart_mode}. Use 'image' or 'data'."}
+    if not dataset_store.exists(filename):
+        return {"error": "File not found. Please upload the file first."}
+
+    columns = dataset_store.open_table(filename).column_names
+    if target_column not in columns:
+        return {"error": f"Target column '{target_column}' not found in the dataset."}
+
+    timer = StageTimer()
+    with timer.stage('profile'):
+        profile = load_profile(filename, columns)
+        if profile is None:
+            # Datasets from before upload-time profiling: profile them in one streamed pass
+            profiler = DatasetProfiler()
+            for batch in dataset_store.iter_dataframes(filename, batch_rows=INCREMENTAL_BATCH_ROWS):
+                profiler.update(batch)
+            profile = usable_profile({"profile": profiler.to_dict()}, columns)
+
+    target_profile = profile[target_column]
+    target_dtype = target_profile["dtype"]
+    is_classification = detect_classification(
+        target_column, target_dtype, distinct_count(target_profile), target_profile["count"]
+    )
+    logger.info("Out-of-core training on %s: target %s (%s), %s", filename, target_column, target_dtype,
+                'classification' if is_classification else 'regression')
+
+    feature_columns = [col for col, column_profile in profile.items()
+                       if column_profile["numeric"] and col != target_column]
+    if len(feature_columns) == 0:
+        return {"error": "No numeric columns found for features. Need at least one numeric column besides target."}
+
+    if model_type == "linear_regression":
+        if is_classification:
+            return {"error": "Linear Regression is for regression problems. Use Logistic Regression for classification."}
+        # A constant target also leaves no range for the histogram edges of pass 1
+        if not target_profile.get("max", 0) > target_profile.get("min", 0):
+            return {"error": "Target variable has no variance (all values are the same). Cannot perform regression."}
+        if target_profile["cardinality"] < 3:
+            return {"error": f"Target variable has only {target_profile['cardinality']} unique values. Consider using classification instead."}
+        model = SGDRegressor(random_state=PREPROCESSING["random_state"])
+    elif model_type == "logistic_regression":
+        if not is_classification:
+            return {"error": "Logistic Regression is for classification problems. Use Linear Regression for regression."}
+        model = SGDClassifier(loss="log_loss", random_state=PREPROCESSING["random_state"])
+    elif model_type == "naive_bayes":
+        if not is_classification:
+            return {"error": "Naive Bayes is for classification problems. Use Linear Regression for regression."}
+        model = GaussianNB()
+    else:
+        return {"error": f"Unknown model type: {model_type}"}
+
+    data = StreamingDataset(filename, feature_columns, target_column,
+                            clean_target=is_classification and target_dtype in ('object', 'string'))
+
+    # Pass 1: scaler, target statistics and chart inputs
+    report_progress(progress, 'split')
+    scaler = StandardScaler()
+    target_scaler = StandardScaler()
+    class_counts = {}
+    if not is_classification:
+        target_edges = np.linspace(target_profile["min"], target_profile["max"], 21)
+        target_hist = np.zeros(20, dtype=np.int64)
+    corr_columns = feature_columns + ([target_column] if target_profile["numeric"] else [])
+    corr_center = np.array([profile[col].get("mean", 0.0) for col in corr_columns])
+    corr_n, corr_sums, corr_cross = 0, np.zeros(len(corr_columns)), np.zeros((len(corr_columns),) * 2)
+    n_train = n_test = 0
+    with timer.stage('scale'):
+        for X, y, is_test in data:
+            train = ~is_test
+            n_train += int(train.sum())
+            n_test += int(is_test.sum())
+            if train.any():
+                scaler.partial_fit(X[train])
+            if is_classification:
+                labels, counts = np.unique(y, return_counts=True)
+                for label, count in zip(labels.tolist(), counts.tolist()):
+                    class_counts[label] = class_counts.get(label, 0) + count
+            else:
+                if train.any():
+                    target_scaler.partial_fit(y[train].astype(float).reshape(-1, 1))
+                target_hist += np.histogram(y.astype(float), bins=target_edges)[0]
+            Z = (np.column_stack([X, y.astype(float)]) if target_profile["numeric"] else X) - corr_center
+            corr_n += len(Z)
+            corr_sums += Z.sum(axis=0)
+            corr_cross += Z.T @ Z
+
+    report_progress(progress, 'scale')
+    if n_train == 0 or n_test == 0:
+        return {"error": "Not enough complete rows to build a train/test split."}
+    y_classes = None
+    if is_classification:
+        y_classes = sorted(class_counts)
+        min_samples_per_class = min(class_counts.values())
+        logger.debug("Classification detected: %d classes", len(y_classes))
+        if min_samples_per_class < 2 and len(y_classes) > 5:
+            return {"error": f"Not enough samples per class for classification. Minimum samples needed: 2, got: {min_samples_per_class}"}
+        class_index = np.array(y_classes)
+    elif target_scaler.var_[0] == 0:
+        return {"error": "Target variable has no variance (all values are the same). Cannot perform regression."}
+
+    def encode(y):
+        return np.searchsorted(class_index, y) if is_classification else y.astype(float)
+
+    # Pass 2: incremental training on the scaled training rows
+    report_progress(progress, 'fit')
+    rng = np.random.default_rng(PREPROCESSING["random_state"])
+    epochs = 1 if model_type == "naive_bayes" else INCREMENTAL_EPOCHS
+    if not is_classification:
+        # SGD converges far better on a standardised target; the scaling is folded back into the coefficients below
+        y_mean, y_std = target_scaler.mean_[0], target_scaler.scale_[0]
+    with timer.stage('fit'):
+        for _ in range(epochs):
+            for X, y, is_test in data:
+                train = ~is_test
+                if not train.any():
+                    continue
+                order = rng.permutation(int(train.sum()))
+                X_train = scaler.transform(X[train])[order]
+                y_train = encode(y[train])[order]
+                if is_classification:
+                    model.partial_fit(X_train, y_train, classes=np.arange(len(y_classes)))
+                else:
+                    model.partial_fit(X_train, (y_train - y_mean) / y_std)
+    if not is_classification:
+        model.coef_ = model.coef_ * y_std
+        model.intercept_ = model.intercept_ * y_std + y_mean
+
+    # Pass 3: streaming test metrics
+    reservoir = SampleReservoir(INCREMENTAL_SAMPLE_SIZE, PREPROCESSING["random_state"])
+    if is_classification:
+        confusion = np.zeros((len(y_classes), len(y_classes)), dtype=np.int64)
+    else:
+        sse, n, mean, m2 = 0.0, 0, 0.0, 0.0
+    with timer.stage('metrics'):
+        for X, y, is_test in data:
+            if not is_test.any():
+                continue
+            y_test = encode(y[is_test])
+            y_pred = model.predict(scaler.transform(X[is_test]))
+            reservoir.add(y_test, y_pred)
+            if is_classification:
+                k = len(y_classes)
+                confusion += np.bincount(y_test * k + y_pred, minlength=k * k).reshape(k, k)
+            else:
+                # Chan's parallel update of the test target's mean and sum of squares
+                n_b, mean_b = len(y_test), y_test.mean()
+                m2_b = ((y_test - mean_b) ** 2).sum()
+                delta = mean_b - mean
+                m2 += m2_b + delta ** 2 * n * n_b / (n + n_b)
+                mean += delta * n_b / (n + n_b)
+                n += n_b
+                sse += float(((y_test - y_pred) ** 2).sum())
+
+    if is_classification:
+        classification_rep = classification_report_from_confusion(confusion)
+        metrics = {"accuracy": classification_rep["accuracy"], "classification_report": classification_rep}
+        feature_importance = (dict(zip(feature_columns, model.coef_[0])) if model_type == "logistic_regression"
+                              else {col: 0.0 for col in feature_columns})
+    else:
+        mse = sse / n
+        metrics = {
+            "mean_squared_error": float(mse),
+            "r2_score": float(1 - sse / m2) if m2 else 0.0,
+            "rmse": float(np.sqrt(mse))
+        }
+        feature_importance = dict(zip(feature_columns, model.coef_))
+    logger.info("Out-of-core training done: %d train rows, %d test rows", n_train, n_test)
+
+    report_progress(progress, 'charts')
+    y_test_sample = reservoir.actual.astype(int) if is_classification else reservoir.actual
+    y_pred_sample = reservoir.predicted.astype(int) if is_classification else reservoir.predicted
+    chart_meta = {"target_column": target_column, "is_classification": is_classification, "chart_types": []}
+    chart_arrays = {"y_test": y_test_sample, "y_pred": y_pred_sample}
+    if len(corr_columns) > 1:
+        chart_meta["correlation_columns"] = corr_columns
+        chart_arrays["correlation"] = correlation_from_moments(corr_n, corr_sums, corr_cross)
+        chart_meta["chart_types"].append("correlation_heatmap")
+    chart_meta["chart_types"].append("actual_vs_predicted")
+    if is_classification:
+        by_count = sorted(class_counts.items(), key=lambda item: item[1], reverse=True)
+        chart_meta["target_labels"] = [str(label) for label, _ in by_count]
+        chart_arrays["target_counts"] = np.array([count for _, count in by_count])
+    else:
+        chart_arrays["target_counts"] = target_hist
+        chart_arrays["target_edges"] = target_edges
+    chart_meta["chart_types"].append("target_distribution")
+
+    prepared = {
+        "target_column": target_column,
+        "feature_columns": feature_columns,
+        # Out-of-core training uses numeric columns only
+        "feature_encoding": {"numeric": feature_columns, "onehot": {}, "hashed": {},
+                             "dropped": categorical_columns(None, exclude=[target_column], profile=profile),
+                             "n_features": len(feature_columns)},
+        "is_classification": is_classification,
+        "y_classes": y_classes,
+        "scaler": scaler,
+        "y_test": y_test_sample,
+        "train_unique_count": target_profile["cardinality"],
+    }
+    fitted = {"model": model, "y_pred": y_pred_sample, "metrics": metrics, "feature_importance": feature_importance}
+    result = build_result(None, prepared, model_type, fitted, artifact_key, inline_charts, chart_mode,
+                          chart_inputs=(chart_meta, chart_arrays), timer=timer)
+    result["training_mode"] = "incremental"
+    result["timings"] = timer.durations
+    return result
+
+
+def run_incremental_comparison(filename: str, tasks: list, progress=None, inline_charts: bool = False,
+                               chart_mode: str = "image") -> dict:
+    """
+    Out-of-core counterpart of pipeline.run_comparison. Each model streams
+    the dataset itself, since shared preprocessing would have to be held
+    in memory.
+    """
+    timer = StageTimer()
+    results = {}
+    for target_column, model_type, artifact_key in tasks:
+        result = run_incremental_prediction(
+            filename, target_column, model_type, progress, artifact_key, inline_charts, chart_mode
+        )
+        if result.get("error") == "File not found. Please upload the file first.":
+            return result
+        timer.merge(result.pop("timings", None))
+        results.setdefault(target_column, {})[model_type] = result
+    return {"results": results, "timings": timer.durations}
@@ -0,0 +1,254 @@
+import hashlib
+import os
+import tempfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from profiling import DatasetProfiler
+from instrumentation import StageTimer
+
+# Size of each read from the upload stream, and rows per parsed chunk
+INGEST_CHUNK_BYTES = int(os.getenv('INGEST_CHUNK_BYTES', 1024 * 1024))
+INGEST_CHUNK_ROWS = int(os.getenv('INGEST_CHUNK_ROWS', 100000))
+# Where uploads are spooled before parsing (defaults to the system temp dir)
+UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR') or None
+
+# Accepted upload suffixes -> (format, compression)
+UPLOAD_FORMATS = {
+    '.csv': ('csv', None),
+    '.csv.gz': ('csv', 'gzip'),
+    '.csv.zst': ('csv', 'zstd'),
+    '.parquet': ('parquet', None),
+    '.arrow': ('arrow', None),
+    '.feather': ('arrow', None),
+}
+
+
+def upload_suffix(filename: str):
+    """The UPLOAD_FORMATS suffix a file name ends with, or None if the format is not supported"""
+    name = filename.lower()
+    for suffix in sorted(UPLOAD_FORMATS, key=len, reverse=True):
+        if name.endswith(suffix):
+            return suffix
+    return None
+
+
+def dataset_stem(filename: str) -> str:
+    """File name without its format suffix, e.g. for naming MongoDB collections"""
+    suffix = upload_suffix(filename)
+    return filename[:-len(suffix)] if suffix else filename
+
+
+def _open_input(source, compression: str = None):
+    """Arrow input stream over a path or in-memory bytes, decompressed if needed"""
+    stream = pa.BufferReader(source) if isinstance(source, bytes) else pa.OSFile(source)
+    return pa.CompressedInputStream(stream, compression) if compression else stream
+
+
+def arrow_to_pandas(table: pa.Table) -> pd.DataFrame:
+    """
+    Convert a table read from Parquet or Arrow IPC to the frame a CSV parse
+    would give: dictionary columns are decoded (categories of separate
+    chunks would not line up in the dataset store) and dates become datetime64.
+    """
+    columns = [column.cast(column.type.value_type) if pa.types.is_dictionary(column.type) else column
+               for column in table.columns]
+    return pa.table(columns, names=table.column_names).to_pandas(date_as_object=False)
+
+
+def _differs_from_pandas(table: pa.Table) -> bool:
+    """
+    Whether Arrow parsed a CSV differently from pd.read_csv: empty column
+    names (pandas names them "Unnamed: N"), duplicated ones (pandas renames
+    them a.1, a.2, ...), bytes that are not UTF-8 (pandas raises a decode
+    error) or integers beyond int64 that Arrow turned into floats (pandas
+    keeps them exact).
+    """
+    names = table.column_names
+    if '' in names or len(set(names)) != len(names):
+        return True
+    for column in table.columns:
+        if pa.types.is_binary(column.type) or pa.types.is_large_binary(column.type):
+            return True
+        if pa.types.is_floating(column.type) and column.null_count < len(column):
+            largest = pc.max(pc.abs(column)).as_py()
+            if largest >= 2 ** 63 and pc.all(pc.equal(pc.floor(column), column)).as_py():
+                return True
+    return False
+
+
+def read_csv_arrow(source, compression: str = None) -> pd.DataFrame:
+    """
+    Parse a whole CSV with Arrow's multi-threaded reader into the frame
+    pd.read_csv would give: empty strings are missing values and dates and
+    times stay strings. Falls back to pandas if Arrow cannot convert a
+    column whose type changes after the first block, or would parse the
+    file differently (see _differs_from_pandas).
+    """
+    convert_options = pa_csv.ConvertOptions(strings_can_be_null=True)
+    try:
+        with _open_input(source, compression) as stream:
+            table = pa_csv.read_csv(stream, convert_options=convert_options)
+        temporal = {field.name: pa.string() for field in table.schema if pa.types.is_temporal(field.type)}
+        if temporal:
+            convert_options.column_types = temporal
+            with _open_input(source, compression) as stream:
+                table = pa_csv.read_csv(stream, convert_options=convert_options)
+    except pa.ArrowInvalid:
+        table = None
+    if table is None or _differs_from_pandas(table):
+        with _open_input(source, compression) as stream:
+            return pd.read_csv(stream)
+    return table.to_pandas()
+
+
+def read_upload(source, suffix: str) -> pd.DataFrame:
+    """Parse a whole upload (a path or its bytes) in the format its suffix names"""
+    file_format, compression = UPLOAD_FORMATS[suffix]
+    if file_format == 'csv':
+        return read_csv_arrow(source, compression)
+    if file_format == 'parquet':
+        return arrow_to_pandas(pq.read_table(_open_input(source)))
+    return arrow_to_pandas(_open_ipc(source).read_all())
+
+
+def _open_ipc(source):
+    """Reader for Arrow IPC data (a path or bytes) in the file (Feather v2) or the streaming format"""
+    stream = pa.BufferReader(source) if isinstance(source, bytes) else pa.memory_map(source, 'r')
+    try:
+        return ipc.open_file(stream)
+    except pa.ArrowInvalid:
+        stream.seek(0)
+        return ipc.open_stream(stream)
+
+
+def _ipc_batches(reader):
+    if isinstance(reader, ipc.RecordBatchFileReader):
+        return (reader.get_batch(i) for i in range(reader.num_record_batches))
+    return reader
+
+
+def iter_upload_chunks(path: str, suffix: str, chunksize: int = INGEST_CHUNK_ROWS):
+    """
+    Parse a spooled upload lazily in the format its suffix names, yielding
+    DataFrames of at most `chunksize` rows
+    """
+    file_format, compression = UPLOAD_FORMATS[suffix]
+    if file_format == 'csv':
+        if compression is None:
+            yield from iter_csv_chunks(path, chunksize)
+        else:
+            with _open_input(path, compression) as stream:
+                yield from iter_csv_chunks(stream, chunksize)
+    elif file_format == 'parquet':
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield arrow_to_pandas(pa.Table.from_batches([batch]))
+    else:
+        for batch in _ipc_batches(_open_ipc(path)):
+            for offset in range(0, batch.num_rows, chunksize):
+                yield arrow_to_pandas(pa.Table.from_batches([batch.slice(offset, chunksize)]))
+
+
+def hash_file(fileobj) -> str:
+    """
+    sha256 hex digest of a binary file object's content, read in
+    INGEST_CHUNK_BYTES chunks; the file is rewound afterwards
+    """
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(INGEST_CHUNK_BYTES), b''):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+async def spool_upload(file, suffix: str = '.csv'):
+    """
+    Copy an uploaded file to disk in fixed-size chunks.
+    Only one chunk of the upload is held in memory at a time.
+    Returns (path, sha256 hex digest of the content).
+    """
+    digest = hashlib.sha256()
+    if UPLOAD_SPOOL_DIR:
+        os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=UPLOAD_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = await file.read(INGEST_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest()
+
+
+def iter_csv_chunks(path, chunksize: int = INGEST_CHUNK_ROWS):
+    """
+    Parse a CSV file (a path or an open binary stream) lazily, yielding
+    DataFrames of at most `chunksize` rows
+    """
+    with pd.read_csv(path, chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+class UploadSummary:
+    """
+    Incrementally builds the upload summary (row count, columns, null
+    counts and the per-column profile) from a sequence of DataFrame chunks.
+    """
+
+    def __init__(self):
+        self.n_rows = 0
+        self.columns = None
+        self.null_counts = {}
+        self.profiler = DatasetProfiler()
+
+    def update(self, chunk: pd.DataFrame):
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            self.null_counts = {col: 0 for col in self.columns}
+        self.n_rows += len(chunk)
+        for col, count in chunk.isnull().sum().items():
+            self.null_counts[col] += int(count)
+        self.profiler.update(chunk)
+
+    def to_dict(self) -> dict:
+        columns = self.columns or []
+        return {
+            "n_rows": int(self.n_rows),
+            "n_columns": len(columns),
+            "columns": columns,
+            "null_counts": self.null_counts,
+            "profile": self.profiler.to_dict(),
+        }
+
+
+def summarize_upload(path: str, suffix: str = '.csv', chunksize: int = INGEST_CHUNK_ROWS, on_chunk=None,
+                     timer: StageTimer = None) -> dict:
+    """
+    Scan a spooled upload chunk by chunk and return its summary.
+    `on_chunk` is called with every parsed chunk, e.g. to persist it.
+    Parsing and profiling time is added to `timer`.
+    """
+    timer = timer or StageTimer()
+    summary = UploadSummary()
+    chunks = iter_upload_chunks(path, suffix, chunksize)
+    while True:
+        with timer.stage('parse'):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        with timer.stage('profile'):
+            summary.update(chunk)
+        if on_chunk is not None:
+            on_chunk(chunk)
+    with timer.stage('profile'):
+        return summary.to_dict()
@@ -0,0 +1,138 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Pipeline diagnostics are logged at DEBUG/INFO; the default keeps them off
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'WARNING').upper()
+# Upper bounds (seconds) of the latency histogram buckets
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def configure_logging(level: str = LOG_LEVEL):
+    """Set up leveled logging; also runs in each execution engine worker"""
+    logging.basicConfig(level=level, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+
+class StageTimer:
+    """
+    Wall-clock seconds spent per named stage of a request. `durations` is
+    a plain dict, so worker processes can return it with their result.
+    Stages timed from several threads add up.
+    """
+
+    def __init__(self):
+        self.durations = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def merge(self, durations: dict):
+        for name, seconds in (durations or {}).items():
+            self.add(name, seconds)
+
+
+_request_timer = ContextVar('request_timer', default=None)
+
+
+@contextmanager
+def timed_request():
+    """Make a fresh StageTimer the current request's timer for the enclosed block"""
+    timer = StageTimer()
+    token = _request_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _request_timer.reset(token)
+
+
+def request_timer() -> StageTimer:
+    """The current request's timer (a detached one outside of a request)"""
+    return _request_timer.get() or StageTimer()
+
+
+def server_timing_header(durations: dict, total: float) -> str:
+    """Server-Timing header value with one metric (in milliseconds) per stage"""
+    metrics = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items()]
+    metrics.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(metrics)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram, one series per label combination"""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple, buckets: tuple = METRICS_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+
+    def render(self) -> list:
+        """Lines of the text exposition format"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, dict(s, counts=list(s["counts"]))) for labels, s in self._series.items())
+        for label_values, data in series:
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), data["counts"]):
+                cumulative += count
+                le = "+Inf" if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {data['sum']}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+request_duration = Histogram(
+    'insightfull_http_request_duration_seconds', 'HTTP request latency.', ('method', 'route', 'status')
+)
+stage_duration = Histogram(
+    'insightfull_stage_duration_seconds', 'Time spent in each request stage.', ('route', 'stage')
+)
+
+
+def observe_stages(route: str, durations: dict):
+    for stage, seconds in durations.items():
+        stage_duration.observe(seconds, route, stage)
+
+
+def render_gauges(gauges: dict) -> list:
+    """Prometheus text lines for {name: (help, value)}"""
+    lines = []
+    for name, (help_text, value) in gauges.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return lines
+
+
+def render_metrics(gauges: dict = None) -> str:
+    """All metrics of this process in the Prometheus text format, plus `gauges` (see render_gauges)"""
+    lines = request_duration.render() + stage_duration.render() + render_gauges(gauges or {})
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,195 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+
+# Jobs running at once, across all users and per user
+JOB_GLOBAL_CONCURRENCY = int(os.getenv('JOB_GLOBAL_CONCURRENCY', 4))
+JOB_PER_USER_CONCURRENCY = int(os.getenv('JOB_PER_USER_CONCURRENCY', 1))
+# Unfinished (queued or running) jobs accepted before new submissions are rejected
+JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', 100))
+JOB_MAX_PENDING_PER_USER = int(os.getenv('JOB_MAX_PENDING_PER_USER', 5))
+# How long finished jobs stay available for polling
+JOB_RESULT_TTL_SECONDS = int(os.getenv('JOB_RESULT_TTL_SECONDS', 3600))
+
+PREDICT_STAGES = ["queued", "split", "scale", "fit", "charts", "persist", "done"]
+
+
+class JobQueueFull(Exception):
+    """Raised when a submission would exceed the pending job limits"""
+
+
+class Job:
+    def __init__(self, username: str, kind: str, params: dict):
+        self.id = uuid.uuid4().hex
+        self.username = username
+        self.kind = kind
+        self.params = params
+        self.status = "queued"
+        self.stage = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.events = [{"stage": "queued", "status": "queued", "at": self.created_at}]
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def update(self, stage: str = None, status: str = None):
+        if stage is not None:
+            self.stage = stage
+        if status is not None:
+            self.status = status
+        self.updated_at = time.time()
+        self.events.append({"stage": self.stage, "status": self.status, "at": self.updated_at})
+        # Wake every subscriber waiting on the current event, then start a new one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def to_dict(self) -> dict:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": PREDICT_STAGES.index(self.stage) / (len(PREDICT_STAGES) - 1)
+                        if self.stage in PREDICT_STAGES else None,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+        if self.status == "succeeded":
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+
+class LocalJobBackend:
+    """
+    In-process job queue that runs jobs as asyncio tasks on the event loop.
+
+    Needs no external broker. Each job holds a per-user slot and then a
+    global slot, so one user's backlog cannot take every global slot.
+    Progress from the execution engine arrives on its progress queue and
+    is forwarded to the matching job.
+    """
+
+    def __init__(self, get_progress_queue=None, global_concurrency: int = JOB_GLOBAL_CONCURRENCY,
+                 per_user_concurrency: int = JOB_PER_USER_CONCURRENCY,
+                 max_pending: int = JOB_MAX_PENDING, max_pending_per_user: int = JOB_MAX_PENDING_PER_USER):
+        self.get_progress_queue = get_progress_queue
+        self.progress_queue = None
+        self.global_concurrency = global_concurrency
+        self.per_user_concurrency = per_user_concurrency
+        self.max_pending = max_pending
+        self.max_pending_per_user = max_pending_per_user
+        self.jobs = {}
+        self._global_slots = None
+        self._user_slots = {}
+        self._tasks = set()
+        self._loop = None
+        self._listener = None
+
+    def _start(self):
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._global_slots = asyncio.Semaphore(self.global_concurrency)
+        if self.get_progress_queue is not None:
+            self.progress_queue = self.get_progress_queue()
+            self._listener = threading.Thread(target=self._listen, name='job-progress', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        """Forward (job_id, stage) pairs from the progress queue to the event loop"""
+        while True:
+            item = self.progress_queue.get()
+            if item is None:
+                return
+            job_id, stage = item
+            self._loop.call_soon_threadsafe(self._on_progress, job_id, stage)
+
+    def _on_progress(self, job_id: str, stage: str):
+        job = self.jobs.get(job_id)
+        if job is not None and not job.finished:
+            job.update(stage=stage)
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RESULT_TTL_SECONDS
+        for job_id in [j.id for j in self.jobs.values() if j.finished and j.updated_at < cutoff]:
+            del self.jobs[job_id]
+
+    def pending_count(self, username: str = None) -> int:
+        return sum(1 for j in self.jobs.values()
+                   if not j.finished and (username is None or j.username == username))
+
+    def submit(self, username: str, kind: str, params: dict, runner) -> Job:
+        """
+        Queue `runner(job)` (a coroutine function returning the job result).
+        Raises JobQueueFull instead of queueing beyond the pending limits.
+        """
+        self._start()
+        self._prune()
+        if self.pending_count() >= self.max_pending:
+            raise JobQueueFull("Too many jobs are queued. Please try again later.")
+        if self.pending_count(username) >= self.max_pending_per_user:
+            raise JobQueueFull(f"You already have {self.max_pending_per_user} unfinished jobs. "
+                               "Wait for one to finish before submitting another.")
+        job = Job(username, kind, params)
+        self.jobs[job.id] = job
+        task = asyncio.create_task(self._run(job, runner))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: Job, runner):
+        user_slots = self._user_slots.setdefault(job.username, asyncio.Semaphore(self.per_user_concurrency))
+        try:
+            async with user_slots, self._global_slots:
+                job.update(status="running")
+                result = await runner(job)
+            if isinstance(result, dict) and "error" in result:
+                job.error = result["error"]
+                job.update(status="failed")
+            else:
+                job.result = result
+                job.update(stage="done", status="succeeded")
+        except Exception as e:
+            job.error = f"Job failed: {str(e)}"
+            job.update(status="failed")
+
+    def get(self, job_id: str) -> Job:
+        return self.jobs.get(job_id)
+
+    async def events(self, job_id: str, heartbeat: float = 15.0):
+        """
+        Yield job snapshots whenever the job changes, ending once it finishes.
+        Yields None after `heartbeat` idle seconds so callers can send a
+        keep-alive and proxies do not close the stream.
+        """
+        job = self.jobs[job_id]
+        seen = 0
+        while True:
+            changed = job._changed
+            if len(job.events) > seen:
+                seen = len(job.events)
+                yield job.to_dict()
+                if job.finished:
+                    return
+                continue
+            try:
+                await asyncio.wait_for(changed.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+
+    def shutdown(self):
+        if self._listener is not None and self.progress_queue is not None:
+            self.progress_queue.put(None)
+            self._listener = None
+        for task in list(self._tasks):
+            task.cancel()
@@ -1,30 +1,52 @@
-from fastapi import FastAPI, File, UploadFile, Query, HTTPException, Depends
+from fastapi import FastAPI, File, UploadFile, Query, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse, Response, PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from pydantic import BaseModel
-from typing import Dict
+from typing import Dict, List, Optional
 import pandas as pd
-import io
 import os
 import json
-import base64
-from sklearn.linear_model import LinearRegression, LogisticRegression
-from sklearn.naive_bayes import GaussianNB
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, r2_score, accuracy_score, classification_report
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
-import tempfile
+import hashlib
+import logging
+import time
+from starlette.concurrency import run_in_threadpool
+from ingest import (
+    spool_upload, hash_file, summarize_upload, iter_csv_chunks, read_upload, upload_suffix, dataset_stem, UploadSummary,
+    UPLOAD_FORMATS
+)
+from scoring import model_cache, get_model, score_frame, iter_scored_csv, SCORING_CHUNK_ROWS
+from dataset_store import dataset_store, dataset_name
+from compaction import downcast_numerics, memory_usage, memory_report
+from admission import (
+    memory_budget, AdmissionRejected, check_dataset_quota, upload_memory_estimate, prediction_memory_estimate,
+    ADMISSION_TIMEOUT_SECONDS, USER_DATASET_QUOTA_BYTES
+)
+from execution import execution_engine, ProgressReporter, PREDICT_WARMUP
+from jobs import LocalJobBackend, JobQueueFull
+from pipeline import run_prediction, run_comparison, PREPROCESSING
+from incremental import run_incremental_prediction, run_incremental_comparison, resolve_training_mode
+from charts import render_stored_chart, chart_options, CHART_TYPES, CHART_PRESETS, MEDIA_TYPES
+from artifacts import result_key, prediction_key
+from caching import LRUCache
+from instrumentation import (
+    configure_logging, timed_request, request_timer, server_timing_header, request_duration, observe_stages,
+    render_metrics
+)
+import auth
+from auth import principal_cache, invalidate_principal, run_bcrypt
 from database.mongo_client import (
     save_dataframe_to_mongo, create_user, find_user_by_username, verify_password, 
-    save_regression_result, get_user_results, save_user_file, get_user_files,
-    get_user_result_by_id
+    save_regression_result, list_user_results, save_user_file, get_user_files,
+    get_user_result_by_id, ensure_indexes, get_cached_prediction, save_cached_prediction,
+    invalidate_cached_predictions, delete_user_file
 )
 
+configure_logging()
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 
 # Allow CORS for local frontend
@@ -42,6 +64,62 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
 
+# Rendered chart images, keyed by (result_id, chart_type, result timestamp)
+CHART_CACHE_MAX_BYTES = int(os.getenv('CHART_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+CHART_CACHE_MAX_AGE = int(os.getenv('CHART_CACHE_MAX_AGE', 3600))
+chart_cache = LRUCache(max_bytes=CHART_CACHE_MAX_BYTES)
+
+# Background prediction jobs (see /api/predict/jobs)
+job_backend = LocalJobBackend(get_progress_queue=lambda: execution_engine.progress_queue)
+
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    """
+    Time each request and the stages endpoints report to request_timer():
+    returned in a Server-Timing header and aggregated for /metrics.
+    """
+    start = time.perf_counter()
+    with timed_request() as timer:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    # Label by route template, not raw path, to keep the number of series bounded
+    route = request.scope.get("route")
+    route = route.path if route is not None else "unmatched"
+    request_duration.observe(elapsed, request.method, route, str(response.status_code))
+    observe_stages(route, timer.durations)
+    response.headers["Server-Timing"] = server_timing_header(timer.durations, elapsed)
+    return response
+
+@app.get("/metrics")
+def metrics():
+    """Request and stage latency histograms and memory admission gauges (per process) in the Prometheus text format"""
+    budget = memory_budget.stats()
+    gauges = {
+        "insightfull_memory_budget_bytes": ("Memory uploads and predictions may reserve.", budget["capacity_bytes"]),
+        "insightfull_memory_reserved_bytes": ("Memory reserved by admitted uploads and predictions.",
+                                              budget["reserved_bytes"]),
+        "insightfull_admission_waiting_requests": ("Requests waiting for memory.", budget["waiting"]),
+        "insightfull_admission_rejected_requests": ("Requests rejected by admission control.", budget["rejected"]),
+    }
+    return PlainTextResponse(render_metrics(gauges), media_type="text/plain; version=0.0.4")
+
+@app.on_event("startup")
+def create_database_indexes():
+    ensure_indexes()
+
+@app.on_event("startup")
+def warm_up_execution_engine():
+    # scikit-learn, matplotlib and seaborn are only imported on first use;
+    # load them in the background now rather than in the first request
+    if PREDICT_WARMUP:
+        execution_engine.warm_up()
+
+@app.on_event("shutdown")
+def shutdown_execution_engine():
+    job_backend.shutdown()
+    execution_engine.shutdown()
+    auth.shutdown()
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -52,13 +130,27 @@ class User(BaseModel):
 class UserInDB(User):
     password: str
 
-# Store uploaded files temporarily (in memory for now)
-uploaded_files = {}
-
 class PredictionRequest(BaseModel):
     filename: str
     target_column: str
     model_type: str = "linear_regression"  # Default to linear regression
+    inline_charts: bool = False  # Embed base64 PNGs instead of serving them from /api/chart
+    chart_mode: str = "image"  # "image" for server-rendered charts, "data" for client-side rendering
+    training_mode: str = "auto"  # "memory", "incremental" (out of core), or "auto" to decide by dataset size
+    sample_rows: Optional[int] = None  # Train on a sample of this many rows (quick approximate results)
+    sample_fraction: Optional[float] = None  # ... or on this fraction of the rows
+
+class ScoringRequest(BaseModel):
+    rows: List[Dict]  # Feature values by column name, one dict per row
+
+class ComparisonRequest(BaseModel):
+    filename: str
+    model_types: List[str]
+    target_column: Optional[str] = None
+    target_columns: List[str] = []  # Compare on several targets; overrides target_column
+    inline_charts: bool = False
+    chart_mode: str = "image"
+    training_mode: str = "auto"
 
 # --- Auth utility functions ---
 def create_access_token(data: dict, expires_delta: timedelta = None):
@@ -80,23 +172,39 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    # Skip the user lookup while a recently verified principal is cached
+    principal = principal_cache.get(username)
+    if principal is not None:
+        return principal
     user = find_user_by_username(username)
     if user is None:
         raise credentials_exception
-    return User(username=username)
+    principal = User(username=username)
+    principal_cache.set(username, principal)
+    return principal
+
+def authenticate_user(username: str, password: str):
+    """Return the user document if the password matches, else None"""
+    user = find_user_by_username(username)
+    if not user or not verify_password(password, user['password']):
+        return None
+    return user
 
 # --- Auth endpoints ---
 @app.post("/api/register")
-def register(form_data: OAuth2PasswordRequestForm = Depends()):
-    if not create_user(form_data.username, form_data.password):
+async def register(form_data: OAuth2PasswordRequestForm = Depends()):
+    created = await run_bcrypt(create_user, form_data.username, form_data.password)
+    if not created:
         raise HTTPException(status_code=400, detail="Username already registered")
+    invalidate_principal(form_data.username)
     return {"message": "User registered successfully"}
 
 @app.post("/api/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = find_user_by_username(form_data.username)
-    if not user or not verify_password(form_data.password, user['password']):
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await run_bcrypt(authenticate_user, form_data.username, form_data.password)
+    if not user:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
+    principal_cache.set(user['username'], User(username=user['username']))
     access_token = create_access_token(data={"sub": user['username']})
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -111,407 +219,506 @@ def get_user_files_api(current_user: User = Depends(get_current_user)):
             f["uploaded_at"] = f["uploaded_at"].isoformat()
     return files
 
+@app.delete("/api/user/files/{filename}")
+def delete_user_file_api(filename: str, current_user: User = Depends(get_current_user)):
+    """Delete an uploaded file and its stored dataset, freeing its share of the user's quota"""
+    try:
+        name = dataset_name(current_user.username, filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    found = dataset_store.exists(name)
+    dataset_store.delete(name)
+    if not delete_user_file(current_user.username, filename) and not found:
+        raise HTTPException(status_code=404, detail="File not found")
+    return {"message": f"Deleted {filename}"}
+
+@app.get("/api/user/datasets")
+def get_user_datasets_api(current_user: User = Depends(get_current_user)):
+    """Stored size of each of the user's datasets, against their quota"""
+    usage = dataset_store.usage(current_user.username)
+    return {
+        "datasets": [{"filename": filename, "stored_bytes": size} for filename, size in sorted(usage.items())],
+        "used_bytes": sum(usage.values()),
+        "quota_bytes": USER_DATASET_QUOTA_BYTES or None,
+    }
+
+@app.get("/api/cache/stats")
+def get_cache_stats(current_user: User = Depends(get_current_user)):
+    """Hit/miss counters of this worker's in-process caches"""
+    return {
+        "auth_principals": principal_cache.stats(),
+        "charts": chart_cache.stats(),
+        "models": model_cache.stats(),
+        "datasets": dataset_store.table_cache_stats(),
+    }
+
+def report_save_progress(saved_rows: int, total_rows: int):
+    logger.debug("Saved %d/%d rows to MongoDB", saved_rows, total_rows)
+
 @app.post("/api/upload")
 async def upload_file(
     file: UploadFile = File(...), 
     save_to_db: bool = Query(False, description="Save file to MongoDB"),
+    db_layout: str = Query("rows", pattern="^(rows|columnar)$", description="MongoDB layout: a document per row, or columnar chunks of rows"),
+    streaming: bool = Query(False, description="Spool to disk and parse in chunks to bound memory use"),
     current_user: User = Depends(get_current_user)
 ) -> Dict:
-    # Only accept CSV for now
-    if not file.filename.endswith('.csv'):
-        return {"error": "Only CSV files are supported."}
+    try:
+        dataset_name(current_user.username, file.filename)
+    except ValueError as e:
+        return {"error": str(e)}
+    suffix = upload_suffix(file.filename)
+    if suffix is None:
+        return {"error": f"Unsupported file type. Upload one of: {', '.join(UPLOAD_FORMATS)}."}
     
-    # Read file contents into pandas DataFrame
-    contents = await file.read()
+    size = upload_size(file)
+    if not streaming and upload_memory_estimate(size, False) > memory_budget.capacity:
+        # Too big to parse whole within the memory budget: parse it in chunks instead
+        logger.info("Streaming %s (%d bytes): too large for a whole-file parse", file.filename, size)
+        streaming = True
+    try:
+        # Reject early if the user's other files already fill the quota; the
+        # stored size is only known after parsing (see enforce_dataset_quota)
+        check_dataset_quota(current_user.username, file.filename, 0)
+        async with memory_budget.reserve(upload_memory_estimate(size, streaming)):
+            if streaming:
+                return await upload_file_streaming(file, suffix, save_to_db, db_layout, current_user)
+            return await upload_file_whole(file, suffix, save_to_db, db_layout, current_user)
+    except AdmissionRejected as e:
+        raise admission_error(e)
+
+def upload_size(file: UploadFile) -> int:
+    """Size in bytes of an upload (already received and spooled by the framework)"""
+    if file.size is not None:
+        return file.size
+    position = file.file.tell()
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(position)
+    return size
+
+def admission_error(e: AdmissionRejected) -> HTTPException:
+    """503 with Retry-After when the server is busy, 413 when the request can never fit"""
+    if e.retryable:
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return HTTPException(status_code=413, detail=str(e))
+
+async def upload_file_whole(file: UploadFile, suffix: str, save_to_db: bool, db_layout: str,
+                            current_user: User) -> Dict:
+    """Read and parse the whole upload in memory"""
+    name = dataset_name(current_user.username, file.filename)
+    timer = request_timer()
+    # Hash the spooled upload in chunks; it is only read into memory if it is new
+    with timer.stage('receive'):
+        content_hash = await run_in_threadpool(hash_file, file.file)
+    previous_hash = dataset_store.content_hash_of(name)
     try:
-        df = pd.read_csv(io.BytesIO(contents))
-        # Store the DataFrame in memory
-        uploaded_files[file.filename] = df
+        # Identical content was parsed before: reuse the stored dataset and profile
+        file_stats = dataset_store.get_profile(content_hash)
+        reused = file_stats is not None
+        if reused:
+            dataset_store.link(name, content_hash)
+            with timer.stage('load'):
+                df = dataset_store.load_dataframe(name, compact=False) if save_to_db else None
+        else:
+            with timer.stage('receive'):
+                contents = await file.read()
+            with timer.stage('parse'):
+                df = read_upload(contents, suffix)
+            # Persist the parsed DataFrame so every worker can memory-map it
+            with timer.stage('store'):
+                dataset_store.put_dataframe(name, downcast_numerics(df), content_hash=content_hash)
+            with timer.stage('profile'):
+                summary = UploadSummary()
+                summary.update(df)
+                file_stats = summary.to_dict()
+                file_stats["memory_usage"] = memory_report(dataset_store.open_table(name), memory_usage(df))
+            dataset_store.put_profile(content_hash, file_stats)
+            del contents
+        enforce_dataset_quota(current_user.username, file.filename, previous_hash)
         
         # Save file info to user's account
-        file_data = {
-            "n_rows": int(df.shape[0]),
-            "n_columns": int(df.shape[1]),
-            "columns": list(df.columns),
-            "null_counts": df.isnull().sum().to_dict(),
-            "content_type": file.content_type
-        }
-        is_new_file = save_user_file(current_user.username, file.filename, file_data)
+        with timer.stage('mongo'):
+            is_new_file = save_user_file(current_user.username, file.filename, dict(
+                file_stats, content_type=file.content_type, content_hash=content_hash
+            ))
+            forget_replaced_content(previous_hash, content_hash)
         
         db_message = None
         if save_to_db:
-            count = save_dataframe_to_mongo(file.filename.replace('.csv',''), df)
+            with timer.stage('mongo'):
+                count = save_dataframe_to_mongo(
+                    dataset_stem(file.filename), df, layout=db_layout, progress=report_save_progress
+                )
             db_message = f"Saved {count} records to MongoDB."
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        return {"error": f"Failed to parse CSV: {str(e)}"}
+        return {"error": f"Failed to parse file: {str(e)}"}
     
-    summary = {
+    return upload_summary(file, file_stats, is_new_file, db_message, reused)
+
+def enforce_dataset_quota(username: str, filename: str, previous_hash: str):
+    """
+    Check the quota against the stored size of a just-stored upload; if it
+    is over, point the name back at its previous content (or remove it)
+    and re-raise AdmissionRejected.
+    """
+    name = dataset_name(username, filename)
+    try:
+        check_dataset_quota(username, filename, dataset_store.size_of(name))
+    except AdmissionRejected:
+        content_hash = dataset_store.content_hash_of(name)
+        if previous_hash is not None and os.path.exists(dataset_store.content_path(previous_hash)):
+            dataset_store.link(name, previous_hash)
+            if content_hash is not None and content_hash != previous_hash:
+                dataset_store.release(content_hash)
+        else:
+            dataset_store.delete(name)
+        raise
+
+def forget_replaced_content(previous_hash: str, content_hash: str):
+    """Drop memoized predictions for content a re-upload replaced, and the content if nothing else uses it"""
+    if previous_hash is not None and previous_hash != content_hash:
+        removed = invalidate_cached_predictions(previous_hash)
+        if removed:
+            logger.info("Invalidated %d cached predictions for replaced content %s", removed, previous_hash)
+        dataset_store.release(previous_hash)
+
+def upload_summary(file: UploadFile, file_stats: dict, is_new_file: bool, db_message: str, reused: bool) -> Dict:
+    message = "File received (identical content was already parsed)" if reused else "File received and parsed!"
+    return {
         "filename": file.filename,
         "content_type": file.content_type,
-        "n_rows": int(df.shape[0]),
-        "n_columns": int(df.shape[1]),
-        "columns": list(df.columns),
-        "null_counts": df.isnull().sum().to_dict(),
-        "message": "File received and parsed!" + (" (Updated existing file)" if not is_new_file else ""),
+        **file_stats,
+        "message": message + (" (Updated existing file)" if not is_new_file else ""),
         "db_message": db_message,
-        "is_new_file": is_new_file
+        "is_new_file": is_new_file,
+        "reused_dataset": reused
     }
-    return summary
 
-@app.post("/api/predict")
-async def predict(request: PredictionRequest, current_user: User = Depends(get_current_user)) -> Dict:
+async def upload_file_streaming(file: UploadFile, suffix: str, save_to_db: bool, db_layout: str,
+                                current_user: User) -> Dict:
+    """
+    Spool the upload to disk and parse it in chunks, so memory use stays
+    bounded by the chunk size rather than the file size. The content is
+    hashed while it is spooled, and known content is not parsed again.
+    """
+    name = dataset_name(current_user.username, file.filename)
+    timer = request_timer()
+    with timer.stage('receive'):
+        path, content_hash = await spool_upload(file, suffix)
+    previous_hash = dataset_store.content_hash_of(name)
+    saved_records = 0
+    parsed_bytes = 0
     try:
-        # Get the stored DataFrame
-        if request.filename not in uploaded_files:
-            return {"error": "File not found. Please upload the file first."}
-        
-        df = uploaded_files[request.filename]
-        
-        # Check if target column exists
-        if request.target_column not in df.columns:
-            return {"error": f"Target column '{request.target_column}' not found in the dataset."}
-        
-        # Determine if this is a classification or regression problem
-        target_dtype = df[request.target_column].dtype
-        target_unique_count = df[request.target_column].nunique()
-        target_total_count = len(df[request.target_column])
-        
-        # Classification if:
-        # 1. Object/category dtype, OR
-        # 2. Numeric but with few unique values (less than 15 unique values or less than 25% of total rows)
-        # 3. But NOT if it's clearly a continuous variable (like Sales, Advertising_Spend)
-        is_classification = (
-            target_dtype == 'object' or 
-            target_dtype.name == 'category' or
-            (target_dtype in ['int64', 'float64'] and (
-                target_unique_count < 15 or 
-                target_unique_count < max(5, target_total_count * 0.25)
-            ) and
-            # Don't classify if the target name suggests it's a continuous variable
-            not any(keyword in request.target_column.lower() for keyword in 
-                   ['sales', 'revenue', 'profit', 'amount', 'spend', 'cost', 'price', 'value', 'score', 'rating'])
-            )
-        )
-        
-        print(f"Target analysis:")
-        print(f"  - Dtype: {target_dtype}")
-        print(f"  - Unique values: {target_unique_count}")
-        print(f"  - Total samples: {target_total_count}")
-        print(f"  - Classification recommended: {is_classification}")
-        
-        # Provide guidance based on the target column
-        if "month" in request.target_column.lower():
-            print(f"  - Note: {request.target_column} detected as categorical (months)")
-        elif any(keyword in request.target_column.lower() for keyword in ['sales', 'revenue', 'profit', 'amount', 'spend', 'cost', 'price', 'value', 'score', 'rating']):
-            print(f"  - Note: {request.target_column} detected as continuous variable")
-        elif target_unique_count < 15:
-            print(f"  - Note: {request.target_column} has few unique values ({target_unique_count}), consider classification")
+        file_stats = dataset_store.get_profile(content_hash)
+        reused = file_stats is not None
+        if reused:
+            dataset_store.link(name, content_hash)
+            enforce_dataset_quota(current_user.username, file.filename, previous_hash)
+            if save_to_db:
+                with timer.stage('load'):
+                    df = dataset_store.load_dataframe(name, compact=False)
+                with timer.stage('mongo'):
+                    saved_records = save_dataframe_to_mongo(dataset_stem(file.filename), df, layout=db_layout)
         else:
-            print(f"  - Note: {request.target_column} has many unique values ({target_unique_count}), consider regression")
-        
-        # Prepare features
-        numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
-        if request.target_column in numeric_columns:
-            numeric_columns.remove(request.target_column)
-        
-        if len(numeric_columns) == 0:
-            return {"error": "No numeric columns found for features. Need at least one numeric column besides target."}
-        
-        X = df[numeric_columns]
-        y = df[request.target_column]
-        
-        # Clean the target variable if it's categorical (remove extra spaces)
-        if is_classification and target_dtype == 'object':
-            y = y.str.strip() if hasattr(y, 'str') else y
-            print(f"Cleaned target variable - unique values: {y.unique()}")
-        
-        # Handle classification vs regression
-        y_encoded = None
-        y_classes = None
-        
-        if is_classification:
-            # For classification, encode target variable
-            le = LabelEncoder()
-            y_encoded = le.fit_transform(y)
-            y_classes = le.classes_.tolist()
-            
-            # Check if we have enough samples per class
-            unique, counts = np.unique(y_encoded, return_counts=True)
-            min_samples_per_class = min(counts)
-            
-            print(f"Classification detected: {len(y_classes)} classes - {y_classes}")
-            print(f"Samples per class: {dict(zip(y_classes, counts))}")
-            print(f"Minimum samples per class: {min_samples_per_class}")
-            
-            # For classification, we need at least 2 samples per class
-            # But if we have very few classes (like months), we can be more lenient
-            if min_samples_per_class < 2 and len(y_classes) > 5:
-                return {"error": f"Not enough samples per class for classification. Minimum samples needed: 2, got: {min_samples_per_class}"}
-            elif min_samples_per_class < 1:
-                return {"error": f"Not enough samples per class for classification. Minimum samples needed: 1, got: {min_samples_per_class}"}
-        else:
-            y_encoded = y
-            print(f"Regression detected: target range {y.min()} to {y.max()}")
-        
-        # Split data with stratification for classification
-        if is_classification:
-            # Check if we can use stratification (need at least 2 samples per class)
-            unique, counts = np.unique(y_encoded, return_counts=True)
-            min_samples_per_class = min(counts)
-            num_classes = len(unique)
-            
-            # Calculate appropriate test size for small datasets
-            if len(X) < 10:
-                test_size = max(0.1, 1.0 / len(X))  # At least 1 sample for testing
-            else:
-                test_size = 0.2
-            
-            if min_samples_per_class >= 2 and num_classes <= len(X) * test_size:
-                X_train, X_test, y_train, y_test = train_test_split(
-                    X, y_encoded, test_size=test_size, random_state=42, stratify=y_encoded
-                )
-                print(f"Used stratified split with test_size={test_size}")
-            else:
-                # Use regular split if not enough samples for stratification
-                X_train, X_test, y_train, y_test = train_test_split(
-                    X, y_encoded, test_size=test_size, random_state=42
-                )
-                print(f"Warning: Using regular split instead of stratified split due to insufficient samples per class")
-        else:
-            X_train, X_test, y_train, y_test = train_test_split(X, y_encoded, test_size=0.2, random_state=42)
-        
-        # Scale features for better performance
-        scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train)
-        X_test_scaled = scaler.transform(X_test)
-        
-        # Check for potential issues with the data
-        print(f"Feature statistics:")
-        print(f"X_train shape: {X_train.shape}")
-        print(f"y_train range: {y_train.min()} to {y_train.max()}")
-        print(f"y_train mean: {y_train.mean():.2f}")
-        print(f"y_train std: {y_train.std():.2f}")
-        
-        # Check for constant target (which would cause issues)
-        if y_train.std() == 0:
-            return {"error": "Target variable has no variance (all values are the same). Cannot perform regression."}
-        
-        # Train model based on type
-        if request.model_type == "linear_regression":
-            if is_classification:
-                return {"error": "Linear Regression is for regression problems. Use Logistic Regression for classification."}
-            
-            # Check if target variable is suitable for regression
-            if y_train.nunique() < 3:
-                return {"error": f"Target variable has only {y_train.nunique()} unique values. Consider using classification instead."}
-            
-            model = LinearRegression()
-            model.fit(X_train_scaled, y_train)
-            y_pred = model.predict(X_test_scaled)
-            
-            # Calculate regression metrics
-            mse = mean_squared_error(y_test, y_pred)
-            r2 = r2_score(y_test, y_pred)
-            
-            # Handle negative R² (which indicates very poor fit)
-            if r2 < 0:
-                print(f"Warning: Negative R² score ({r2:.3f}) indicates very poor model fit")
-                # Calculate baseline (mean prediction) for comparison
-                baseline_pred = np.full_like(y_test, y_train.mean())
-                baseline_mse = mean_squared_error(y_test, baseline_pred)
-                print(f"Baseline MSE (mean prediction): {baseline_mse:.3f}")
-                print(f"Model MSE: {mse:.3f}")
+            with dataset_store.writer(name, content_hash) as writer:
+                def save_chunk(chunk):
+                    nonlocal saved_records, parsed_bytes
+                    parsed_bytes += memory_usage(chunk)
+                    with timer.stage('store'):
+                        writer.write(downcast_numerics(chunk))
+                    if save_to_db:
+                        with timer.stage('mongo'):
+                            saved_records += save_dataframe_to_mongo(
+                                dataset_stem(file.filename), chunk, layout=db_layout, row_offset=saved_records
+                            )
                 
-                # If model is worse than baseline, provide a warning
-                if mse > baseline_mse:
-                    print(f"Model performs worse than baseline prediction")
-            
-            metrics = {
-                "mean_squared_error": float(mse),
-                "r2_score": float(r2),
-                "rmse": float(np.sqrt(mse))
-            }
-            
-            feature_importance = dict(zip(numeric_columns, model.coef_))
-            
-        elif request.model_type == "logistic_regression":
-            if not is_classification:
-                return {"error": "Logistic Regression is for classification problems. Use Linear Regression for regression."}
-            
-            model = LogisticRegression(random_state=42, max_iter=1000)
-            model.fit(X_train_scaled, y_train)
-            y_pred = model.predict(X_test_scaled)
-            y_pred_proba = model.predict_proba(X_test_scaled)
-            
-            # Calculate classification metrics
-            accuracy = accuracy_score(y_test, y_pred)
-            classification_rep = classification_report(y_test, y_pred, output_dict=True)
-            
-            print(f"Logistic Regression - Accuracy: {accuracy}")
-            print(f"Unique values in y_test: {np.unique(y_test)}")
-            print(f"Unique values in y_pred: {np.unique(y_pred)}")
-            
-            metrics = {
-                "accuracy": float(accuracy),
-                "classification_report": classification_rep
-            }
-            
-            feature_importance = dict(zip(numeric_columns, model.coef_[0]))
-            
-        elif request.model_type == "naive_bayes":
-            if not is_classification:
-                return {"error": "Naive Bayes is for classification problems. Use Linear Regression for regression."}
-            
-            model = GaussianNB()
-            model.fit(X_train_scaled, y_train)
-            y_pred = model.predict(X_test_scaled)
-            y_pred_proba = model.predict_proba(X_test_scaled)
-            
-            # Calculate classification metrics
-            accuracy = accuracy_score(y_test, y_pred)
-            classification_rep = classification_report(y_test, y_pred, output_dict=True)
-            
-            metrics = {
-                "accuracy": float(accuracy),
-                "classification_report": classification_rep
-            }
-            
-            # Naive Bayes doesn't have feature importance in the same way
-            feature_importance = {col: 0.0 for col in numeric_columns}
-            
-        else:
-            return {"error": f"Unknown model type: {request.model_type}"}
-        
-        # Generate visualizations
-        charts = generate_charts(df, request.target_column, numeric_columns, y_test, y_pred, is_classification)
-        
-        # Generate model recommendations
-        recommendations = []
-        
-        # Check performance based on model type
-        if is_classification:
-            accuracy = metrics.get('accuracy', 0)
-            if accuracy < 0.5:  # Poor classification performance
-                recommendations.append("Consider trying different classification algorithms like Random Forest or SVM")
-        else:
-            r2 = metrics.get('r2_score', 0)
-            if r2 < 0.1:  # Poor regression performance
-                recommendations.append("Consider trying non-linear models like Random Forest or Polynomial Regression")
-                if y_train.nunique() < 10:
-                    recommendations.append("Target has few unique values - consider classification instead")
-        
-        result = {
-            "target_column": request.target_column,
-            "feature_columns": numeric_columns,
-            "model_type": request.model_type,
-            "is_classification": is_classification,
-            "metrics": metrics,
-            "feature_importance": feature_importance,
-            "sample_predictions": {
-                "actual": y_test.tolist()[:5],
-                "predicted": y_pred.tolist()[:5]
-            },
-            "charts": charts,
-            "recommendations": recommendations
-        }
-        
-        if y_classes:
-            result["target_classes"] = y_classes
-        
-        # Save result for authenticated user
-        is_new_result = save_regression_result(current_user.username, request.filename, result, request.model_type)
-        result["is_new_result"] = is_new_result
-        
-        return result
-        
+                file_stats = summarize_upload(path, suffix, on_chunk=save_chunk, timer=timer)
+            with timer.stage('profile'):
+                file_stats["memory_usage"] = memory_report(dataset_store.open_table(name), parsed_bytes)
+            dataset_store.put_profile(content_hash, file_stats)
+            enforce_dataset_quota(current_user.username, file.filename, previous_hash)
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        return {"error": f"Failed to parse file: {str(e)}"}
+    finally:
+        os.remove(path)
+    
+    file_data = dict(file_stats, content_type=file.content_type, content_hash=content_hash)
+    with timer.stage('mongo'):
+        is_new_file = save_user_file(current_user.username, file.filename, file_data)
+        forget_replaced_content(previous_hash, content_hash)
+    db_message = f"Saved {saved_records} records to MongoDB." if save_to_db else None
+    
+    return upload_summary(file, file_stats, is_new_file, db_message, reused)
+
+def prediction_cache_key(filename: str, target_column: str, model_type: str, inline_charts: bool, chart_mode: str,
+                         training_mode: str, **sampling):
+    """
+    Memoization key for a prediction, or None when the dataset is not
+    content-addressed (uploaded before content hashing existed).
+    Returns (content_hash, key).
+    """
+    content_hash = dataset_store.content_hash_of(filename)
+    if content_hash is None:
+        return None, None
+    settings = dict(PREPROCESSING, inline_charts=inline_charts, chart_mode=chart_mode, training_mode=training_mode,
+                    **sampling)
+    return content_hash, prediction_key(content_hash, target_column, model_type, settings)
+
+async def run_predict_pipeline(request: PredictionRequest, username: str, progress=None,
+                               admission_timeout: float = ADMISSION_TIMEOUT_SECONDS) -> Dict:
+    """
+    Train on the execution engine, then save the result for the user.
+    Results are memoized by dataset content, target, model type and
+    preprocessing settings, so an unchanged request skips fitting.
+    Training first reserves its estimated memory from the memory budget,
+    waiting up to `admission_timeout` seconds (None: until it fits).
+    Stage timings (including the worker's) go to request_timer().
+    """
+    timer = request_timer()
+    try:
+        name = dataset_name(username, request.filename)
+    except ValueError as e:
+        return {"error": str(e)}
+    sampling = {name: value for name, value in
+                (("sample_rows", request.sample_rows), ("sample_fraction", request.sample_fraction))
+                if value is not None}
+    if sampling and request.training_mode == "incremental":
+        return {"error": "Sampling is not supported with incremental training."}
+    try:
+        # A sample is small enough to train in memory
+        training_mode = resolve_training_mode(name, "memory" if sampling else request.training_mode)
+    except ValueError as e:
+        return {"error": str(e)}
+    memory_needed = admission_estimate(name, training_mode, **sampling)
+    if (request.training_mode == "auto" and not sampling and training_mode == "memory"
+            and memory_needed > memory_budget.capacity):
+        # Would never fit in memory: train out of core instead
+        training_mode = "incremental"
+        memory_needed = admission_estimate(name, training_mode)
+    content_hash, cache_key = prediction_cache_key(
+        name, request.target_column, request.model_type, request.inline_charts, request.chart_mode,
+        training_mode, **sampling
+    )
+    result = None
+    if cache_key is not None:
+        with timer.stage('cache'):
+            result = await run_in_threadpool(get_cached_prediction, cache_key)
+    cached = result is not None
+    if not cached:
+        # Artifacts are stored under the cache key so cached results can share them
+        runner = run_incremental_prediction if training_mode == "incremental" else run_prediction
+        async with memory_budget.reserve(memory_needed, admission_timeout):
+            result = await execution_engine.run(
+                runner, name, request.target_column, request.model_type, progress=progress,
+                artifact_key=cache_key or result_key(username, request.filename, request.model_type, request.target_column),
+                inline_charts=request.inline_charts, chart_mode=request.chart_mode,
+                **sampling
+            )
+        timer.merge(result.pop("timings", None))
+        if "error" in result:
+            return result
+        if cache_key is not None:
+            with timer.stage('cache'):
+                await run_in_threadpool(save_cached_prediction, cache_key, content_hash, result)
+    
+    # Save result for authenticated user
+    if progress is not None:
+        progress("persist")
+    with timer.stage('mongo'):
+        is_new_result = await run_in_threadpool(
+            save_regression_result, username, request.filename, result, request.model_type
+        )
+    result["is_new_result"] = is_new_result
+    result["cached"] = cached
+    return result
+
+def admission_estimate(name: str, training_mode: str, **sampling) -> int:
+    """Memory to reserve for training on a dataset; nothing if it does not exist (the pipeline reports that)"""
+    if not dataset_store.exists(name):
+        return 0
+    return prediction_memory_estimate(name, training_mode, **sampling)
+
+@app.post("/api/predict")
+async def predict(request: PredictionRequest, current_user: User = Depends(get_current_user)) -> Dict:
+    try:
+        return await run_predict_pipeline(request, current_user.username)
+    except AdmissionRejected as e:
+        raise admission_error(e)
     except Exception as e:
         return {"error": f"Prediction failed: {str(e)}"}
 
-def generate_charts(df, target_col, feature_cols, y_test, y_pred, is_classification=False):
-    """Generate basic charts and return them as base64 encoded images"""
-    charts = {}
+def comparison_summary(target_column: str, model_type: str, result: dict) -> Dict:
+    """One row of the comparison table: the headline metrics of a result"""
+    if "error" in result:
+        return {"target_column": target_column, "model_type": model_type, "error": result["error"]}
+    metrics = result["metrics"]
+    return {
+        "target_column": target_column,
+        "model_type": model_type,
+        "is_classification": result["is_classification"],
+        "metrics": {name: value for name, value in metrics.items() if name != "classification_report"},
+    }
+
+@app.post("/api/predict/compare")
+async def compare_models(request: ComparisonRequest, current_user: User = Depends(get_current_user)) -> Dict:
+    """
+    Train several model types (optionally on several target columns) in one
+    call. The split and scaling are computed once per target and shared by
+    its models, which are fitted concurrently. Each successful result is
+    saved like a /api/predict result.
+    """
+    target_columns = request.target_columns or ([request.target_column] if request.target_column else [])
+    if not target_columns or not request.model_types:
+        return {"error": "Provide at least one target column and one model type."}
+    username = current_user.username
+    try:
+        name = dataset_name(username, request.filename)
+    except ValueError as e:
+        return {"error": str(e)}
+    try:
+        training_mode = resolve_training_mode(name, request.training_mode)
+    except ValueError as e:
+        return {"error": str(e)}
     
+    timer = request_timer()
     try:
-        # 1. Correlation heatmap (only for numeric data)
-        plt.figure(figsize=(10, 8))
-        numeric_cols = df[feature_cols + [target_col]].select_dtypes(include=[np.number]).columns.tolist()
-        if len(numeric_cols) > 1:
-            correlation_matrix = df[numeric_cols].corr()
-            sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', center=0)
-            plt.title('Correlation Heatmap')
-            plt.tight_layout()
-            
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-            buffer.seek(0)
-            correlation_b64 = base64.b64encode(buffer.getvalue()).decode()
-            plt.close()
-            charts["correlation_heatmap"] = f"data:image/png;base64,{correlation_b64}"
-        
-        # 2. Actual vs Predicted plot
-        plt.figure(figsize=(8, 6))
-        if is_classification:
-            # For classification, show confusion matrix-like visualization
-            plt.scatter(range(len(y_test)), y_test, alpha=0.6, label='Actual', s=50)
-            plt.scatter(range(len(y_pred)), y_pred, alpha=0.6, label='Predicted', s=50, marker='x')
-            plt.xlabel('Sample Index')
-            plt.ylabel('Class')
-            plt.title('Actual vs Predicted Classes')
-            plt.legend()
-        else:
-            # For regression, show scatter plot
-            plt.scatter(y_test, y_pred, alpha=0.6)
-            plt.plot([y_test.min(), y_test.max()], [y_test.min(), y_test.max()], 'r--', lw=2)
-            plt.xlabel('Actual Values')
-            plt.ylabel('Predicted Values')
-            plt.title('Actual vs Predicted Values')
-        plt.tight_layout()
-        
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-        buffer.seek(0)
-        scatter_b64 = base64.b64encode(buffer.getvalue()).decode()
-        plt.close()
-        charts["actual_vs_predicted"] = f"data:image/png;base64,{scatter_b64}"
-        
-        # 3. Target column distribution
-        plt.figure(figsize=(8, 6))
-        if is_classification:
-            # For classification, show bar chart
-            df[target_col].value_counts().plot(kind='bar')
-            plt.xlabel(target_col)
-            plt.ylabel('Count')
-            plt.title(f'Distribution of {target_col}')
-            plt.xticks(rotation=45)
-        else:
-            # For regression, show histogram
-            plt.hist(df[target_col], bins=20, alpha=0.7, edgecolor='black')
-            plt.xlabel(target_col)
-            plt.ylabel('Frequency')
-            plt.title(f'Distribution of {target_col}')
-        plt.tight_layout()
-        
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-        buffer.seek(0)
-        dist_b64 = base64.b64encode(buffer.getvalue()).decode()
-        plt.close()
-        charts["target_distribution"] = f"data:image/png;base64,{dist_b64}"
-        
+        results = {target: {} for target in target_columns}
+        keys = {}
+        tasks = []
+        for target_column in target_columns:
+            for model_type in request.model_types:
+                content_hash, cache_key = prediction_cache_key(
+                    name, target_column, model_type, request.inline_charts, request.chart_mode,
+                    training_mode
+                )
+                keys[(target_column, model_type)] = (content_hash, cache_key)
+                with timer.stage('cache'):
+                    cached = await run_in_threadpool(get_cached_prediction, cache_key) if cache_key else None
+                if cached is not None:
+                    results[target_column][model_type] = dict(cached, cached=True)
+                else:
+                    artifact_key = cache_key or result_key(username, request.filename, model_type, target_column)
+                    tasks.append((target_column, model_type, artifact_key))
+        
+        if tasks:
+            runner = run_incremental_comparison if training_mode == "incremental" else run_comparison
+            async with memory_budget.reserve(admission_estimate(name, training_mode)):
+                trained = await execution_engine.run(
+                    runner, name, tasks,
+                    inline_charts=request.inline_charts, chart_mode=request.chart_mode,
+                )
+            if "error" in trained:
+                return trained
+            timer.merge(trained["timings"])
+            for target_column, by_model in trained["results"].items():
+                for model_type, result in by_model.items():
+                    content_hash, cache_key = keys[(target_column, model_type)]
+                    if "error" not in result and cache_key is not None:
+                        with timer.stage('cache'):
+                            await run_in_threadpool(save_cached_prediction, cache_key, content_hash, result)
+                    results[target_column][model_type] = dict(result, cached=False)
+        
+        comparison = []
+        for target_column in target_columns:
+            for model_type in request.model_types:
+                result = results[target_column][model_type]
+                if "error" not in result:
+                    with timer.stage('mongo'):
+                        is_new_result = await run_in_threadpool(
+                            save_regression_result, username, request.filename,
+                            {k: v for k, v in result.items() if k != "cached"}, model_type
+                        )
+                    result["is_new_result"] = is_new_result
+                comparison.append(comparison_summary(target_column, model_type, result))
+    except AdmissionRejected as e:
+        raise admission_error(e)
     except Exception as e:
-        charts = {"error": f"Chart generation failed: {str(e)}"}
+        return {"error": f"Comparison failed: {str(e)}"}
+    
+    return {"filename": request.filename, "comparison": comparison, "results": results}
+
+# --- Background prediction jobs ---
+@app.post("/api/predict/jobs", status_code=202)
+async def submit_predict_job(request: PredictionRequest, current_user: User = Depends(get_current_user)):
+    async def runner(job):
+        reporter = ProgressReporter(execution_engine.progress_queue, job.id)
+        with timed_request() as timer:
+            # Background jobs wait for memory instead of failing when the server is busy
+            result = await run_predict_pipeline(request, job.username, progress=reporter, admission_timeout=None)
+        observe_stages("/api/predict/jobs", timer.durations)
+        return result
+    
+    try:
+        job = job_backend.submit(current_user.username, "predict", request.dict(), runner)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"job_id": job.id, "status": job.status}
+
+def get_user_job(job_id: str, username: str):
+    job = job_backend.get(job_id)
+    if job is None or job.username != username:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/predict/jobs/{job_id}")
+def get_predict_job(job_id: str, current_user: User = Depends(get_current_user)):
+    return get_user_job(job_id, current_user.username).to_dict()
+
+@app.get("/api/predict/jobs/{job_id}/events")
+async def stream_predict_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Server-Sent Events stream of job progress, closed once the job finishes"""
+    job = get_user_job(job_id, current_user.username)
     
-    return charts
+    async def event_stream():
+        async for snapshot in job_backend.events(job.id):
+            if snapshot is None:
+                yield ": keep-alive\n\n"
+            else:
+                event = snapshot['status'] if snapshot['status'] in ("succeeded", "failed") else "progress"
+                yield f"event: {event}\ndata: {json.dumps(snapshot, default=str)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.get("/api/user/results")
-def get_user_results_api(current_user: User = Depends(get_current_user)):
-    results = get_user_results(current_user.username)
+def get_user_results_api(
+    limit: int = Query(20, ge=1, le=100, description="Results per page"),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
+    order: str = Query("desc", pattern="^(asc|desc)$", description="Sort by timestamp"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    One page of the user's results with summary metrics only.
+    Load a full result (charts, classification report) from /api/user/results/{result_id}.
+    """
+    try:
+        results, next_cursor = list_user_results(
+            current_user.username, limit=limit, cursor=cursor, newest_first=(order == "desc")
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     # Convert ObjectId and datetime to string for JSON serialization
     for r in results:
         r["_id"] = str(r["_id"])
         if "timestamp" in r:
             r["timestamp"] = r["timestamp"].isoformat()
-    return results
+    return {"results": results, "next_cursor": next_cursor}
+
+def chart_urls(result_doc: dict) -> Dict:
+    """Map each lazily rendered chart of a saved result to its /api/chart URL"""
+    result_id = str(result_doc["_id"])
+    return {
+        chart_type: f"/api/chart/{chart_type}?result_id={result_id}"
+        for chart_type in result_doc.get("result", {}).get("chart_types", [])
+    }
 
 @app.get("/api/user/results/{result_id}")
 def get_user_result_detail(result_id: str, current_user: User = Depends(get_current_user)):
@@ -519,6 +726,9 @@ def get_user_result_detail(result_id: str, current_user: User = Depends(get_curr
     if not result:
         raise HTTPException(status_code=404, detail="Result not found")
     
+    if "chart_key" in result["result"]:
+        result["result"]["charts"] = chart_urls(result)
+    
     # Convert ObjectId and datetime to string for JSON serialization
     result["_id"] = str(result["_id"])
     if "timestamp" in result:
@@ -526,7 +736,102 @@ def get_user_result_detail(result_id: str, current_user: User = Depends(get_curr
     return result
 
 @app.get("/api/chart/{chart_type}")
-async def get_chart(chart_type: str):
-    """Serve chart images"""
-    # This is a simplified version - in production you'd want proper file serving
-    return {"message": f"Chart {chart_type} would be served here"} 
\ No newline at end of file
+async def get_chart(
+    chart_type: str,
+    request: Request,
+    result_id: str = Query(..., description="ID of the saved result the chart belongs to"),
+    preset: str = Query(None, description=f"Output preset: {', '.join(CHART_PRESETS)}"),
+    format: str = Query(None, description=f"Image format: {', '.join(MEDIA_TYPES)}"),
+    dpi: int = Query(None, ge=30, le=300, description="Resolution of raster formats"),
+    current_user: User = Depends(get_current_user)
+):
+    """Serve a result's chart as an image, rendering it on first request"""
+    if chart_type not in CHART_TYPES:
+        raise HTTPException(status_code=404, detail=f"Unknown chart type: {chart_type}")
+    try:
+        options = chart_options(preset, format, dpi)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        result = await run_in_threadpool(get_user_result_by_id, current_user.username, result_id)
+    except Exception:
+        result = None
+    if not result or chart_type not in result["result"].get("chart_types", []):
+        raise HTTPException(status_code=404, detail="Chart not found")
+    
+    # Re-running a prediction updates the result's timestamp, which changes the cache key and ETag
+    version = result["timestamp"].isoformat() if "timestamp" in result else ""
+    cache_key = (result_id, chart_type, version, options["format"], options["dpi"], options["scale"])
+    etag = '"' + hashlib.sha1(repr(cache_key).encode()).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={CHART_CACHE_MAX_AGE}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    image = chart_cache.get(cache_key)
+    if image is None:
+        try:
+            image = await execution_engine.run(render_stored_chart, result["result"]["chart_key"], chart_type, options)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Chart data is no longer available")
+        chart_cache.set(cache_key, image)
+    return Response(content=image, media_type=MEDIA_TYPES[options["format"]], headers=headers)
+
+# --- Scoring with saved models ---
+async def get_result_model(result_id: str, username: str) -> dict:
+    """Fitted pipeline of one of the user's results, or 404"""
+    try:
+        result = await run_in_threadpool(get_user_result_by_id, username, result_id)
+    except Exception:
+        result = None
+    if not result:
+        raise HTTPException(status_code=404, detail="Result not found")
+    model_key = result["result"].get("model_key")
+    if model_key is None:
+        raise HTTPException(status_code=404, detail="No saved model for this result. Run the prediction again.")
+    try:
+        return await run_in_threadpool(get_model, model_key)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Saved model is no longer available")
+
+@app.post("/api/models/{result_id}/predict")
+async def predict_with_model(result_id: str, request: ScoringRequest, current_user: User = Depends(get_current_user)):
+    """Score JSON rows with the model fitted for a saved result, without retraining"""
+    bundle = await get_result_model(result_id, current_user.username)
+    if not request.rows:
+        raise HTTPException(status_code=400, detail="No rows to score")
+    try:
+        scored = await run_in_threadpool(score_frame, bundle, pd.DataFrame(request.rows))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"model_type": bundle["model_type"], "target_column": bundle["target_column"], **scored}
+
+@app.post("/api/models/{result_id}/score")
+async def score_csv(result_id: str, file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
+    """
+    Score an uploaded CSV with a saved model and stream the rows back as CSV
+    with a prediction column. The input is spooled to disk and scored in
+    chunks of SCORING_CHUNK_ROWS, so neither side is held in memory whole.
+    """
+    bundle = await get_result_model(result_id, current_user.username)
+    path, _ = await spool_upload(file)
+    try:
+        header = pd.read_csv(path, nrows=0)
+    except Exception as e:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail=f"Failed to parse CSV: {str(e)}")
+    missing = [col for col in bundle["feature_columns"] if col not in header.columns]
+    if missing:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail=f"Missing feature columns: {missing}")
+    
+    def stream():
+        # Values are validated per chunk; a bad row past the first chunk ends the stream early
+        try:
+            yield from iter_scored_csv(bundle, iter_csv_chunks(path, SCORING_CHUNK_ROWS))
+        finally:
+            os.remove(path)
+    
+    name = os.path.splitext(file.filename or "input")[0]
+    return StreamingResponse(stream(), media_type="text/csv", headers={
+        "Content-Disposition": f'attachment; filename="{name}_scored.csv"'
+    })
@@ -0,0 +1,530 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from dataset_store import dataset_store
+from artifacts import save_arrays, save_model
+from charts import build_chart_inputs, generate_charts
+from chart_data import build_chart_data
+from profiling import usable_profile, distinct_count
+from sampling import sample_dataset, metric_confidence_intervals, SAMPLE_CONFIDENCE_LEVEL
+from instrumentation import StageTimer
+from encoding import FeatureEncoder, MixedNaiveBayes, categorical_columns, ENCODING_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# Preprocessing applied before fitting. It is part of the prediction cache
+# key, so changing a setting (or bumping the version when the pipeline
+# itself changes) retires previously cached results.
+PREPROCESSING = {"version": 4, "test_size": 0.2, "random_state": 42, "scaler": "standard", **ENCODING_SETTINGS}
+# Models fitted side by side by run_comparison (per worker process)
+COMPARE_FIT_THREADS = int(os.getenv('COMPARE_FIT_THREADS', 3))
+
+# scikit-learn is imported inside the functions that use it: it takes
+# seconds to load, and the web process only needs this module to hand
+# work to the execution engine (whose workers preload it, see execution.py).
+
+
+def report_progress(progress, stage: str):
+    """Notify an optional progress callback that the pipeline entered `stage`"""
+    if progress is not None:
+        progress(stage)
+
+
+def load_profile(filename: str, columns) -> dict:
+    """Upload-time column profiles of a stored dataset, or None if it has none"""
+    content_hash = dataset_store.content_hash_of(filename)
+    if content_hash is None:
+        return None
+    return usable_profile(dataset_store.get_profile(content_hash), columns)
+
+
+def detect_classification(target_column: str, target_dtype: str, target_unique_count: int,
+                          target_total_count: int) -> bool:
+    """Decide between classification and regression from the target's dtype name and counts"""
+    # Classification if:
+    # 1. Object/string/category dtype, OR
+    # 2. Numeric but with few unique values (less than 15 unique values or less than 25% of total rows)
+    # 3. But NOT if it's clearly a continuous variable (like Sales, Advertising_Spend)
+    # Compact datasets load with narrower dtypes (int16, float32, string, ...)
+    return (
+        target_dtype in ('object', 'string', 'category') or
+        (target_dtype.startswith(('int', 'uint', 'float')) and (
+            target_unique_count < 15 or 
+            target_unique_count < max(5, target_total_count * 0.25)
+        ) and
+        # Don't classify if the target name suggests it's a continuous variable
+        not any(keyword in target_column.lower() for keyword in 
+               ['sales', 'revenue', 'profit', 'amount', 'spend', 'cost', 'price', 'value', 'score', 'rating'])
+        )
+    )
+
+
+def prepare_training_data(df, target_column: str, progress=None, profile: dict = None,
+                          timer: StageTimer = None) -> dict:
+    """
+    Analyse the target, encode it, split the rows and fit the scaler.
+    Target statistics and feature types come from the upload-time column
+    `profile` when there is one, instead of scanning the data again.
+    The result is shared by every model trained on this target; it
+    returns {"error": ...} if the data is not usable.
+    """
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import LabelEncoder
+    timer = timer or StageTimer()
+    # Check if target column exists
+    if target_column not in df.columns:
+        return {"error": f"Target column '{target_column}' not found in the dataset."}
+
+    # Determine if this is a classification or regression problem
+    if profile is not None:
+        target_dtype = profile[target_column]["dtype"]
+        target_unique_count = distinct_count(profile[target_column])
+        target_total_count = profile[target_column]["count"]
+    else:
+        target_dtype = str(df[target_column].dtype)
+        target_unique_count = df[target_column].nunique()
+        target_total_count = len(df[target_column])
+
+    is_classification = detect_classification(target_column, target_dtype, target_unique_count, target_total_count)
+
+    logger.debug("Target analysis for %s: dtype %s, %d unique values, %d samples, classification recommended: %s",
+                 target_column, target_dtype, target_unique_count, target_total_count, is_classification)
+
+    # Prepare features
+    if profile is not None:
+        numeric_columns = [col for col, column_profile in profile.items() if column_profile["numeric"]]
+    else:
+        numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
+    if target_column in numeric_columns:
+        numeric_columns.remove(target_column)
+    # String, categorical and boolean columns are encoded by FeatureEncoder
+    categorical = categorical_columns(df, exclude=[target_column], profile=profile)
+
+    if len(numeric_columns) == 0 and len(categorical) == 0:
+        return {"error": "No numeric or categorical columns found for features. Need at least one feature column besides target."}
+
+    X = df[numeric_columns + categorical]
+    y = df[target_column]
+    # Narrow stored dtypes are widened for training, so models and metrics work in float64
+    if y.dtype == np.float32:
+        y = y.astype(np.float64)
+
+    # Clean the target variable if it's categorical (remove extra spaces)
+    if is_classification and target_dtype in ('object', 'string'):
+        y = y.str.strip() if hasattr(y, 'str') else y
+
+    # Handle classification vs regression
+    y_encoded = None
+    y_classes = None
+
+    if is_classification:
+        # For classification, encode target variable
+        le = LabelEncoder()
+        y_encoded = le.fit_transform(y)
+        y_classes = le.classes_.tolist()
+
+        # Check if we have enough samples per class
+        unique, counts = np.unique(y_encoded, return_counts=True)
+        min_samples_per_class = min(counts)
+
+        logger.debug("Classification detected: %d classes, samples per class %s",
+                     len(y_classes), dict(zip(y_classes, counts.tolist())))
+
+        # For classification, we need at least 2 samples per class
+        # But if we have very few classes (like months), we can be more lenient
+        if min_samples_per_class < 2 and len(y_classes) > 5:
+            return {"error": f"Not enough samples per class for classification. Minimum samples needed: 2, got: {min_samples_per_class}"}
+        elif min_samples_per_class < 1:
+            return {"error": f"Not enough samples per class for classification. Minimum samples needed: 1, got: {min_samples_per_class}"}
+    else:
+        y_encoded = y
+        logger.debug("Regression detected for %s", target_column)
+
+    report_progress(progress, 'split')
+    with timer.stage('split'):
+        # Split data with stratification for classification
+        if is_classification:
+            # Check if we can use stratification (need at least 2 samples per class)
+            unique, counts = np.unique(y_encoded, return_counts=True)
+            min_samples_per_class = min(counts)
+            num_classes = len(unique)
+
+            # Calculate appropriate test size for small datasets
+            if len(X) < 10:
+                test_size = max(0.1, 1.0 / len(X))  # At least 1 sample for testing
+            else:
+                test_size = PREPROCESSING["test_size"]
+
+            if min_samples_per_class >= 2 and num_classes <= len(X) * test_size:
+                X_train, X_test, y_train, y_test = train_test_split(
+                    X, y_encoded, test_size=test_size, random_state=PREPROCESSING["random_state"], stratify=y_encoded
+                )
+            else:
+                # Use regular split if not enough samples for stratification
+                X_train, X_test, y_train, y_test = train_test_split(
+                    X, y_encoded, test_size=test_size, random_state=PREPROCESSING["random_state"]
+                )
+                logger.info("Using a regular split instead of a stratified one: too few samples per class")
+        else:
+            X_train, X_test, y_train, y_test = train_test_split(
+                X, y_encoded, test_size=PREPROCESSING["test_size"], random_state=PREPROCESSING["random_state"]
+            )
+
+    report_progress(progress, 'scale')
+    with timer.stage('scale'):
+        # Scale numeric features and encode categorical ones (sparse when there are any)
+        scaler = FeatureEncoder(numeric_columns, categorical)
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
+    if scaler.n_features == 0:
+        return {"error": "No usable feature columns: the categorical columns are constant or look like identifiers."}
+
+    # Check for potential issues with the data
+    y_train_std = y_train.std()
+    logger.debug("Training on %s rows x %s features (%s), target std %.2f", *X_train_scaled.shape,
+                 'sparse' if scaler.sparse else 'dense', y_train_std)
+
+    # Check for constant target (which would cause issues)
+    if y_train_std == 0:
+        return {"error": "Target variable has no variance (all values are the same). Cannot perform regression."}
+
+    return {
+        "target_column": target_column,
+        "feature_columns": scaler.feature_columns,
+        "feature_encoding": scaler.describe(),
+        "is_classification": is_classification,
+        "y_classes": y_classes,
+        "scaler": scaler,
+        "X_train_scaled": X_train_scaled,
+        "X_test_scaled": X_test_scaled,
+        "y_train": y_train,
+        "y_test": y_test,
+        "train_unique_count": len(np.unique(y_train)),
+    }
+
+
+def fit_model(prepared: dict, model_type: str, timer: StageTimer = None) -> dict:
+    """
+    Fit one model type on prepared data and evaluate it on the test split.
+    Returns the predictions, metrics and feature importance, or {"error": ...}.
+    Only reads `prepared`, so several models can be fitted concurrently.
+    """
+    from sklearn.linear_model import LinearRegression, LogisticRegression
+    from sklearn.naive_bayes import GaussianNB
+    from sklearn.metrics import mean_squared_error, r2_score, accuracy_score, classification_report
+    timer = timer or StageTimer()
+    encoder = prepared["scaler"]
+    is_classification = prepared["is_classification"]
+    X_train_scaled = prepared["X_train_scaled"]
+    X_test_scaled = prepared["X_test_scaled"]
+    y_train = prepared["y_train"]
+    y_test = prepared["y_test"]
+
+    # Train model based on type
+    if model_type == "linear_regression":
+        if is_classification:
+            return {"error": "Linear Regression is for regression problems. Use Logistic Regression for classification."}
+
+        # Check if target variable is suitable for regression
+        if y_train.nunique() < 3:
+            return {"error": f"Target variable has only {y_train.nunique()} unique values. Consider using classification instead."}
+
+        model = LinearRegression()
+        with timer.stage('fit'):
+            model.fit(X_train_scaled, y_train)
+        with timer.stage('metrics'):
+            y_pred = model.predict(X_test_scaled)
+
+            # Calculate regression metrics
+            mse = mean_squared_error(y_test, y_pred)
+            r2 = r2_score(y_test, y_pred)
+
+        # Handle negative R² (which indicates very poor fit)
+        if r2 < 0 and logger.isEnabledFor(logging.INFO):
+            # Calculate baseline (mean prediction) for comparison
+            baseline_pred = np.full_like(y_test, y_train.mean())
+            baseline_mse = mean_squared_error(y_test, baseline_pred)
+            logger.info("Negative R² score (%.3f) indicates very poor model fit: model MSE %.3f, "
+                        "baseline MSE (mean prediction) %.3f", r2, mse, baseline_mse)
+
+        metrics = {
+            "mean_squared_error": float(mse),
+            "r2_score": float(r2),
+            "rmse": float(np.sqrt(mse))
+        }
+
+        feature_importance = encoder.importance(model.coef_)
+
+    elif model_type == "logistic_regression":
+        if not is_classification:
+            return {"error": "Logistic Regression is for classification problems. Use Linear Regression for regression."}
+
+        model = LogisticRegression(random_state=42, max_iter=1000)
+        with timer.stage('fit'):
+            model.fit(X_train_scaled, y_train)
+        with timer.stage('metrics'):
+            y_pred = model.predict(X_test_scaled)
+
+            # Calculate classification metrics
+            accuracy = accuracy_score(y_test, y_pred)
+            classification_rep = classification_report(y_test, y_pred, output_dict=True)
+
+        logger.debug("Logistic Regression - Accuracy: %s", accuracy)
+
+        metrics = {
+            "accuracy": float(accuracy),
+            "classification_report": classification_rep
+        }
+
+        feature_importance = encoder.importance(model.coef_[0])
+
+    elif model_type == "naive_bayes":
+        if not is_classification:
+            return {"error": "Naive Bayes is for classification problems. Use Linear Regression for regression."}
+
+        # Encoded categorical columns get Bernoulli rather than Gaussian likelihoods
+        model = MixedNaiveBayes(len(encoder.numeric_columns)) if encoder.sparse else GaussianNB()
+        with timer.stage('fit'):
+            model.fit(X_train_scaled, y_train)
+        with timer.stage('metrics'):
+            y_pred = model.predict(X_test_scaled)
+
+            # Calculate classification metrics
+            accuracy = accuracy_score(y_test, y_pred)
+            classification_rep = classification_report(y_test, y_pred, output_dict=True)
+
+        metrics = {
+            "accuracy": float(accuracy),
+            "classification_report": classification_rep
+        }
+
+        # Naive Bayes doesn't have feature importance in the same way
+        feature_importance = encoder.importance(np.zeros(encoder.n_features))
+
+    else:
+        return {"error": f"Unknown model type: {model_type}"}
+
+    return {"model": model, "y_pred": y_pred, "metrics": metrics, "feature_importance": feature_importance}
+
+
+def build_result(df, prepared: dict, model_type: str, fitted: dict, artifact_key: str = None,
+                 inline_charts: bool = False, chart_mode: str = "image", chart_inputs: tuple = None,
+                 timer: StageTimer = None) -> dict:
+    """
+    Assemble the prediction result for a fitted model, including its charts.
+    The fitted pipeline (scaler, model, target classes) is saved under
+    `artifact_key` so the result can score new data later.
+    Pass precomputed (meta, arrays) `chart_inputs` when there is no `df`.
+    """
+    timer = timer or StageTimer()
+    target_column = prepared["target_column"]
+    feature_columns = prepared["feature_columns"]
+    is_classification = prepared["is_classification"]
+    y_classes = prepared["y_classes"]
+    y_test = prepared["y_test"]
+    y_pred = fitted["y_pred"]
+    metrics = fitted["metrics"]
+    feature_importance = fitted["feature_importance"]
+
+    with timer.stage('charts'):
+        # Generate visualizations
+        if chart_mode == "data":
+            try:
+                chart_meta, chart_arrays = chart_inputs or build_chart_inputs(
+                    df, target_column, feature_columns, y_test, y_pred, is_classification
+                )
+                chart_fields = {"chart_data": build_chart_data(chart_meta, chart_arrays, class_labels=y_classes)}
+            except Exception as e:
+                chart_fields = {"chart_data": {"error": f"Chart data generation failed: {str(e)}"}}
+        elif inline_charts:
+            chart_fields = {"charts": generate_charts(
+                df, target_column, feature_columns, y_test, y_pred, is_classification, inputs=chart_inputs
+            )}
+        else:
+            try:
+                chart_meta, chart_arrays = chart_inputs or build_chart_inputs(
+                    df, target_column, feature_columns, y_test, y_pred, is_classification
+                )
+                save_arrays('charts', artifact_key, chart_meta, **chart_arrays)
+                chart_types = chart_meta["chart_types"]
+            except Exception as e:
+                logger.warning("Saving chart inputs failed: %s", e)
+                chart_types = []
+            chart_fields = {"chart_key": artifact_key, "chart_types": chart_types}
+
+    model_fields = {}
+    if artifact_key is not None:
+        try:
+            with timer.stage('artifacts'):
+                save_model(artifact_key, {
+                    "model_type": model_type,
+                    "target_column": target_column,
+                    "feature_columns": feature_columns,
+                    "is_classification": is_classification,
+                    "classes": y_classes,
+                    "scaler": prepared["scaler"],
+                    "model": fitted["model"],
+                })
+            model_fields = {"model_key": artifact_key}
+        except Exception as e:
+            logger.warning("Saving fitted model failed: %s", e)
+
+    # Generate model recommendations
+    recommendations = []
+
+    # Check performance based on model type
+    if is_classification:
+        accuracy = metrics.get('accuracy', 0)
+        if accuracy < 0.5:  # Poor classification performance
+            recommendations.append("Consider trying different classification algorithms like Random Forest or SVM")
+    else:
+        r2 = metrics.get('r2_score', 0)
+        if r2 < 0.1:  # Poor regression performance
+            recommendations.append("Consider trying non-linear models like Random Forest or Polynomial Regression")
+            if prepared["train_unique_count"] < 10:
+                recommendations.append("Target has few unique values - consider classification instead")
+
+    result = {
+        "target_column": target_column,
+        "feature_columns": feature_columns,
+        "feature_encoding": prepared["feature_encoding"],
+        "model_type": model_type,
+        "is_classification": is_classification,
+        "metrics": metrics,
+        "feature_importance": feature_importance,
+        "sample_predictions": {
+            "actual": y_test.tolist()[:5],
+            "predicted": y_pred.tolist()[:5]
+        },
+        "recommendations": recommendations
+    }
+    result.update(chart_fields)
+    result.update(model_fields)
+
+    if y_classes:
+        result["target_classes"] = y_classes
+    
+    return result
+
+
+def run_prediction(filename: str, target_column: str, model_type: str = "linear_regression",
+                   progress=None, artifact_key: str = None, inline_charts: bool = False,
+                   chart_mode: str = "image", sample_rows: int = None, sample_fraction: float = None) -> dict:
+    """
+    Train a model on a stored dataset and build the prediction result.
+    Runs inside the execution engine's worker processes, so it only takes
+    picklable arguments and returns either a result dict or {"error": ...}.
+    `progress` is called with the name of each stage as it starts.
+
+    Charts are not rendered here: their inputs are saved under `artifact_key`
+    and /api/chart renders them on first request. Pass `inline_charts` to
+    get base64 images in the result instead, or chart_mode="data" to get
+    compact chart data (chart_data.py) for client-side rendering.
+
+    With `sample_rows` or `sample_fraction` only a sample of the dataset
+    is used (stratified by class for classification targets, uniform
+    otherwise), and the result reports the sample and bootstrap confidence
+    intervals for the metrics.
+
+    Seconds spent per stage are returned under "timings".
+    """
+    if chart_mode not in ("image", "data"):
+        return {"error": f"Unknown chart mode: {chart_mode}. Use 'image' or 'data'."}
+
+    # Get the stored DataFrame
+    if not dataset_store.exists(filename):
+        return {"error": "File not found. Please upload the file first."}
+
+    timer = StageTimer()
+    sampling = None
+    if sample_rows is not None or sample_fraction is not None:
+        columns = dataset_store.open_table(filename).column_names
+        with timer.stage('profile'):
+            profile = load_profile(filename, columns)
+        # Classification is decided on the full dataset's profile, before sampling
+        stratify = profile is not None and target_column in profile and detect_classification(
+            target_column, profile[target_column]["dtype"],
+            distinct_count(profile[target_column]), profile[target_column]["count"]
+        )
+        try:
+            with timer.stage('sample'):
+                df, sampling = sample_dataset(filename, sample_rows, sample_fraction,
+                                              strata_column=target_column if stratify else None,
+                                              seed=PREPROCESSING["random_state"])
+        except ValueError as e:
+            return {"error": str(e)}
+        logger.info("Sampled %d of %d rows (%s)", sampling['sample_rows'], sampling['total_rows'], sampling['method'])
+    else:
+        with timer.stage('load'):
+            df = dataset_store.load_dataframe(filename)
+        with timer.stage('profile'):
+            profile = load_profile(filename, df.columns)
+
+    prepared = prepare_training_data(df, target_column, progress, profile, timer)
+    if "error" in prepared:
+        return prepared
+
+    report_progress(progress, 'fit')
+    fitted = fit_model(prepared, model_type, timer)
+    if "error" in fitted:
+        return fitted
+
+    report_progress(progress, 'charts')
+    result = build_result(df, prepared, model_type, fitted, artifact_key, inline_charts, chart_mode, timer=timer)
+    if sampling is not None:
+        sampling["confidence_level"] = SAMPLE_CONFIDENCE_LEVEL
+        with timer.stage('metrics'):
+            sampling["confidence_intervals"] = metric_confidence_intervals(
+                prepared["y_test"], fitted["y_pred"], prepared["is_classification"]
+            )
+        result["sampling"] = sampling
+    result["timings"] = timer.durations
+    return result
+
+
+def run_comparison(filename: str, tasks: list, progress=None, inline_charts: bool = False,
+                   chart_mode: str = "image") -> dict:
+    """
+    Train several models on one stored dataset for comparison.
+    `tasks` is a list of (target_column, model_type, artifact_key). The dataset
+    is loaded once, and target analysis, encoding, the split and scaling run
+    once per target column; that target's models are then fitted
+    concurrently on the shared data.
+    Returns {"results": {target_column: {model_type: result or {"error": ...}}},
+    "timings": seconds per stage, summed over the models}.
+    """
+    if chart_mode not in ("image", "data"):
+        return {"error": f"Unknown chart mode: {chart_mode}. Use 'image' or 'data'."}
+
+    if not dataset_store.exists(filename):
+        return {"error": "File not found. Please upload the file first."}
+
+    timer = StageTimer()
+    with timer.stage('load'):
+        df = dataset_store.load_dataframe(filename)
+    with timer.stage('profile'):
+        profile = load_profile(filename, df.columns)
+
+    by_target = {}
+    for target_column, model_type, artifact_key in tasks:
+        by_target.setdefault(target_column, []).append((model_type, artifact_key))
+
+    def train(prepared, model_type, artifact_key):
+        fitted = fit_model(prepared, model_type, timer)
+        if "error" in fitted:
+            return fitted
+        return build_result(df, prepared, model_type, fitted, artifact_key, inline_charts, chart_mode, timer=timer)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=COMPARE_FIT_THREADS) as pool:
+        for target_column, models in by_target.items():
+            prepared = prepare_training_data(df, target_column, progress, profile, timer)
+            if "error" in prepared:
+                results[target_column] = {model_type: prepared for model_type, _ in models}
+                continue
+            report_progress(progress, 'fit')
+            futures = {model_type: pool.submit(train, prepared, model_type, artifact_key)
+                       for model_type, artifact_key in models}
+            results[target_column] = {model_type: future.result() for model_type, future in futures.items()}
+    return {"results": results, "timings": timer.durations}
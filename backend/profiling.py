@@ -0,0 +1,173 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Bump when the profile layout changes; older profiles are then ignored
+PROFILE_VERSION = 2
+# Values per column kept (uniformly sampled) for quantiles and histograms
+PROFILE_SAMPLE_SIZE = int(os.getenv('PROFILE_SAMPLE_SIZE', 10000))
+# Distinct values tracked exactly per column; past this the cardinality is
+# estimated from the PROFILE_MAX_DISTINCT smallest value hashes (a KMV sketch)
+PROFILE_MAX_DISTINCT = int(os.getenv('PROFILE_MAX_DISTINCT', 16384))
+# Value counts are only kept for columns with at most this many categories
+PROFILE_MAX_CATEGORIES = int(os.getenv('PROFILE_MAX_CATEGORIES', 1000))
+PROFILE_TOP_VALUES = 20
+PROFILE_HISTOGRAM_BINS = 20
+PROFILE_QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+
+def is_numeric_dtype(dtype) -> bool:
+    """Numeric in the sense of select_dtypes(include=[np.number]): no booleans"""
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+class ColumnProfile:
+    """
+    Statistics of one column, updated chunk by chunk: counts, cardinality,
+    min/max, mean/std (merged with Chan's parallel algorithm) and a uniform
+    sample for quantiles and histograms.
+    """
+
+    def __init__(self, rng: np.random.Generator):
+        self.rng = rng
+        self.dtype = None
+        self.numeric = None
+        self.count = 0
+        self.null_count = 0
+        self.distinct = np.empty(0, dtype=np.uint64)
+        self.distinct_capped = False
+        self.value_counts = {}
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.sample = np.empty(0)
+        self.sample_keys = np.empty(0)
+
+    def update(self, series: pd.Series):
+        # Chunks inferred differently are widened like the dataset store does
+        numeric = is_numeric_dtype(series.dtype)
+        if self.dtype is None:
+            self.dtype, self.numeric = str(series.dtype), numeric
+        elif self.dtype != str(series.dtype):
+            self.numeric = self.numeric and numeric
+            self.dtype = 'float64' if self.numeric else 'object'
+        values = series.dropna()
+        self.count += len(series)
+        self.null_count += len(series) - len(values)
+        if len(values) == 0:
+            return
+        self._update_distinct(values)
+        if len(self.distinct) > PROFILE_MAX_CATEGORIES:
+            self.value_counts = None
+        if self.value_counts is not None:
+            for value, count in values.value_counts(sort=False).items():
+                self.value_counts[value] = self.value_counts.get(value, 0) + int(count)
+        if numeric:
+            self._update_numeric(values.to_numpy(dtype=float))
+
+    def _update_distinct(self, values: pd.Series):
+        # Sorted value hashes: all of them, or only the smallest once capped
+        hashes = pd.util.hash_array(values.to_numpy())
+        if self.distinct_capped:
+            hashes = hashes[hashes < self.distinct[-1]]
+        self.distinct = np.union1d(self.distinct, hashes)
+        if len(self.distinct) > PROFILE_MAX_DISTINCT:
+            self.distinct_capped = True
+            self.distinct = self.distinct[:PROFILE_MAX_DISTINCT]
+
+    def cardinality(self) -> int:
+        """Exact distinct count, or its KMV estimate once capped"""
+        if not self.distinct_capped:
+            return len(self.distinct)
+        return int((PROFILE_MAX_DISTINCT - 1) * 2.0 ** 64 / float(self.distinct[-1]))
+
+    def _update_numeric(self, x: np.ndarray):
+        n_b = len(x)
+        mean_b = x.mean()
+        m2_b = ((x - mean_b) ** 2).sum()
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta ** 2 * self.n * n_b / n
+        self.n = n
+        self.min = x.min() if self.min is None else min(self.min, x.min())
+        self.max = x.max() if self.max is None else max(self.max, x.max())
+        # Keep the values with the smallest random keys: a uniform sample of everything seen
+        keys = np.concatenate([self.sample_keys, self.rng.random(n_b)])
+        sample = np.concatenate([self.sample, x])
+        if len(sample) > PROFILE_SAMPLE_SIZE:
+            keep = np.argpartition(keys, PROFILE_SAMPLE_SIZE)[:PROFILE_SAMPLE_SIZE]
+            keys, sample = keys[keep], sample[keep]
+        self.sample_keys, self.sample = keys, sample
+
+    def to_dict(self) -> dict:
+        profile = {
+            "dtype": self.dtype,
+            "numeric": bool(self.numeric),
+            "count": int(self.count),
+            "null_count": int(self.null_count),
+            "cardinality": self.cardinality(),
+            "cardinality_capped": self.distinct_capped,
+        }
+        if self.value_counts:
+            top = sorted(self.value_counts.items(), key=lambda item: item[1], reverse=True)[:PROFILE_TOP_VALUES]
+            profile["top_values"] = [[str(value), count] for value, count in top]
+        if profile["numeric"] and self.n > 0:
+            # Quantiles and histogram are exact while the column fits in the sample
+            counts, edges = np.histogram(self.sample, bins=PROFILE_HISTOGRAM_BINS, range=(self.min, self.max))
+            scale = self.n / len(self.sample)
+            profile.update({
+                "min": float(self.min),
+                "max": float(self.max),
+                "mean": float(self.mean),
+                "std": float(np.sqrt(self.m2 / (self.n - 1))) if self.n > 1 else 0.0,
+                "quantiles": {str(q): float(v) for q, v in zip(PROFILE_QUANTILES, np.quantile(self.sample, PROFILE_QUANTILES))},
+                "histogram": {"edges": edges.tolist(), "counts": np.rint(counts * scale).astype(int).tolist()},
+            })
+        return profile
+
+
+class DatasetProfiler:
+    """Profiles every column of a dataset from a sequence of DataFrame chunks"""
+
+    def __init__(self, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        self.columns = {}
+
+    def update(self, chunk: pd.DataFrame):
+        for col in chunk.columns:
+            if col not in self.columns:
+                self.columns[col] = ColumnProfile(self.rng)
+            self.columns[col].update(chunk[col])
+
+    def to_dict(self) -> dict:
+        return {
+            "version": PROFILE_VERSION,
+            "columns": {col: profile.to_dict() for col, profile in self.columns.items()},
+        }
+
+
+def distinct_count(column_profile: dict) -> int:
+    """
+    Distinct values of a profiled column for heuristics that compare them
+    with the row count: an estimated (capped) cardinality counts as every
+    value being distinct, so such columns are never taken for categories.
+    """
+    if column_profile.get("cardinality_capped"):
+        return column_profile["count"]
+    return column_profile["cardinality"]
+
+
+def usable_profile(file_stats: dict, columns) -> dict:
+    """
+    The column profiles from stored upload stats, or None if they are missing,
+    outdated or do not describe exactly these columns.
+    """
+    profile = (file_stats or {}).get("profile")
+    if not profile or profile.get("version") != PROFILE_VERSION:
+        return None
+    if list(profile["columns"]) != list(columns):
+        return None
+    return profile["columns"]
@@ -0,0 +1,101 @@
+import math
+import os
+import numpy as np
+import pandas as pd
+from dataset_store import dataset_store
+
+# Rows read from the memory-mapped dataset per step while sampling
+SAMPLE_BATCH_ROWS = int(os.getenv('SAMPLE_BATCH_ROWS', 100000))
+# Bootstrap resamples of the test set behind each confidence interval
+SAMPLE_BOOTSTRAP_ROUNDS = int(os.getenv('SAMPLE_BOOTSTRAP_ROUNDS', 200))
+SAMPLE_CONFIDENCE_LEVEL = 0.95
+# Every class keeps at least this many rows, so the split can still stratify
+SAMPLE_MIN_PER_CLASS = 2
+
+_KEY = '__sample_key__'
+
+
+def sample_size(total_rows: int, sample_rows: int = None, sample_fraction: float = None) -> int:
+    """Number of rows to sample; raises ValueError for invalid settings"""
+    if sample_rows is not None and sample_fraction is not None:
+        raise ValueError("Use either sample_rows or sample_fraction, not both.")
+    if sample_fraction is not None:
+        if not 0 < sample_fraction <= 1:
+            raise ValueError("sample_fraction must be between 0 and 1.")
+        return max(1, math.ceil(total_rows * sample_fraction))
+    if sample_rows < 1:
+        raise ValueError("sample_rows must be at least 1.")
+    return min(sample_rows, total_rows)
+
+
+def class_quotas(class_counts: pd.Series, n_rows: int) -> pd.Series:
+    """Rows to keep per class: proportional to its frequency, at least SAMPLE_MIN_PER_CLASS"""
+    quotas = (class_counts * n_rows / class_counts.sum()).round().clip(lower=SAMPLE_MIN_PER_CLASS)
+    return quotas.clip(upper=class_counts).astype(int)
+
+
+def sample_dataset(filename: str, sample_rows: int = None, sample_fraction: float = None,
+                   strata_column: str = None, seed: int = 42):
+    """
+    Sample rows of a stored dataset without loading all of it.
+    Every row gets a random key and the rows with the smallest keys are
+    kept (a reservoir sample), one batch at a time. With `strata_column`
+    the reservoir is kept per class, sized in proportion to the class
+    counts (gathered in a first pass over that column only).
+    Returns (DataFrame, {"method", "sample_rows", "total_rows"}).
+    """
+    total_rows = dataset_store.open_table(filename).num_rows
+    n_rows = sample_size(total_rows, sample_rows, sample_fraction)
+    if n_rows >= total_rows:
+        df = dataset_store.load_dataframe(filename)
+        return df, {"method": "none", "sample_rows": len(df), "total_rows": total_rows}
+
+    quotas = None
+    if strata_column is not None:
+        class_counts = None
+        for batch in dataset_store.iter_dataframes(filename, [strata_column], SAMPLE_BATCH_ROWS):
+            counts = batch[strata_column].value_counts()
+            class_counts = counts if class_counts is None else class_counts.add(counts, fill_value=0)
+        quotas = class_quotas(class_counts, n_rows)
+
+    rng = np.random.default_rng(seed)
+    sample = None
+    for batch in dataset_store.iter_dataframes(filename, batch_rows=SAMPLE_BATCH_ROWS):
+        batch[_KEY] = rng.random(len(batch))
+        combined = batch if sample is None else pd.concat([sample, batch], ignore_index=True)
+        if quotas is None:
+            sample = combined.nsmallest(n_rows, _KEY) if len(combined) > n_rows else combined
+        else:
+            rank = combined.groupby(strata_column)[_KEY].rank(method='first')
+            sample = combined[rank <= combined[strata_column].map(quotas)]
+    sample = sample.drop(columns=_KEY).reset_index(drop=True)
+    method = "uniform" if quotas is None else "stratified"
+    return sample, {"method": method, "sample_rows": len(sample), "total_rows": total_rows}
+
+
+def metric_confidence_intervals(y_test, y_pred, is_classification: bool,
+                                rounds: int = SAMPLE_BOOTSTRAP_ROUNDS, seed: int = 42) -> dict:
+    """
+    Percentile bootstrap intervals (at SAMPLE_CONFIDENCE_LEVEL) for the
+    test-set metrics: accuracy, or MSE, RMSE and R².
+    """
+    y_test = np.asarray(y_test, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    rng = np.random.default_rng(seed)
+    scores = {}
+    for _ in range(rounds):
+        idx = rng.integers(0, len(y_test), len(y_test))
+        actual, predicted = y_test[idx], y_pred[idx]
+        if is_classification:
+            scores.setdefault("accuracy", []).append(np.mean(actual == predicted))
+        else:
+            mse = np.mean((actual - predicted) ** 2)
+            variance = np.var(actual)
+            scores.setdefault("mean_squared_error", []).append(mse)
+            scores.setdefault("rmse", []).append(np.sqrt(mse))
+            scores.setdefault("r2_score", []).append(1 - mse / variance if variance else 0.0)
+    tail = (1 - SAMPLE_CONFIDENCE_LEVEL) / 2 * 100
+    return {
+        metric: [float(v) for v in np.percentile(values, [tail, 100 - tail])]
+        for metric, values in scores.items()
+    }
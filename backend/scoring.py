@@ -0,0 +1,85 @@
+import os
+import pandas as pd
+from artifacts import load_model, model_version
+from caching import LRUCache
+
+# Fitted pipelines kept deserialized in memory, most recently used first,
+# as model_key -> (file identity, bundle)
+MODEL_CACHE_MAX_ITEMS = int(os.getenv('MODEL_CACHE_MAX_ITEMS', 32))
+# Rows scored per chunk when streaming a CSV through /api/models/{id}/score
+SCORING_CHUNK_ROWS = int(os.getenv('SCORING_CHUNK_ROWS', 50000))
+
+model_cache = LRUCache(max_items=MODEL_CACHE_MAX_ITEMS)
+
+
+def get_model(model_key: str) -> dict:
+    """
+    Return the fitted pipeline saved under `model_key`; raises KeyError if
+    there is none. A cached pipeline is reloaded once retraining (in any
+    worker) has replaced its file.
+    """
+    version = model_version(model_key)
+    cached = model_cache.get(model_key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    bundle = load_model(model_key)
+    model_cache.set(model_key, (version, bundle))
+    return bundle
+
+
+def feature_matrix(bundle: dict, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Select and validate the model's feature columns from `df`.
+    Raises ValueError for missing columns, non-numeric or missing values in
+    numeric features; categorical features are left to the encoder.
+    """
+    features = bundle["feature_columns"]
+    missing = [col for col in features if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {missing}")
+    # Bundles saved before categorical encoding only have numeric features
+    numeric = getattr(bundle["scaler"], "numeric_columns", features)
+    try:
+        X = df[features].assign(**{col: pd.to_numeric(df[col]).astype(float) for col in numeric})
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Feature columns must be numeric: {str(e)}")
+    if X[numeric].isna().any().any():
+        raise ValueError("Feature columns contain missing values")
+    return X
+
+
+def score_frame(bundle: dict, df: pd.DataFrame) -> dict:
+    """
+    Predict for every row of `df` with a fitted pipeline.
+    Returns {"predictions": [...]} plus {"probabilities": {class: [...]}}
+    for classifiers.
+    """
+    X = bundle["scaler"].transform(feature_matrix(bundle, df))
+    model = bundle["model"]
+    predictions = model.predict(X)
+    if not bundle["is_classification"]:
+        return {"predictions": predictions.astype(float).tolist()}
+    classes = bundle["classes"]
+    scored = {"predictions": [classes[i] for i in predictions]}
+    if hasattr(model, "predict_proba"):
+        proba = model.predict_proba(X)
+        scored["probabilities"] = {
+            str(classes[i]): proba[:, column].tolist() for column, i in enumerate(model.classes_)
+        }
+    return scored
+
+
+def iter_scored_csv(bundle: dict, chunks):
+    """
+    Yield CSV text for a stream of DataFrame chunks: the input columns plus
+    a `prediction` column (and `probability_<class>` columns for classifiers).
+    The header is written once, with the first chunk.
+    """
+    header = True
+    for chunk in chunks:
+        scored = score_frame(bundle, chunk)
+        output = chunk.assign(prediction=scored["predictions"])
+        for label, values in scored.get("probabilities", {}).items():
+            output[f"probability_{label}"] = values
+        yield output.to_csv(index=False, header=header)
+        header = False
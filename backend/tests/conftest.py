@@ -0,0 +1,37 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its configuration at import time: point the dataset store and
+# artifacts at a scratch directory, train in-process and use an in-memory MongoDB
+_workdir = tempfile.mkdtemp(prefix='insightfull-tests-')
+os.environ.setdefault('DATASET_DIR', os.path.join(_workdir, 'datasets'))
+os.environ.setdefault('ARTIFACT_DIR', os.path.join(_workdir, 'artifacts'))
+os.environ.setdefault('PREDICT_EXECUTOR', 'thread')
+os.environ.setdefault('PREDICT_WARMUP', '0')
+
+import mongomock  # noqa: E402
+import pymongo  # noqa: E402
+
+pymongo.MongoClient = mongomock.MongoClient
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def client():
+    """Test client logged in as a fresh user; returns (client, auth headers)"""
+    from fastapi.testclient import TestClient
+    import uuid
+    import main
+    with TestClient(main.app) as test_client:
+        username = f"user-{uuid.uuid4().hex[:8]}"
+        test_client.post('/api/register', data={'username': username, 'password': 'secret'})
+        token = test_client.post('/api/login', data={'username': username, 'password': 'secret'}).json()['access_token']
+        yield test_client, {'Authorization': f'Bearer {token}'}
+
+
+def upload(client, headers, content: bytes, filename: str = 'data.csv'):
+    return client.post('/api/upload', files={'file': (filename, content, 'application/octet-stream')},
+                       headers=headers)
@@ -0,0 +1,86 @@
+import asyncio
+import gzip
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import admission
+from admission import AdmissionRejected, MemoryBudget
+from conftest import upload
+
+
+QUOTA = 2 * 1024 * 1024
+
+
+def compressed_csv(n_rows: int = 500000) -> bytes:
+    """A gzipped CSV a few times smaller than the dataset it is stored as"""
+    rows = np.arange(n_rows)
+    df = pd.DataFrame({'x': rows % 10, 'y': rows % 7 * 1.5, 'z': rows % 1000 * 0.1})
+    return gzip.compress(df.to_csv(index=False).encode())
+
+
+def test_quota_counts_stored_size_of_compressed_upload(client, monkeypatch):
+    test_client, headers = client
+    content = compressed_csv()
+    monkeypatch.setattr(admission, 'USER_DATASET_QUOTA_BYTES', QUOTA)
+    assert len(content) < QUOTA
+
+    for streaming in ('false', 'true'):
+        response = test_client.post(f'/api/upload?streaming={streaming}', headers=headers,
+                                    files={'file': ('big.csv.gz', content, 'application/gzip')})
+        assert response.status_code == 413
+        assert 'quota' in response.json()['detail']
+        assert test_client.get('/api/user/datasets', headers=headers).json()['datasets'] == []
+
+
+def test_rejected_replacement_keeps_previous_dataset(client, monkeypatch):
+    test_client, headers = client
+    assert 'error' not in upload(test_client, headers, gzip.compress(b'x,y\n1,2\n3,4\n'), 'data.csv.gz').json()
+    monkeypatch.setattr(admission, 'USER_DATASET_QUOTA_BYTES', QUOTA)
+
+    response = upload(test_client, headers, compressed_csv(), 'data.csv.gz')
+    assert response.status_code == 413
+    datasets = test_client.get('/api/user/datasets', headers=headers).json()['datasets']
+    assert [d['filename'] for d in datasets] == ['data.csv.gz']
+    assert datasets[0]['stored_bytes'] < 10000
+
+
+def test_request_larger_than_budget_is_rejected_for_good():
+    budget = MemoryBudget(capacity=100)
+
+    async def reserve():
+        async with budget.reserve(101):
+            pass
+
+    with pytest.raises(AdmissionRejected) as excinfo:
+        asyncio.run(reserve())
+    assert not excinfo.value.retryable
+
+
+def test_request_waits_for_budget_then_times_out():
+    budget = MemoryBudget(capacity=100)
+
+    async def scenario():
+        async with budget.reserve(80):
+            with pytest.raises(AdmissionRejected) as excinfo:
+                async with budget.reserve(40, timeout=0.05):
+                    pass
+            assert excinfo.value.retryable
+        async with budget.reserve(40, timeout=0.05):
+            assert budget.reserved == 40
+
+    asyncio.run(scenario())
+    assert budget.stats()["reserved_bytes"] == 0
+
+
+def test_budget_is_split_between_api_processes():
+    import os
+    import subprocess
+    import sys
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, MEMORY_BUDGET_BYTES='4000', WEB_CONCURRENCY='4')
+    code = "import admission; print(admission.MEMORY_BUDGET_BYTES, admission.MemoryBudget().capacity)"
+    result = subprocess.run([sys.executable, '-c', code], cwd=backend_dir, env=env,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ['1000', '1000']
@@ -0,0 +1,15 @@
+import pyarrow as pa
+
+from compaction import table_to_pandas
+
+
+def test_only_low_cardinality_strings_become_categoricals():
+    n_rows = 1000
+    table = pa.table({
+        'region': [('north', 'south')[i % 2] for i in range(n_rows)],
+        'half_distinct': [f'v{i % (n_rows // 2)}' for i in range(n_rows)],
+    })
+    df = table_to_pandas(table)
+    assert str(df['region'].dtype) == 'category'
+    assert str(df['half_distinct'].dtype) != 'category'
+    assert df['half_distinct'].tolist() == table.column('half_distinct').to_pylist()
@@ -0,0 +1,32 @@
+import os
+
+import pandas as pd
+
+from dataset_store import DatasetStore, dataset_name
+
+
+def test_content_is_removed_with_its_last_name(tmp_path):
+    store = DatasetStore(root=str(tmp_path))
+    df = pd.DataFrame({'x': [1, 2, 3]})
+    store.put_dataframe(dataset_name('alice', 'a.csv'), df, content_hash='h1')
+    store.put_profile('h1', {'n_rows': 3})
+    store.link(dataset_name('bob', 'b.csv'), 'h1')
+
+    store.delete(dataset_name('alice', 'a.csv'))
+    assert os.path.exists(store.content_path('h1'))
+    assert store.load_dataframe(dataset_name('bob', 'b.csv'))['x'].tolist() == [1, 2, 3]
+
+    store.delete(dataset_name('bob', 'b.csv'))
+    assert not os.path.exists(store.content_path('h1'))
+    assert store.get_profile('h1') is None
+
+
+def test_replaced_content_is_released(tmp_path):
+    store = DatasetStore(root=str(tmp_path))
+    name = dataset_name('alice', 'a.csv')
+    store.put_dataframe(name, pd.DataFrame({'x': [1]}), content_hash='old')
+    store.put_dataframe(name, pd.DataFrame({'x': [2]}), content_hash='new')
+
+    assert store.release('old')
+    assert not store.release('new')
+    assert sorted(os.listdir(store.objects_dir)) == ['new.arrow']
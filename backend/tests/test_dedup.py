@@ -0,0 +1,23 @@
+from fastapi import UploadFile
+
+import main
+from conftest import upload
+
+
+def test_repeat_upload_is_neither_read_nor_parsed(client, monkeypatch):
+    test_client, headers = client
+    content = b'a,b,sales\n' + b''.join(f'{i},{i % 3},{i * 1.5}\n'.encode() for i in range(50))
+    first = upload(test_client, headers, content, 'first.csv').json()
+    assert not first['reused_dataset']
+
+    async def no_read(self, size=-1):
+        raise AssertionError("a known upload was read into memory")
+
+    def no_parse(*args, **kwargs):
+        raise AssertionError("a known upload was parsed")
+
+    monkeypatch.setattr(UploadFile, 'read', no_read)
+    monkeypatch.setattr(main, 'read_upload', no_parse)
+    second = upload(test_client, headers, content, 'second.csv').json()
+    assert second['reused_dataset']
+    assert second['n_rows'] == first['n_rows'] == 50
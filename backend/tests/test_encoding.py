@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from encoding import FeatureEncoder, HASH_FEATURES, categorical_columns
+
+
+def frame(n_rows: int = 400) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'a': rng.normal(size=n_rows),
+        'region': rng.choice(['n', 's', 'e'], n_rows),
+        'city': rng.choice([f'c{i}' for i in range(100)], n_rows),
+        'uid': [f'id{i}' for i in range(n_rows)],
+        'constant': 'x',
+    })
+
+
+def test_columns_are_one_hot_hashed_or_dropped():
+    df = frame()
+    encoder = FeatureEncoder(['a'], categorical_columns(df)).fit(df)
+    assert list(encoder.onehot) == ['region']
+    assert encoder.hashed == ['city']
+    assert sorted(encoder.dropped) == ['constant', 'uid']
+
+    X = encoder.transform(df)
+    assert sp.issparse(X)
+    assert X.shape == (len(df), 1 + 3 + HASH_FEATURES)
+
+
+def test_unseen_and_missing_levels_encode_as_zeros():
+    df = frame()
+    encoder = FeatureEncoder([], ['region']).fit(df)
+    X = encoder.transform(pd.DataFrame({'region': ['unseen', None, 'n']})).toarray()
+    assert not X[:2].any()
+    assert np.count_nonzero(X[2]) == 1
+
+
+def test_numeric_only_matrix_stays_dense():
+    df = frame()
+    X = FeatureEncoder(['a']).fit_transform(df)
+    assert isinstance(X, np.ndarray)
+    assert abs(X.mean()) < 1e-9
+
+
+def test_naive_bayes_is_not_broken_by_indicator_columns():
+    from pipeline import prepare_training_data, fit_model
+    rng = np.random.default_rng(0)
+    n_rows = 2000
+    df = pd.DataFrame({'a': rng.normal(size=n_rows), 'b': rng.normal(size=n_rows),
+                       'noise': rng.choice([f'n{i}' for i in range(80)], n_rows)})
+    df['label'] = np.where(df.a + df.b > 0, 'pos', 'neg')
+
+    accuracy = {}
+    for columns in (['a', 'b', 'label'], ['a', 'b', 'noise', 'label']):
+        prepared = prepare_training_data(df[columns], 'label')
+        accuracy[len(columns)] = fit_model(prepared, 'naive_bayes')['metrics']['accuracy']
+    assert accuracy[3] > 0.95
+    assert accuracy[4] > accuracy[3] - 0.05
+
+
+def test_hashed_columns_encode_the_same_in_every_process():
+    import os
+    import subprocess
+    import sys
+    df = frame()
+    encoder = FeatureEncoder([], ['city']).fit(df)
+    here = encoder._categorical(df.head(20)).indices.tolist()
+    code = ("import pandas as pd, sys; sys.path.insert(0, '.'); from encoding import FeatureEncoder; "
+            "e = FeatureEncoder([], ['city']); e.hashed = ['city']; "
+            f"print(e._categorical(pd.DataFrame({{'city': {df.city.head(20).tolist()!r}}})).indices.tolist())")
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    there = subprocess.run([sys.executable, '-c', code], cwd=backend_dir, capture_output=True, text=True, check=True)
+    assert there.stdout.strip() == str(here)
+
+
+def test_importance_names_levels_and_hashed_columns():
+    df = frame()
+    encoder = FeatureEncoder(['a'], ['region', 'city']).fit(df)
+    importance = encoder.importance(np.ones(encoder.n_features))
+    assert set(importance) == {'a', 'region=n', 'region=s', 'region=e', 'city (hashed)'}
+    assert importance['city (hashed)'] == 1.0
+
+
+def test_mixed_naive_bayes_probabilities():
+    from encoding import MixedNaiveBayes
+    df = frame()
+    y = (df.a > 0).astype(int).to_numpy()
+    encoder = FeatureEncoder(['a'], ['region']).fit(df)
+    X = encoder.transform(df)
+    model = MixedNaiveBayes(1).fit(X, y)
+    proba = model.predict_proba(X)
+    assert np.allclose(proba.sum(axis=1), 1)
+    assert (model.predict(X) == model.classes_[proba.argmax(axis=1)]).all()
+    assert (model.predict(X) == y).mean() > 0.9
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from conftest import upload
+
+
+def test_constant_target_returns_error(client):
+    test_client, headers = client
+    df = pd.DataFrame({'a': np.arange(200), 'b': np.arange(200) % 7, 'sales': 5.0})
+    assert 'error' not in upload(test_client, headers, df.to_csv(index=False).encode()).json()
+
+    response = test_client.post('/api/predict', headers=headers, json={
+        'filename': 'data.csv', 'target_column': 'sales', 'training_mode': 'incremental',
+    })
+    assert response.status_code == 200
+    assert response.json()['error'] == \
+        "Target variable has no variance (all values are the same). Cannot perform regression."
+
+
+def test_incremental_regression(client):
+    test_client, headers = client
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'a': rng.normal(size=2000), 'b': rng.normal(size=2000)})
+    df['sales'] = 3 * df.a - df.b + rng.normal(scale=0.1, size=2000)
+    assert 'error' not in upload(test_client, headers, df.to_csv(index=False).encode()).json()
+
+    result = test_client.post('/api/predict', headers=headers, json={
+        'filename': 'data.csv', 'target_column': 'sales', 'training_mode': 'incremental',
+    }).json()
+    assert result['training_mode'] == 'incremental'
+    assert result['metrics']['r2_score'] > 0.9
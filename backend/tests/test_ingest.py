@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from ingest import read_upload
+from conftest import upload
+
+
+def test_duplicate_header_is_renamed_like_pandas():
+    df = read_upload(b'a,a,b\n1,2,3\n4,5,6\n', '.csv')
+    assert list(df.columns) == ['a', 'a.1', 'b']
+    assert df['a.1'].tolist() == [2, 5]
+
+
+def test_non_utf8_bytes_raise_decode_error():
+    with pytest.raises(UnicodeDecodeError):
+        read_upload(b'city,n\ncaf\xe9,1\n', '.csv')
+
+
+def test_integers_beyond_int64_stay_exact():
+    df = read_upload(b'id\n99999999999999999999999\n1\n', '.csv')
+    assert df['id'].tolist() == pd.read_csv(pd.io.common.BytesIO(b'id\n99999999999999999999999\n1\n'))['id'].tolist()
+
+
+def test_upload_with_duplicate_header(client):
+    test_client, headers = client
+    response = upload(test_client, headers, b'a,a,b\n1,2,3\n4,5,6\n').json()
+    assert 'error' not in response
+    assert response['columns'] == ['a', 'a.1', 'b']
+
+
+def test_upload_non_utf8_reports_parse_error(client):
+    test_client, headers = client
+    response = upload(test_client, headers, b'city,n\ncaf\xe9,1\n').json()
+    assert response['error'].startswith('Failed to parse file')
+
+
+def test_empty_header_is_named_like_pandas():
+    content = pd.DataFrame({'x': [1, 2], 'y': [3.5, 4.5]}).to_csv().encode()
+    df = read_upload(content, '.csv')
+    assert list(df.columns) == ['Unnamed: 0', 'x', 'y']
+
+
+def test_whole_and_streaming_uploads_agree_on_empty_header(client):
+    test_client, headers = client
+    columns = []
+    for n_rows, streaming in ((2, 'false'), (3, 'true')):
+        # Different content, so the second upload is parsed rather than deduplicated
+        content = pd.DataFrame({'x': range(n_rows), 'y': [3.5] * n_rows}).to_csv().encode()
+        response = test_client.post(f'/api/upload?streaming={streaming}', headers=headers,
+                                    files={'file': (f'indexed-{streaming}.csv', content, 'text/csv')}).json()
+        columns.append(response['columns'])
+    assert columns[0] == columns[1] == ['Unnamed: 0', 'x', 'y']
@@ -0,0 +1,37 @@
+import uuid
+
+import pytest
+
+from conftest import upload
+from dataset_store import dataset_name
+
+
+def login(test_client, username: str) -> dict:
+    test_client.post('/api/register', data={'username': username, 'password': 'secret'})
+    token = test_client.post('/api/login', data={'username': username, 'password': 'secret'}).json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_users_cannot_reach_each_others_datasets(client):
+    test_client, _ = client
+    alice_name = f"alice-{uuid.uuid4().hex[:8]}"
+    alice, bob = login(test_client, alice_name), login(test_client, f"bob-{uuid.uuid4().hex[:8]}")
+    csv = b'a,b,sales\n' + b''.join(f'{i},{i % 5},{i * 2.5}\n'.encode() for i in range(100))
+    assert 'error' not in upload(test_client, alice, csv, 'data.csv').json()
+    assert 'error' not in test_client.post('/api/predict', headers=alice, json={
+        'filename': 'data.csv', 'target_column': 'sales'}).json()
+
+    for filename in ('data.csv', f'{alice_name}/data.csv', f'../{alice_name}/data.csv'):
+        for endpoint, body in (('/api/predict', {'target_column': 'sales'}),
+                               ('/api/predict/compare', {'target_columns': ['sales'],
+                                                         'model_types': ['linear_regression']})):
+            response = test_client.post(endpoint, headers=bob, json={'filename': filename, **body}).json()
+            assert 'error' in response, (endpoint, filename, response)
+
+
+def test_file_names_with_slashes_are_rejected(client):
+    test_client, headers = client
+    response = upload(test_client, headers, b'a,b\n1,2\n', 'other/data.csv').json()
+    assert response['error'].startswith('Invalid file name')
+    with pytest.raises(ValueError):
+        dataset_name('alice', 'bob/data.csv')
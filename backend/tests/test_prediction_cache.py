@@ -0,0 +1,54 @@
+import main
+from conftest import upload
+from database.mongo_client import db
+
+
+def csv(n_rows: int, scale: float = 1.5) -> bytes:
+    return b'a,b,sales\n' + b''.join(f'{i},{i % 3},{i * scale}\n'.encode() for i in range(n_rows))
+
+
+def count_fits(monkeypatch) -> list:
+    """Record every training run the execution engine is asked for"""
+    calls = []
+    run = main.execution_engine.run
+
+    async def counting_run(fn, *args, **kwargs):
+        calls.append(fn.__name__)
+        return await run(fn, *args, **kwargs)
+
+    monkeypatch.setattr(main.execution_engine, 'run', counting_run)
+    return calls
+
+
+def predict(test_client, headers):
+    response = test_client.post('/api/predict', json={'filename': 'data.csv', 'target_column': 'sales'},
+                                headers=headers)
+    result = response.json()
+    assert 'error' not in result, result
+    return result
+
+
+def test_cache_hit_skips_fitting(client, monkeypatch):
+    test_client, headers = client
+    upload(test_client, headers, csv(60))
+    fits = count_fits(monkeypatch)
+    first = predict(test_client, headers)
+    second = predict(test_client, headers)
+    assert (first['cached'], second['cached']) == (False, True)
+    assert len(fits) == 1
+    assert second['metrics'] == first['metrics']
+
+
+def test_reupload_invalidates_cached_predictions(client, monkeypatch):
+    test_client, headers = client
+    upload(test_client, headers, csv(70))
+    fits = count_fits(monkeypatch)
+    known = set(db['prediction_cache'].distinct('content_hash'))
+    assert not predict(test_client, headers)['cached']
+    (old_hash,) = set(db['prediction_cache'].distinct('content_hash')) - known
+
+    upload(test_client, headers, csv(70, scale=2.5))
+    assert db['prediction_cache'].count_documents({'content_hash': old_hash}) == 0
+    result = predict(test_client, headers)
+    assert not result['cached']
+    assert len(fits) == 2
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+import profiling
+from pipeline import detect_classification
+from profiling import DatasetProfiler, distinct_count
+
+
+def profile_of(df: pd.DataFrame, chunk_rows: int = 1000) -> dict:
+    profiler = DatasetProfiler()
+    for start in range(0, len(df), chunk_rows):
+        profiler.update(df.iloc[start:start + chunk_rows])
+    return profiler.to_dict()["columns"]
+
+
+def test_capped_cardinality_is_estimated_and_not_a_classification_target(monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_MAX_DISTINCT', 1000)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'y': rng.normal(size=5000), 'group': rng.integers(0, 20, 5000)})
+    profile = profile_of(df)
+
+    y = profile['y']
+    assert y['cardinality_capped']
+    assert abs(y['cardinality'] - 5000) < 500
+    assert not detect_classification('y', y['dtype'], distinct_count(y), y['count'])
+    assert detect_classification('y', 'float64', df['y'].nunique(), len(df)) is False
+
+    group = profile['group']
+    assert not group['cardinality_capped'] and group['cardinality'] == df['group'].nunique()
+    assert detect_classification('group', group['dtype'], distinct_count(group), group['count'])
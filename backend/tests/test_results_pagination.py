@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from database.mongo_client import db, list_user_results
+
+
+@pytest.fixture
+def results():
+    """Ten results of one user, three per timestamp, so ties straddle pages of four"""
+    username = 'paging-user'
+    start = datetime(2024, 1, 1)
+    docs = [{'username': username, 'filename': f'f{i}.csv', 'model_type': 'linear_regression',
+             'timestamp': start + timedelta(minutes=i // 3), 'result': {'target_column': f't{i}'}}
+            for i in range(10)]
+    ids = db['regression_results'].insert_many(docs).inserted_ids
+    yield username, ids
+    db['regression_results'].delete_many({'username': username})
+
+
+@pytest.mark.parametrize('newest_first', [True, False])
+def test_cursor_pages_do_not_overlap(results, newest_first):
+    username, ids = results
+    pages, cursor = [], None
+    while True:
+        page, cursor = list_user_results(username, limit=4, cursor=cursor, newest_first=newest_first)
+        pages.append([doc['_id'] for doc in page])
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [4, 4, 2]
+    seen = [result_id for page in pages for result_id in page]
+    assert len(set(seen)) == len(seen) == len(ids)
+    timestamps = [db['regression_results'].find_one({'_id': result_id})['timestamp'] for result_id in seen]
+    assert timestamps == sorted(timestamps, reverse=newest_first)
+
+
+def test_invalid_cursor_is_rejected(client):
+    test_client, headers = client
+    response = test_client.get('/api/user/results', params={'cursor': 'not-a-cursor'}, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+import sampling
+from dataset_store import dataset_name, dataset_store
+from sampling import SAMPLE_MIN_PER_CLASS, sample_dataset
+
+
+def test_stratified_sample_keeps_every_class(monkeypatch):
+    # Several batches, so the per-class reservoirs are merged across them
+    monkeypatch.setattr(sampling, 'SAMPLE_BATCH_ROWS', 1000)
+    rng = np.random.default_rng(0)
+    label = rng.choice(['common', 'other'], size=10000, p=[0.8, 0.2]).astype(object)
+    label[[17, 4242, 9001]] = 'rare'
+    df = pd.DataFrame({'x': np.arange(10000), 'label': label})
+    name = dataset_name('sampling-user', 'strata.csv')
+    dataset_store.put_dataframe(name, df)
+
+    sample, info = sample_dataset(name, sample_rows=100, strata_column='label')
+    assert info['method'] == 'stratified'
+    counts = sample['label'].value_counts()
+    assert set(counts.index) == {'common', 'other', 'rare'}
+    assert counts['rare'] >= SAMPLE_MIN_PER_CLASS
+    assert abs(counts['common'] - 80) <= 2
+    # Rows are sampled whole
+    assert (df.loc[sample['x'], 'label'].to_numpy() == sample['label'].to_numpy()).all()
+    dataset_store.delete(name)
@@ -0,0 +1,19 @@
+from artifacts import save_model
+from scoring import get_model
+
+
+def test_retrained_model_replaces_cached_one():
+    save_model('retrained', {'model_type': 'first'})
+    assert get_model('retrained')['model_type'] == 'first'
+    save_model('retrained', {'model_type': 'second'})
+    assert get_model('retrained')['model_type'] == 'second'
+
+
+def test_concurrent_saves_of_one_model_are_not_torn():
+    from concurrent.futures import ThreadPoolExecutor
+    import numpy as np
+    bundles = [{'model_type': str(i), 'weights': np.full(200000, i)} for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda bundle: save_model('concurrent', bundle), bundles))
+    bundle = get_model('concurrent')
+    assert (bundle['weights'] == int(bundle['model_type'])).all()
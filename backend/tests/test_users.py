@@ -0,0 +1,36 @@
+import mongomock
+import pytest
+from pymongo.errors import OperationFailure
+
+from database.mongo_client import create_user, db, ensure_indexes
+
+
+def test_duplicate_username_is_rejected_without_the_unique_index():
+    db['users'].drop_indexes()
+    try:
+        assert create_user('duplicate-user', 'secret')
+        assert not create_user('duplicate-user', 'other')
+        assert db['users'].count_documents({'username': 'duplicate-user'}) == 1
+    finally:
+        db['users'].delete_many({'username': 'duplicate-user'})
+        ensure_indexes()
+
+
+def test_startup_fails_without_the_unique_username_index(monkeypatch):
+    create_index = mongomock.collection.Collection.create_index
+
+    def failing_create_index(collection, keys, **options):
+        if collection.name == 'users':
+            raise OperationFailure("E11000 duplicate key error")
+        return create_index(collection, keys, **options)
+
+    monkeypatch.setattr(mongomock.collection.Collection, 'create_index', failing_create_index)
+    with pytest.raises(RuntimeError, match="username index"):
+        ensure_indexes()
+
+
+def test_register_twice_returns_400(client):
+    test_client, _ = client
+    assert test_client.post('/api/register', data={'username': 'twice', 'password': 'a'}).status_code == 200
+    response = test_client.post('/api/register', data={'username': 'twice', 'password': 'b'})
+    assert response.status_code == 400
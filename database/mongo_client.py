@@ -1,7 +1,10 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError, OperationFailure
 import pandas as pd
+import logging
 import os
 import bcrypt
+import base64
 from datetime import datetime
 
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
@@ -10,26 +13,139 @@ DB_NAME = os.getenv('MONGO_DB', 'insightfull_db')
 client = MongoClient(MONGO_URI)
 db = client[DB_NAME]
 
-def save_dataframe_to_mongo(collection_name: str, df: pd.DataFrame):
+logger = logging.getLogger(__name__)
+
+# Rows converted and sent per insert_many call
+MONGO_INSERT_BATCH_ROWS = int(os.getenv('MONGO_INSERT_BATCH_ROWS', 5000))
+# Columnar layout: documents are kept well under the 16 MB BSON limit
+MONGO_COLUMNAR_CHUNK_ROWS = int(os.getenv('MONGO_COLUMNAR_CHUNK_ROWS', 50000))
+MONGO_COLUMNAR_CHUNK_BYTES = int(os.getenv('MONGO_COLUMNAR_CHUNK_BYTES', 4 * 1024 * 1024))
+# Memoized training results: unused entries expire, and the least recently
+# used ones are dropped once the collection grows past the cap
+PREDICTION_CACHE_TTL_SECONDS = int(os.getenv('PREDICTION_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv('PREDICTION_CACHE_MAX_ENTRIES', 10000))
+
+def _columnar_chunk_rows(df: pd.DataFrame) -> int:
+    """Rows per columnar document, sized from the frame's average row width"""
+    sample = df.head(1000)
+    bytes_per_row = max(1, sample.memory_usage(index=False, deep=True).sum() / max(1, len(sample)))
+    return max(1, min(MONGO_COLUMNAR_CHUNK_ROWS, int(MONGO_COLUMNAR_CHUNK_BYTES / bytes_per_row)))
+
+def save_dataframe_to_mongo(collection_name: str, df: pd.DataFrame, layout: str = 'rows',
+                            batch_size: int = MONGO_INSERT_BATCH_ROWS, row_offset: int = 0, progress=None):
     """
     Save a pandas DataFrame to a MongoDB collection.
-    Each row becomes a document.
+
+    With layout='rows' each row becomes a document. With layout='columnar'
+    each document holds a chunk of rows stored column by column
+    ({'row_start', 'n_rows', 'columns', 'data'}), which is much smaller
+    and faster to write and read back (see load_dataframe_from_mongo).
+
+    Rows are converted and inserted in bounded, unordered batches, so the
+    whole frame is never materialised as Python dicts. `row_offset` numbers
+    columnar chunks when a file is saved in several calls. `progress` is
+    called with (rows_saved, total_rows) after each batch.
     """
-    records = df.to_dict(orient='records')
-    if records:
-        db[collection_name].insert_many(records)
-    return len(records)
+    if layout not in ('rows', 'columnar'):
+        raise ValueError(f"Unknown layout: {layout}")
+    collection = db[collection_name]
+    total_rows = len(df)
+    step = batch_size if layout == 'rows' else _columnar_chunk_rows(df)
+    columns = [str(col) for col in df.columns]
+    pending = []
+    saved = 0
+    for start in range(0, total_rows, step):
+        chunk = df.iloc[start:start + step]
+        if layout == 'rows':
+            collection.insert_many(chunk.to_dict(orient='records'), ordered=False)
+        else:
+            pending.append({
+                'row_start': row_offset + start,
+                'n_rows': len(chunk),
+                'columns': columns,
+                'data': [chunk[col].tolist() for col in chunk.columns],
+            })
+            # Columnar documents are large, so only a few go in each insert
+            if len(pending) * step >= batch_size or start + step >= total_rows:
+                collection.insert_many(pending, ordered=False)
+                pending = []
+        saved += len(chunk)
+        if progress is not None:
+            progress(saved, total_rows)
+    return saved
+
+def load_dataframe_from_mongo(collection_name: str) -> pd.DataFrame:
+    """
+    Load a DataFrame saved by save_dataframe_to_mongo, in either layout.
+    Columnar chunks are reassembled in row order.
+    """
+    collection = db[collection_name]
+    first = collection.find_one({}, {'_id': 0, 'columns': 1, 'row_start': 1})
+    if first is None:
+        return pd.DataFrame()
+    if 'row_start' not in first:
+        return pd.DataFrame(list(collection.find({}, {'_id': 0})))
+    frames = [
+        pd.DataFrame(dict(zip(doc['columns'], doc['data'])))
+        for doc in collection.find({}, {'_id': 0}).sort('row_start', ASCENDING)
+    ]
+    return pd.concat(frames, ignore_index=True)
 
 def get_collection(collection_name: str):
     return db[collection_name]
 
+# --- Index management ---
+def ensure_indexes():
+    """
+    Create the indexes the queries below rely on. Safe to call on every startup.
+    The unique indexes also make the upserts in save_user_file and
+    save_regression_result race-free. Raises if the unique username index
+    cannot be created, so the API does not start without it.
+    """
+    index_specs = [
+        ('users', [('username', ASCENDING)], {'unique': True}),
+        ('user_files', [('username', ASCENDING), ('filename', ASCENDING)], {'unique': True}),
+        ('regression_results', [
+            ('username', ASCENDING), ('filename', ASCENDING),
+            ('model_type', ASCENDING), ('result.target_column', ASCENDING)
+        ], {'unique': True}),
+        # Results listing: filter by user, sort by timestamp then _id
+        ('regression_results', [('username', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)], {}),
+        ('prediction_cache', [('key', ASCENDING)], {'unique': True}),
+        ('prediction_cache', [('content_hash', ASCENDING)], {}),
+        ('prediction_cache', [('last_used_at', ASCENDING)], {'expireAfterSeconds': PREDICTION_CACHE_TTL_SECONDS}),
+        ('user_files', [('file_data.content_hash', ASCENDING)], {}),
+    ]
+    for collection_name, keys, options in index_specs:
+        try:
+            db[collection_name].create_index(keys, **options)
+        except OperationFailure as e:
+            if collection_name == 'users':
+                # Registration relies on it to keep usernames unique: do not serve without it
+                raise RuntimeError(f"Could not create the unique username index: {e}") from e
+            # e.g. existing duplicates block a unique index; queries still work without it
+            logger.warning("Could not create index %s on %s: %s", keys, collection_name, e)
+
+def _upsert(operation):
+    """
+    Run an upsert, retrying once if a concurrent insert of the same key won
+    the race (the retry then matches that document).
+    """
+    try:
+        return operation()
+    except DuplicateKeyError:
+        return operation()
+
 # --- User management for authentication ---
 def create_user(username: str, password: str):
-    users = db['users']
-    if users.find_one({'username': username}):
+    if db['users'].find_one({'username': username}, {'_id': 1}):
         return False  # User already exists
     hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
-    users.insert_one({'username': username, 'password': hashed})
+    # The unique index still rejects a concurrent registration of the same name
+    try:
+        db['users'].insert_one({'username': username, 'password': hashed})
+    except DuplicateKeyError:
+        return False  # User already exists
     return True
 
 def find_user_by_username(username: str):
@@ -43,33 +159,19 @@ def save_user_file(username: str, filename: str, file_data: dict):
     """
     Save file information for a specific user
     """
-    # Check if file already exists for this user
-    existing_file = db['user_files'].find_one({
-        'username': username,
-        'filename': filename
-    })
-    
-    if existing_file:
-        # Update existing file instead of creating duplicate
-        db['user_files'].update_one(
-            {'username': username, 'filename': filename},
-            {
-                '$set': {
-                    'file_data': file_data,
-                    'uploaded_at': datetime.utcnow()
-                }
+    # Single round trip: update the user's entry for this file or create it
+    update = _upsert(lambda: db['user_files'].update_one(
+        {'username': username, 'filename': filename},
+        {
+            '$set': {
+                'file_data': file_data,
+                'uploaded_at': datetime.utcnow()
             }
-        )
-        return False  # Indicates file was updated, not created
-    else:
-        # Create new file entry
-        db['user_files'].insert_one({
-            'username': username,
-            'filename': filename,
-            'file_data': file_data,
-            'uploaded_at': datetime.utcnow()
-        })
-        return True  # Indicates new file was created
+        },
+        upsert=True
+    ))
+    is_new_file = update.upserted_id is not None
+    return is_new_file  # False indicates file was updated, not created
 
 def get_user_files(username: str):
     """
@@ -83,47 +185,131 @@ def get_user_file(username: str, filename: str):
     """
     return db['user_files'].find_one({'username': username, 'filename': filename})
 
+def delete_user_file(username: str, filename: str):
+    """
+    Delete a user's file entry; returns False if there was none
+    """
+    return db['user_files'].delete_one({'username': username, 'filename': filename}).deleted_count > 0
+
 # --- Regression results management ---
 def save_regression_result(username: str, filename: str, result: dict, model_type: str = "linear_regression"):
-    # Check if result already exists for this user, filename, and model type
-    existing_result = db['regression_results'].find_one({
-        'username': username,
-        'filename': filename,
-        'model_type': model_type,
-        'result.target_column': result.get('target_column')
-    })
-    
-    if existing_result:
-        # Update existing result instead of creating duplicate
-        db['regression_results'].update_one(
-            {
-                'username': username,
-                'filename': filename,
-                'model_type': model_type,
-                'result.target_column': result.get('target_column')
-            },
-            {
-                '$set': {
-                    'result': result,
-                    'timestamp': datetime.utcnow()
-                }
-            }
-        )
-        return False  # Indicates result was updated, not created
-    else:
-        # Create new result entry
-        db['regression_results'].insert_one({
+    # Single round trip: replace the result for this user, file, model type
+    # and target column, or insert it if there is none yet
+    update = _upsert(lambda: db['regression_results'].replace_one(
+        {
+            'username': username,
+            'filename': filename,
+            'model_type': model_type,
+            'result.target_column': result.get('target_column')
+        },
+        {
             'username': username,
             'filename': filename,
             'model_type': model_type,
             'result': result,
             'timestamp': datetime.utcnow()
-        })
-        return True  # Indicates new result was created
+        },
+        upsert=True
+    ))
+    is_new_result = update.upserted_id is not None
+    return is_new_result  # False indicates result was updated, not created
+
+# --- Memoized training results ---
+def get_cached_prediction(key: str):
+    """
+    Return the cached result for a prediction key, or None.
+    A hit refreshes the entry's last use for TTL and LRU eviction.
+    """
+    doc = db['prediction_cache'].find_one_and_update(
+        {'key': key},
+        {'$set': {'last_used_at': datetime.utcnow()}},
+        projection={'_id': 0, 'result': 1}
+    )
+    return doc['result'] if doc else None
+
+def save_cached_prediction(key: str, content_hash: str, result: dict):
+    collection = db['prediction_cache']
+    now = datetime.utcnow()
+    _upsert(lambda: collection.update_one(
+        {'key': key},
+        {'$set': {'content_hash': content_hash, 'result': result, 'created_at': now, 'last_used_at': now}},
+        upsert=True
+    ))
+    # Evict the least recently used entries beyond the cap
+    overflow = collection.estimated_document_count() - PREDICTION_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        stale = [doc['_id'] for doc in collection.find({}, {'_id': 1}).sort('last_used_at', ASCENDING).limit(overflow)]
+        collection.delete_many({'_id': {'$in': stale}})
+
+def invalidate_cached_predictions(content_hash: str):
+    """
+    Drop cached results for dataset content that no user file points at
+    any more (e.g. after a file was re-uploaded with different contents).
+    Returns the number of entries removed.
+    """
+    if db['user_files'].count_documents({'file_data.content_hash': content_hash}, limit=1):
+        return 0
+    return db['prediction_cache'].delete_many({'content_hash': content_hash}).deleted_count
 
 def get_user_results(username: str):
     return list(db['regression_results'].find({'username': username}))
 
+# Fields needed to render the results list; charts, classification reports
+# and the rest of the result document are only loaded by get_user_result_by_id
+RESULT_SUMMARY_PROJECTION = {
+    'username': 1,
+    'filename': 1,
+    'model_type': 1,
+    'timestamp': 1,
+    'result.target_column': 1,
+    'result.model_type': 1,
+    'result.feature_columns': 1,
+    'result.is_classification': 1,
+    'result.metrics.accuracy': 1,
+    'result.metrics.r2_score': 1,
+    'result.metrics.rmse': 1,
+    'result.metrics.mean_squared_error': 1,
+}
+
+def encode_results_cursor(doc: dict) -> str:
+    """Opaque paging cursor pointing just past `doc` in timestamp order"""
+    raw = f"{doc['timestamp'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_results_cursor(cursor: str):
+    """Inverse of encode_results_cursor; raises ValueError for malformed cursors"""
+    from bson import ObjectId
+    try:
+        timestamp, result_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), ObjectId(result_id)
+    except Exception:
+        raise ValueError(f"Invalid results cursor: {cursor}")
+
+def list_user_results(username: str, limit: int = 20, cursor: str = None, newest_first: bool = True):
+    """
+    Get one page of a user's results with summary fields only.
+    Results are ordered by timestamp (ties broken by _id) and paged with a
+    cursor rather than an offset, so each page is a single indexed range
+    scan. Returns (results, next_cursor); next_cursor is None on the last page.
+    """
+    query = {'username': username}
+    direction = -1 if newest_first else 1
+    if cursor:
+        timestamp, result_id = decode_results_cursor(cursor)
+        op = '$lt' if newest_first else '$gt'
+        query['$or'] = [
+            {'timestamp': {op: timestamp}},
+            {'timestamp': timestamp, '_id': {op: result_id}},
+        ]
+    docs = list(
+        db['regression_results']
+        .find(query, RESULT_SUMMARY_PROJECTION)
+        .sort([('timestamp', direction), ('_id', direction)])
+        .limit(limit + 1)
+    )
+    next_cursor = encode_results_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
 def get_user_result_by_id(username: str, result_id: str):
     """
     Get a specific result by ID for a user
@@ -0,0 +1,149 @@
+import React from 'react';
+
+// Client-side rendering of the compact chart data returned by
+// /api/predict with chart_mode "data".
+
+const WIDTH = 480;
+const HEIGHT = 320;
+const PADDING = 40;
+
+const svgStyle = {
+  maxWidth: '100%',
+  height: 'auto',
+  background: 'white',
+  borderRadius: 'var(--border-radius-sm)',
+  boxShadow: 'var(--shadow-md)'
+};
+
+const scale = (value, min, max, outMin, outMax) =>
+  max === min ? (outMin + outMax) / 2 : outMin + ((value - min) / (max - min)) * (outMax - outMin);
+
+// Blue (-1) through white (0) to red (+1), like the server-side heatmap
+const correlationColor = (value) => {
+  if (value === null) return 'var(--neutral-200)';
+  const t = Math.max(-1, Math.min(1, value));
+  const fade = Math.round(255 * (1 - Math.abs(t)));
+  return t >= 0 ? `rgb(255, ${fade}, ${fade})` : `rgb(${fade}, ${fade}, 255)`;
+};
+
+function Axes({ xLabel, yLabel }) {
+  return (
+    <>
+      <line x1={PADDING} y1={HEIGHT - PADDING} x2={WIDTH - 10} y2={HEIGHT - PADDING} stroke="#999" />
+      <line x1={PADDING} y1={10} x2={PADDING} y2={HEIGHT - PADDING} stroke="#999" />
+      <text x={WIDTH / 2} y={HEIGHT - 8} textAnchor="middle" fontSize="12">{xLabel}</text>
+      <text x={12} y={HEIGHT / 2} textAnchor="middle" fontSize="12" transform={`rotate(-90 12 ${HEIGHT / 2})`}>{yLabel}</text>
+    </>
+  );
+}
+
+function CorrelationHeatmap({ data }) {
+  const n = data.columns.length;
+  const cell = Math.min((WIDTH - 100) / n, (HEIGHT - 60) / n);
+  return (
+    <svg viewBox={`0 0 ${WIDTH} ${HEIGHT}`} style={svgStyle}>
+      {data.matrix.map((row, i) => row.map((value, j) => (
+        <g key={`${i}-${j}`}>
+          <rect x={90 + j * cell} y={10 + i * cell} width={cell} height={cell} fill={correlationColor(value)}>
+            <title>{`${data.columns[i]} / ${data.columns[j]}: ${value === null ? 'n/a' : value.toFixed(2)}`}</title>
+          </rect>
+          {n <= 12 && value !== null && (
+            <text x={90 + (j + 0.5) * cell} y={10 + (i + 0.5) * cell + 4} textAnchor="middle" fontSize="10">
+              {value.toFixed(2)}
+            </text>
+          )}
+        </g>
+      )))}
+      {data.columns.map((column, i) => (
+        <text key={column} x={85} y={10 + (i + 0.5) * cell + 4} textAnchor="end" fontSize="10">{column}</text>
+      ))}
+    </svg>
+  );
+}
+
+function Scatter({ data }) {
+  const [min, max] = data.range;
+  const maxCount = Math.max(...data.points.map((p) => p[2]), 1);
+  const x = (v) => scale(v, min, max, PADDING, WIDTH - 10);
+  const y = (v) => scale(v, min, max, HEIGHT - PADDING, 10);
+  return (
+    <svg viewBox={`0 0 ${WIDTH} ${HEIGHT}`} style={svgStyle}>
+      <Axes xLabel="Actual Values" yLabel="Predicted Values" />
+      <line x1={x(min)} y1={y(min)} x2={x(max)} y2={y(max)} stroke="red" strokeDasharray="6 4" />
+      {data.points.map(([actual, predicted, count], i) => (
+        <circle key={i} cx={x(actual)} cy={y(predicted)} r={2 + 3 * Math.sqrt(count / maxCount)}
+          fill="var(--primary-color)" fillOpacity="0.5" />
+      ))}
+      {data.method !== 'none' && (
+        <text x={WIDTH - 10} y={20} textAnchor="end" fontSize="10" fill="#666">
+          {data.points.length} of {data.total_points} points ({data.method})
+        </text>
+      )}
+    </svg>
+  );
+}
+
+function ConfusionMatrix({ data }) {
+  const maxCount = Math.max(...data.matrix.flat(), 1);
+  return (
+    <table style={{ margin: '0 auto', borderCollapse: 'collapse', fontSize: '0.875rem' }}>
+      <thead>
+        <tr>
+          <th style={{ padding: '0.5rem' }}>Actual \ Predicted</th>
+          {data.labels.map((label) => <th key={label} style={{ padding: '0.5rem' }}>{label}</th>)}
+        </tr>
+      </thead>
+      <tbody>
+        {data.matrix.map((row, i) => (
+          <tr key={data.labels[i]}>
+            <th style={{ padding: '0.5rem' }}>{data.labels[i]}</th>
+            {row.map((count, j) => (
+              <td key={j} style={{
+                padding: '0.5rem',
+                textAlign: 'center',
+                background: `rgba(59, 130, 246, ${count / maxCount})`,
+                fontWeight: i === j ? '700' : '400'
+              }}>
+                {count}
+              </td>
+            ))}
+          </tr>
+        ))}
+      </tbody>
+    </table>
+  );
+}
+
+function Bars({ data }) {
+  const isHistogram = data.kind === 'histogram';
+  const labels = isHistogram
+    ? data.counts.map((_, i) => data.edges[i].toFixed(1))
+    : data.labels;
+  const maxCount = Math.max(...data.counts, 1);
+  const barWidth = (WIDTH - PADDING - 10) / data.counts.length;
+  return (
+    <svg viewBox={`0 0 ${WIDTH} ${HEIGHT}`} style={svgStyle}>
+      <Axes xLabel={data.column} yLabel={isHistogram ? 'Frequency' : 'Count'} />
+      {data.counts.map((count, i) => {
+        const height = scale(count, 0, maxCount, 0, HEIGHT - PADDING - 10);
+        return (
+          <rect key={i} x={PADDING + i * barWidth + 1} y={HEIGHT - PADDING - height}
+            width={Math.max(barWidth - 2, 1)} height={height} fill="var(--primary-color)" fillOpacity="0.7">
+            <title>{`${labels[i]}: ${count}`}</title>
+          </rect>
+        );
+      })}
+    </svg>
+  );
+}
+
+function ChartData({ chartName, data }) {
+  if (data.error) return <div style={{ color: 'var(--neutral-600)' }}>{data.error}</div>;
+  if (chartName === 'correlation_heatmap') return <CorrelationHeatmap data={data} />;
+  if (data.kind === 'scatter') return <Scatter data={data} />;
+  if (data.kind === 'confusion_matrix') return <ConfusionMatrix data={data} />;
+  if (data.kind === 'bar' || data.kind === 'histogram') return <Bars data={data} />;
+  return null;
+}
+
+export default ChartData;
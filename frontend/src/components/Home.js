@@ -1,6 +1,9 @@
 import React, { useRef, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 
+// File types the backend's /api/upload accepts
+const UPLOAD_SUFFIXES = ['.csv', '.csv.gz', '.csv.zst', '.parquet', '.arrow', '.feather'];
+
 function Home({ authToken, loggedInUser }) {
   const fileInputRef = useRef();
   const navigate = useNavigate();
@@ -72,9 +75,16 @@ function Home({ authToken, loggedInUser }) {
 
   const handleFile = (file) => {
     setFileName(file.name);
-    if (!file.name.endsWith('.csv')) {
-      setError('Only CSV files are supported in this demo.');
+    const name = file.name.toLowerCase();
+    if (!UPLOAD_SUFFIXES.some((suffix) => name.endsWith(suffix))) {
+      setError(`Supported file types: ${UPLOAD_SUFFIXES.join(', ')}`);
+      setPreview([]);
+      return;
+    }
+    if (!name.endsWith('.csv')) {
+      // Compressed and binary formats have no text preview
       setPreview([]);
+      uploadToBackend(file);
       return;
     }
     // Show local preview
@@ -158,7 +168,7 @@ function Home({ authToken, loggedInUser }) {
     <div className="page-container">
       <div className="page-header">
         <h1 className="page-title">Smart Data Analyzer</h1>
-        <p className="page-subtitle">Upload your CSV files and get instant insights with machine learning</p>
+        <p className="page-subtitle">Upload your data files and get instant insights with machine learning</p>
       </div>
       
       {!authToken && (
@@ -200,7 +210,7 @@ function Home({ authToken, loggedInUser }) {
         >
           <input
             type="file"
-            accept=".csv"
+            accept={UPLOAD_SUFFIXES.join(',')}
             style={{ display: 'none' }}
             ref={fileInputRef}
             onChange={handleFileInput}
@@ -208,7 +218,7 @@ function Home({ authToken, loggedInUser }) {
           />
           <div style={{ fontSize: '3rem', marginBottom: '1rem' }}>📊</div>
           <p style={{ fontSize: '1.125rem', color: 'var(--neutral-600)', margin: '0 0 1rem 0' }}>
-            Drag & drop a CSV file here, or click to select
+            Drag & drop a CSV, Parquet or Arrow file here, or click to select
           </p>
           {fileName && (
             <div className="card" style={{ display: 'inline-block', padding: '0.5rem 1rem', marginTop: '1rem' }}>
@@ -1,5 +1,38 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, Link } from 'react-router-dom';
+import ChartData from './ChartData';
+
+// Charts of newer results are served from /api/chart and need the auth header,
+// so they are fetched here and shown through an object URL.
+function ChartImage({ src, alt, authToken, style }) {
+  const [imageUrl, setImageUrl] = useState(null);
+  const [failed, setFailed] = useState(false);
+
+  useEffect(() => {
+    let objectUrl = null;
+    let cancelled = false;
+    setFailed(false);
+    fetch(src, { headers: { Authorization: `Bearer ${authToken}` } })
+      .then((response) => {
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        return response.blob();
+      })
+      .then((blob) => {
+        if (cancelled) return;
+        objectUrl = URL.createObjectURL(blob);
+        setImageUrl(objectUrl);
+      })
+      .catch(() => !cancelled && setFailed(true));
+    return () => {
+      cancelled = true;
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [src, authToken]);
+
+  if (failed) return <div style={{ color: 'var(--neutral-600)' }}>Chart unavailable</div>;
+  if (!imageUrl) return <div className="loading-spinner"></div>;
+  return <img src={imageUrl} alt={alt} style={style} />;
+}
 
 function ResultDetail({ authToken }) {
   const { resultId } = useParams();
@@ -188,7 +221,14 @@ function ResultDetail({ authToken }) {
     );
   };
 
-  const renderCharts = (charts) => (
+  const chartImageStyle = {
+    maxWidth: '100%',
+    height: 'auto',
+    borderRadius: 'var(--border-radius-sm)',
+    boxShadow: 'var(--shadow-md)'
+  };
+
+  const renderCharts = (charts = {}) => (
     <div className="card mb-6">
       <div className="card-header">
         <h3 className="card-title">📊 Generated Charts</h3>
@@ -213,12 +253,14 @@ function ResultDetail({ authToken }) {
                 <img 
                   src={chartData} 
                   alt={chartName}
-                  style={{ 
-                    maxWidth: '100%', 
-                    height: 'auto',
-                    borderRadius: 'var(--border-radius-sm)',
-                    boxShadow: 'var(--shadow-md)'
-                  }}
+                  style={chartImageStyle}
+                />
+              ) : chartData.startsWith('/api/chart/') ? (
+                <ChartImage
+                  src={chartData}
+                  alt={chartName}
+                  authToken={authToken}
+                  style={chartImageStyle}
                 />
               ) : (
                 <div style={{ 
@@ -237,6 +279,39 @@ function ResultDetail({ authToken }) {
     </div>
   );
 
+  const renderChartData = (chartData) => (
+    <div className="card mb-6">
+      <div className="card-header">
+        <h3 className="card-title">📊 Generated Charts</h3>
+      </div>
+      <div className="card-body">
+        {chartData.error ? (
+          <div style={{ color: 'var(--neutral-600)' }}>{chartData.error}</div>
+        ) : (
+          <div className="grid grid-2">
+            {Object.entries(chartData).map(([chartName, data]) => (
+              <div key={chartName} className="card" style={{ 
+                background: 'var(--neutral-50)', 
+                padding: '1.5rem',
+                textAlign: 'center'
+              }}>
+                <h4 style={{ 
+                  margin: '0 0 1rem 0', 
+                  textTransform: 'capitalize',
+                  fontWeight: '600',
+                  color: 'var(--neutral-800)'
+                }}>
+                  {chartName.replace(/_/g, ' ')}
+                </h4>
+                <ChartData chartName={chartName} data={data} />
+              </div>
+            ))}
+          </div>
+        )}
+      </div>
+    </div>
+  );
+
   if (loading) {
     return (
       <div className="loading-container">
@@ -307,7 +382,7 @@ function ResultDetail({ authToken }) {
       {renderMetrics(result.result.metrics, result.result.is_classification)}
       {renderFeatureImportance(result.result.feature_importance)}
       {renderSamplePredictions(result.result.sample_predictions, result.result.is_classification)}
-      {renderCharts(result.result.charts)}
+      {result.result.chart_data ? renderChartData(result.result.chart_data) : renderCharts(result.result.charts)}
 
       <div className="card" style={{ 
         background: 'linear-gradient(135deg, #f0f8ff 0%, #e6f3ff 100%)', 
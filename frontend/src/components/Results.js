@@ -3,33 +3,45 @@ import { Link } from 'react-router-dom';
 
 function Results({ authToken }) {
   const [userResults, setUserResults] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState('');
 
   useEffect(() => {
     fetchResults();
   }, [authToken]);
 
-  const fetchResults = async () => {
+  // Results are paged: each response carries a cursor for the next page
+  const fetchResults = async (cursor = null) => {
+    const params = new URLSearchParams({ limit: '24' });
+    if (cursor) params.set('cursor', cursor);
     try {
-      const response = await fetch('/api/user/results', {
+      const response = await fetch(`/api/user/results?${params}`, {
         headers: { Authorization: `Bearer ${authToken}` },
       });
       if (!response.ok) {
         setError('Failed to fetch results.');
-        setUserResults([]);
+        if (!cursor) setUserResults([]);
         return;
       }
       const data = await response.json();
-      setUserResults(data);
+      setUserResults((previous) => (cursor ? [...previous, ...data.results] : data.results));
+      setNextCursor(data.next_cursor);
     } catch (err) {
       setError('Failed to fetch results: ' + err.message);
-      setUserResults([]);
+      if (!cursor) setUserResults([]);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
+  const loadMore = () => {
+    setLoadingMore(true);
+    fetchResults(nextCursor);
+  };
+
   if (loading) {
     return (
       <div className="loading-container">
@@ -144,6 +156,14 @@ function Results({ authToken }) {
           ))}
         </div>
       )}
+
+      {nextCursor && (
+        <div className="text-center mt-6">
+          <button className="btn btn-secondary" onClick={loadMore} disabled={loadingMore}>
+            {loadingMore ? 'Loading...' : 'Load more results'}
+          </button>
+        </div>
+      )}
     </div>
   );
 }